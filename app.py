@@ -1,14 +1,33 @@
 import os
+import json
 import time
 from urllib.parse import urlencode, urlparse
 
-from flask import Flask, request, jsonify, redirect
-from openai import OpenAI
+from flask import Flask, Response, g, request, jsonify, redirect, stream_with_context, after_this_request
 from flask_cors import CORS
-from authlib.integrations.flask_client import OAuth
+from werkzeug.exceptions import InternalServerError
+from werkzeug.middleware.proxy_fix import ProxyFix
 import jwt
 
-from scenarios import scenarios  # mevcut sözlük
+from scenario_store import make_scenario_store
+from auth import VerifiedTokenCache
+from payloads import payload_response
+from sessions import make_store, new_conversation
+from context_window import count_message_tokens, fit_messages
+from prompts import prompt_cache_stats, record_usage, usage_summary
+from response_cache import cache_key, normalize_input, response_cache
+from singleflight import SingleFlight, request_key
+from upstream import UpstreamBusy, UpstreamLimiter
+from quotas import QuotaExceeded, QuotaGuard, make_counter_store
+from lazy import Lazy, warm_up
+from llm_backends import LLM_BACKEND
+from providers import make_providers
+from model_router import CHAT_MODEL, ModelRouter, register_router_metrics
+import metrics
+from tracing import Trace
+from batch_eval import BATCH_BUSY_RETRIES, BATCH_PARALLELISM, JobError, parse_jobs, run_jobs
+from prefetch import DRAFT_PREFETCH, DRAFT_RATE_LIMIT, DRAFT_WARM_MIN_TOKENS, DraftPrefetcher
+from cancellation import InFlightTurns, TurnCancelled, close_stream, log_cancelled
 
 app = Flask(__name__)
 
@@ -17,6 +36,12 @@ FRONTEND_URL = os.environ.get("FRONTEND_URL")  # query YOK
 BACKEND_URL = os.environ.get("BACKEND_URL")
 app.config["SECRET_KEY"] = os.environ.get("FLASK_SECRET_KEY")
 JWT_SECRET = os.environ.get("JWT_SECRET")
+SCENARIOS_CACHE_CONTROL = os.environ.get("SCENARIOS_CACHE_CONTROL", "public, max-age=300")
+# 0 → OpenAI / OAuth / senaryolar import sırasında kurulur (bkz. lazy.py)
+LAZY_INIT = os.environ.get("LAZY_INIT", "1").lower() not in ("0", "false", "no")
+# Önümüzdeki proxy sayısı (Render: 1). İstemci IP'si X-Forwarded-For'un sondan bu kadarıncı
+# elemanı; daha soldakiler istemcinin kendi yazdığı değerler olabilir. 0 = header'a bakılmaz
+TRUSTED_PROXIES = int(os.environ.get("TRUSTED_PROXIES", "1"))
 
 def extract_origin(url):
     if not url:
@@ -27,28 +52,104 @@ def extract_origin(url):
 FRONTEND_ORIGIN = extract_origin(FRONTEND_URL)
 
 # ---- CORS (/api/*) ----
-CORS(app)
+# Frontend'in kendini yavaşlatabilmesi için limit / kota header'ları okunabilir olmalı
+EXPOSED_HEADERS = [
+    "Retry-After",
+    "X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Reset",
+    "X-Quota-Tokens-Limit", "X-Quota-Tokens-Remaining", "X-Quota-Reset",
+    "X-Request-ID",
+]
+CORS(app, expose_headers=EXPOSED_HEADERS)
+
+if TRUSTED_PROXIES:
+    # request.remote_addr artık gerçek istemci (asgi.py'deki Flask route'ları dahil)
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+
+# ---- Metrics (/metrics) ve istek izleri (tracing.py) ----
+@app.before_request
+def start_request_metrics():
+    # Label olarak kural ("/api/scenarios/<ref>"), path değil: kardinalite sabit kalır
+    g.metrics_route = request.url_rule.rule if request.url_rule else "unmatched"
+    g.metrics_started = metrics.request_started(g.metrics_route)
+    g.trace = Trace(g.metrics_route, request.method, request.headers.get("X-Request-ID"), request.headers)
+
+@app.after_request
+def finish_request_metrics(response):
+    if "metrics_started" in g:
+        route, method, started, trace = g.metrics_route, request.method, g.metrics_started, g.trace
+        response.headers["X-Request-ID"] = trace.request_id
+
+        def finish():
+            metrics.request_finished(route, method, response.status_code, started)
+            trace.finish(response.status_code)
+
+        if response.is_streamed:
+            # Stream'lerde süre akış bitene kadar sayılır (WSGI sunucusu close() çağırınca)
+            response.call_on_close(finish)
+        else:
+            finish()
+    return response
+
+@app.errorhandler(InternalServerError)
+def count_request_error(e):
+    # 500 yanıtı after_request'ten (trace.finish) önce burada üretilir: hata sınıfı iz satırına girer
+    error = e.original_exception
+    if error is not None and "metrics_route" in g:
+        metrics.count_error(g.metrics_route, error)
+        g.trace.fail(error)
+    return e
+
+@app.get("/metrics")
+def get_metrics():
+    if metrics.METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {metrics.METRICS_TOKEN}":
+        return jsonify({"error": "Unauthorized"}), 401
+    return Response(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
 
 # ---- OpenAI ----
+# LLM_BACKEND=mock → anahtarsız, ağsız taklit (bkz. llm_backends.py)
 API_KEY = os.environ.get("OPENAI_API_KEY")
-if not API_KEY:
+if LLM_BACKEND == "openai" and not API_KEY:
     raise ValueError("OPENAI_API_KEY environment variable is not set!")
-client = OpenAI(api_key=API_KEY)
+
+# Senaryo modelleri "local:qwen" gibi başka OpenAI uyumlu uçlara da gidebilir (bkz. providers.py)
+llm_providers = make_providers(API_KEY)
+# Senaryonun model listesinden en hızlı sağlıklı model; timeout / 429'da yedeğe geçer
+model_router = ModelRouter()
+register_router_metrics(model_router)
+# Aynı anda gelen birebir aynı istekler tek upstream çağrısını paylaşır
+upstream_flight = SingleFlight()
+# Eşzamanlılık / kuyruk / RPM-TPM sınırı; kuyruk doluysa 503 + Retry-After
+upstream_limiter = UpstreamLimiter()
+
+# ---- Conversations ----
+session_store = make_store()
+
+# ---- Rate limit / kota (/api/ask) ----
+quota_guard = QuotaGuard(make_counter_store())
+# Yoldaki turlar; istemci koparsa veya /api/ask/cancel gelirse upstream çağrısı durdurulur
+inflight_turns = InFlightTurns()
 
 # ---- OAuth ----
-oauth = OAuth(app)
-
-oauth.register(
-    name="google",
-    client_id=os.environ.get("GOOGLE_CLIENT_ID"),
-    client_secret=os.environ.get("GOOGLE_CLIENT_SECRET"),
-    server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
-    # base veriyoruz; "userinfo" göreli path'i çalışsın
-    api_base_url="https://openidconnect.googleapis.com/v1/",
-    client_kwargs={"scope": "openid email profile", "prompt": "consent"},
-)
+def make_google_oauth():
+    from authlib.integrations.flask_client import OAuth  # sadece login / callback'te gerekir
+
+    oauth = OAuth(app)
+    oauth.register(
+        name="google",
+        client_id=os.environ.get("GOOGLE_CLIENT_ID"),
+        client_secret=os.environ.get("GOOGLE_CLIENT_SECRET"),
+        server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
+        # base veriyoruz; "userinfo" göreli path'i çalışsın
+        api_base_url="https://openidconnect.googleapis.com/v1/",
+        client_kwargs={"scope": "openid email profile", "prompt": "consent"},
+    )
+    return oauth.google
+
+google_oauth = Lazy(make_google_oauth, "oauth")
 
 # ---- Helpers ----
+token_cache = VerifiedTokenCache()
+
 def issue_jwt(user: dict) -> str:
     now = int(time.time())
     payload = {
@@ -64,16 +165,36 @@ def issue_jwt(user: dict) -> str:
     }
     return jwt.encode(payload, JWT_SECRET, algorithm="HS256")
 
-def current_user_from_auth_header():
-    auth = request.headers.get("Authorization", "")
-    if not auth.lower().startswith("bearer "):
+def decode_user(auth: str):
+    if not auth.lower().startswith("bearer ") or not JWT_SECRET:
         return None
     token = auth.split(" ", 1)[1].strip()
+    data = token_cache.get(token)
+    if data is not None:
+        return data
     try:
         data = jwt.decode(token, JWT_SECRET, algorithms=["HS256"], audience="convince-frontend")
-        return data
-    except Exception:
+    except jwt.PyJWTError:
         return None
+    token_cache.put(token, data)
+    return data
+
+def current_user_from_auth_header():
+    # İstek başına bir kez çözülür; aynı istekte sonraki çağrılar g'den okur
+    if "auth_user" not in g:
+        g.auth_user = decode_user(request.headers.get("Authorization", ""))
+    return g.auth_user
+
+def client_ip(forwarded_for: str, remote_addr: str) -> str:
+    # asgi.py için ProxyFix(x_for=TRUSTED_PROXIES) ile aynı kural: güvenilen proxy'nin eklediği hop
+    hops = [hop.strip() for hop in (forwarded_for or "").split(",")]
+    if TRUSTED_PROXIES and forwarded_for and len(hops) >= TRUSTED_PROXIES:
+        return hops[-TRUSTED_PROXIES]
+    return remote_addr or "unknown"
+
+def request_ip() -> str:
+    # Flask: X-Forwarded-For'u ProxyFix zaten işledi
+    return request.remote_addr or "unknown"
 
 # ---- Health / Root ----
 @app.get("/")
@@ -84,17 +205,20 @@ def root():
 @app.get("/api/auth/login/google")
 def auth_login_google():
     redirect_uri = f"{BACKEND_URL}/api/auth/callback/google"
-    return oauth.google.authorize_redirect(redirect_uri)
+    return google_oauth.authorize_redirect(redirect_uri)
 
 @app.get("/api/auth/callback/google")
 def auth_callback_google():
+    trace = g.trace
     try:
-        token = oauth.google.authorize_access_token()
+        with trace.stage("token"):
+            token = google_oauth.authorize_access_token()
 
         # 1) userinfo endpoint (base_url tanımlı → göreli path çalışır)
         data = {}
         try:
-            resp = oauth.google.get("userinfo")
+            with trace.stage("userinfo"):
+                resp = google_oauth.get("userinfo")
             if resp is not None and getattr(resp, "content", None):
                 data = resp.json()
         except Exception:
@@ -103,7 +227,8 @@ def auth_callback_google():
         # 2) fallback: ID token
         if not data.get("sub"):
             try:
-                idinfo = oauth.google.parse_id_token(token)
+                with trace.stage("id_token"):
+                    idinfo = google_oauth.parse_id_token(token)
             except Exception:
                 idinfo = {}
             # idinfo varsa birleştir
@@ -126,12 +251,15 @@ def auth_callback_google():
             "provider": "google",
         }
 
-        jwt_token = issue_jwt(user)
+        with trace.stage("jwt"):
+            jwt_token = issue_jwt(user)
         to = f"{FRONTEND_URL}?{urlencode({'token': jwt_token})}"
         return redirect(to, code=302)
 
     except Exception as e:
         print("Google callback error:", repr(e))  # Render logs
+        metrics.count_error("/api/auth/callback/google", e)
+        trace.fail(e)
         return jsonify({"error": "OAuth callback failed", "detail": str(e)}), 500
 
 @app.get("/api/auth/me")
@@ -142,67 +270,743 @@ def auth_me():
     return jsonify({"authenticated": True, "user": user})
 
 # ---- Business endpoints ----
+# Senaryolar doğrulanıp derlenir: system prompt, hedef dedektörü, public JSON
+# (ETag + gzip/br). Varsayılan scenarios.py (açılışta, eksik alan → uygulama açılmaz;
+# ~10 ms, LAZY_INIT'ten bağımsız); SCENARIO_SOURCE verilirse klasör / SQLite'tan
+# tembel yükleme + hot reload.
+scenario_registry = make_scenario_store(cache_control=SCENARIOS_CACHE_CONTROL)
+
 @app.get("/api/scenarios")
 def get_scenarios():
-    simplified_scenarios = []
-    for sid, scenario in scenarios.items():
-        simplified_scenarios.append({
-            "id": sid,
-            "name": scenario["Senaryo Adı"],
-            "story": scenario["Hikaye"],
-            "purpose": scenario["Amaç"],
-            "system_prompt": scenario["System Prompt"],
-            "first_message": scenario["İlk Mesaj"],
-            "goal": scenario["Goal"],
-        })
-    return jsonify(simplified_scenarios)
-
-@app.post("/api/ask")
-def ask():
-    data = request.json or {}
+    with g.trace.stage("registry"):
+        payload = scenario_registry.list_payload
+    with g.trace.stage("respond"):
+        return payload_response(payload)
+
+@app.get("/api/scenarios/index")
+def get_scenario_index():
+    return payload_response(scenario_registry.index_payload)
+
+@app.get("/api/scenarios/<ref>")
+def get_scenario_detail(ref):
+    scenario = scenario_registry.get(ref)  # "3" veya slug
+    if scenario is None:
+        return jsonify({"error": "Scenario not found"}), 404
+    return payload_response(scenario.detail_payload)
+
+def build_messages(system_content: str, history: list, user_input: str) -> list:
+    messages = [{"role": "system", "content": system_content}]
+    for m in history:
+        if m.get("sender") == "user":
+            messages.append({"role": "user", "content": m.get("text", "")})
+        else:
+            messages.append({"role": "assistant", "content": m.get("text", "")})
+    messages.append({"role": "user", "content": user_input})
+    return messages
+
+def sse_event(data: dict, event: str = None) -> str:
+    # Tek satır JSON; tarayıcıdaki EventSource / fetch okuyucusu satır satır parse eder
+    line = f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    if event:
+        line = f"event: {event}\n{line}"
+    return line
+
+def load_conversation(conversation_id, user: dict):
+    if not user:
+        return None, ({"error": "Unauthorized"}, 401)
+    conversation = session_store.get(str(conversation_id))
+    if not conversation or conversation["owner"] != user.get("sub"):
+        return None, ({"error": "Conversation not found"}, 404)
+    return conversation, None
+
+def valid_history(history) -> bool:
+    # [{"sender": "user" | "ai", "text": "..."}, ...]
+    return isinstance(history, list) and all(
+        isinstance(m, dict) and isinstance(m.get("text"), str) for m in history
+    )
+
+def parse_ask_payload(data: dict, user: dict = None):
+    # Flask ve ASGI (asgi.py) yolları aynı doğrulamayı kullanır
+    if not isinstance(data, dict):
+        return None, ({"error": "Invalid JSON body"}, 400)
     user_input = data.get("user_input")
-    scenario_id = data.get("scenario_id")
-    history = data.get("history", [])
+    conversation = None
+
+    if data.get("conversation_id") is not None:
+        # Sunucu tarafı geçmiş: istemci sadece yeni mesajı gönderir
+        conversation, error = load_conversation(data["conversation_id"], user)
+        if error:
+            return None, error
+        scenario_id = conversation["scenario_id"]
+        history = conversation["history"]
+    else:
+        scenario_id = data.get("scenario_id")
+        history = data.get("history", [])
+        if not valid_history(history):
+            return None, ({"error": "Invalid history"}, 400)
 
     if user_input is None or scenario_id is None:
-        return jsonify({"error": "Missing user_input or scenario_id"}), 400
+        return None, ({"error": "Missing user_input or scenario_id"}, 400)
+    if not isinstance(user_input, str):
+        return None, ({"error": "Invalid user_input"}, 400)
 
-    scenario = scenarios.get(scenario_id)
-    if not scenario:
-        return jsonify({"error": "Invalid scenario_id"}), 400
+    # İstemcinin ürettiği tur kimliği; /api/ask/cancel ile iptal için
+    turn_id = data.get("turn_id")
+    if turn_id is not None and (not isinstance(turn_id, str) or not 0 < len(turn_id) <= 64):
+        return None, ({"error": "Invalid turn_id"}, 400)
 
+    scenario = scenario_registry.get(scenario_id)  # 3, "3" veya slug
+    if not scenario:
+        return None, ({"error": "Invalid scenario_id"}, 400)
+
+    turn = {
+        "scenario_id": scenario.id,
+        "scenario": scenario,
+        "history": history,
+        "user_input": user_input,
+        "conversation": conversation,
+        "user": user,
+        "identity": None,
+        "turn_id": turn_id,
+        "cancel": None,
+        "cache_key": None,
+        "meta": {},
+        "timings": {},
+    }
+    return turn, None
+
+def check_quota(turn: dict, ip: str):
+    # İzin yoksa (gövde, status, header'lar) döner; varsa header'lar turn'e yazılır
+    decision = quota_guard.check(turn["user"], ip)
+    turn["identity"] = decision.identity
+    turn["quota_headers"] = decision.headers
+    if decision.allowed:
+        return None
+    headers = {**decision.headers, "Retry-After": str(decision.retry_after)}
+    return {"error": "İstek sınırına ulaştınız, lütfen biraz sonra tekrar deneyin."}, 429, headers
+
+def parse_ask_request():
+    trace = g.trace
+    with trace.stage("parse"):
+        turn, error = parse_ask_payload(request.json or {}, current_user_from_auth_header())
+    if error:
+        body, status = error
+        return None, (jsonify(body), status)
+
+    trace.bind(turn)
+    with trace.stage("quota"):
+        limited = check_quota(turn, request_ip())
+    if limited:
+        body, status, headers = limited
+        return None, (jsonify(body), status, headers)
+
+    # Hangi dönüş yolu olursa olsun (json, stream, 503) kalan kota header'larda
+    @after_this_request
+    def add_quota_headers(response):
+        response.headers.update(turn["quota_headers"])
+        return response
+
+    return turn, None
+
+def summarize_history(turn: dict, messages: list) -> str:
+    # Özet çağrısı da senaryonun model yönlendirmesinden geçer; token'lar metriklere ve kotaya yazılır
+    summary, usage, _ = complete_routed(turn["scenario_id"], messages, turn.get("identity"), max_tokens=400)
+    if usage and turn.get("identity"):
+        quota_guard.charge(turn["identity"], usage["prompt_tokens"] + usage["completion_tokens"])
+    return summary
+
+def turn_messages(turn: dict) -> list:
+    messages = build_messages(turn["scenario"].system_prompt, turn["history"], turn["user_input"])
+    # Bütçe aşılırsa eski turlar özetlenir; kazanılan token'lar meta'da döner
+    messages, turn["meta"]["context"] = fit_messages(
+        turn["scenario_id"], turn["scenario"], messages,
+        lambda summary_messages: summarize_history(turn, summary_messages),
+    )
+    return messages
+
+def scripted_messages(scenario_id, history: list, user_input: str, identity: str = None) -> list:
+    # Toplu değerlendirme (batch_eval.py) için /api/ask ile aynı prompt
+    scenario = scenario_registry.get(scenario_id)
+    turn = {
+        "scenario_id": scenario.id,
+        "scenario": scenario,
+        "history": history,
+        "user_input": user_input,
+        "identity": identity,
+        "meta": {},
+        "timings": {},
+    }
+    return turn_messages(turn)
+
+def hedge_loser(scenario_id, identity):
+    # Kazanan döndükten sonra biten hedge çağrısı da faturalanır: kullanım, metrik ve kota
+    def on_late(model, chat_completion):
+        usage = usage_summary(chat_completion.usage)
+        record_usage(scenario_id, usage)
+        metrics.record_tokens(scenario_id, model, usage)
+        if usage and identity:
+            quota_guard.charge(identity, usage["prompt_tokens"] + usage["completion_tokens"])
+    return on_late
+
+def complete_routed(scenario_id, messages: list, identity: str = None, **params) -> tuple:
+    # (cevap, usage, route); toplu iş, geçmiş özeti ve taslak ön üretimi aynı yoldan
+    tokens = count_message_tokens(messages)
+    chat_completion, route = upstream_limiter.call(
+        lambda: model_router.complete(
+            scenario_registry.get(scenario_id).models,
+            lambda model, timeout: llm_providers.create(
+                model,
+                messages=messages,
+                timeout=timeout,
+                **params,
+            ),
+            hedge_slot=lambda: upstream_limiter.acquire(tokens),
+            on_late=hedge_loser(scenario_id, identity),
+        ),
+        tokens,
+    )
+    usage = usage_summary(chat_completion.usage)
+    record_usage(scenario_id, usage)
+    metrics.record_tokens(scenario_id, route["model"], usage)
+    return chat_completion.choices[0].message.content, usage, route
+
+def complete_messages(scenario_id, messages: list, identity: str = None) -> tuple:
+    answer, usage, _ = complete_routed(scenario_id, messages, identity)
+    return answer, usage
+
+def turn_tokens(turn: dict) -> int:
+    return turn["meta"]["context"]["prompt_tokens_estimate"]
+
+def busy_response(error: UpstreamBusy):
+    response = jsonify({"error": "Sunucu şu anda çok yoğun, lütfen birazdan tekrar deneyin."})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+def cached_answer(turn: dict):
+    # Açılış turları için ortak cevap cache'i (RESPONSE_CACHE=1)
+    if response_cache is None or not response_cache.applies(turn["history"]):
+        return None
+    turn["cache_key"] = cache_key(
+        turn["scenario_id"], turn["history"], turn["user_input"],
+        {"model": ",".join(turn["scenario"].models), "scenario": turn["scenario"].version},
+    )
+    answer = response_cache.get(turn["cache_key"])
+    turn["meta"]["cache"] = "miss" if answer is None else "hit"
+    return answer
+
+def queued(turn: dict, fn):
+    # Limiter fn'i slot alınca çağırır; o ana kadar geçen süre kuyrukta bekleme
+    started = time.perf_counter()
+
+    def call():
+        if turn["cancel"] is not None:
+            # Kuyrukta beklerken iptal edildiyse upstream'e hiç gidilmez
+            turn["cancel"].check()
+        if "queue" not in turn["timings"]:
+            metrics.observe_stage(turn, "queue", time.perf_counter() - started)
+        return fn()
+    return call
+
+def observe_upstream(turn: dict, started: float):
+    # Kuyruk hariç OpenAI süresi (tekrar denemeler dahil)
+    metrics.observe_stage(turn, "upstream", time.perf_counter() - started - turn["timings"].get("queue", 0.0))
+
+def turn_response(turn: dict, body: dict):
+    started = time.perf_counter()
+    response = jsonify(body)
+    metrics.observe_stage(turn, "serialization", time.perf_counter() - started)
+    return response
+
+def routed(turn: dict, route: dict):
+    # Cevabı hangi model verdi; yedeğe geçildiyse / hedge yapıldıysa denenenler de
+    turn["meta"]["model"] = route["model"]
+    if len(route["tried"]) > 1:
+        turn["meta"]["route"] = {"tried": route["tried"], "hedged": route["hedged"]}
+
+def cancel_stage(turn: dict) -> str:
+    # Kuyruk süresi slot alınınca yazılır: ondan sonra istek upstream'e gitti sayılır
+    # (stream'de ilk chunk beklenirken, normal çağrıda tekrar denemeden önce iptal dahil)
+    return "upstream" if "queue" in turn["timings"] else "queued"
+
+def abandon_turn(turn: dict, reason: str, stage: str, generated: int = 0):
+    # Yolda kesilen turun harcanan kısmı (prompt + üretilen) yine kotaya yazılır
+    if stage == "upstream":
+        quota_guard.charge(turn["identity"], turn_tokens(turn) + generated)
+    log_cancelled(turn, reason, stage, generated)
+
+def coalesced_usage(turn: dict, usage, shared: bool):
+    # Paylaşılan çağrının token'ları sadece liderde sayılır
+    if shared:
+        turn["meta"]["coalesced"] = True
+        return None
+    return usage
+
+def collect_reply(turn: dict, routed_stream: tuple, parts: list) -> tuple:
+    # Senkron /api/ask de upstream'i stream olarak okur: /api/ask/cancel parçalar arasında
+    # kontrol edilir, iptalde stream kapatılır. (cevap, usage, route) döner
+    stream, route = routed_stream
+    usage = None
+    parts.clear()  # limiter tekrar denerse baştan
     try:
-        story_text = scenario["Hikaye"]
-        system_prompt_text = scenario["System Prompt"]
-
-        system_content = (
-            f"Hikaye: {story_text}\n"
-            f"""Ana prompt: {system_prompt_text}, If the other party becomes aggressive, disrespectful, or uses profanity, do not continue negotiating. 
-            Calmly say, “This conversation is no longer productive. I’m ending the negotiation here.” 
-            In Turkish, also say: "Görüşmeyi burada sonlandırıyorum." 
-            Then stop all responses and end the conversation. 
-            Do not argue or justify your decision.
-            """
-        )
+        for chunk in stream:
+            turn["cancel"].check()
+            if not chunk.choices:
+                usage = chunk.usage or usage
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+    except BaseException:
+        close_stream(stream)
+        raise
+    return "".join(parts), usage, route
+
+def finish_turn(turn: dict, answer: str, usage=None, goal: dict = None) -> dict:
+    # Cevap gövdesi; konuşma varsa yeni tur store'a yazılır.
+    # goal: stream'de parça parça hesaplanan sonuç; yoksa tam cevap burada taranır
+    if turn["meta"].get("cache") == "miss" and answer:
+        response_cache.put(turn["cache_key"], answer)
+    usage = usage_summary(usage)
+    record_usage(turn["scenario_id"], usage)
+    metrics.record_tokens(turn["scenario_id"], turn["meta"].get("model", CHAT_MODEL), usage)
+    if usage:
+        quota_guard.charge(turn["identity"], usage["prompt_tokens"] + usage["completion_tokens"])
+        turn["meta"]["usage"] = usage
+    body = {"answer": answer, **(goal or turn["scenario"].goal_detector.check(answer)), "meta": turn["meta"]}
+    conversation = turn["conversation"]
+    if conversation is not None:
+        conversation["history"] = conversation["history"] + [
+            {"sender": "user", "text": turn["user_input"]},
+            {"sender": "ai", "text": answer},
+        ]
+        conversation["updated_at"] = time.time()
+        session_store.save(conversation)
+        body["conversation_id"] = conversation["id"]
+    return body
+
+# ---- Taslak ön hazırlığı (/api/ask/draft, bkz. prefetch.py) ----
+def draft_keys(turn: dict, text: str) -> tuple:
+    # (tur öneki, taslak) anahtarları; nihai /api/ask aynı anahtarlarla eşleşir
+    params = {
+        "owner": turn["identity"],
+        "model": ",".join(turn["scenario"].models),
+        "scenario": turn["scenario"].version,
+    }
+    return (
+        cache_key(turn["scenario_id"], turn["history"], "", params),
+        cache_key(turn["scenario_id"], turn["history"], text, params),
+    )
+
+def draft_generate(turn: dict) -> dict:
+    answer, usage, route = complete_routed(turn["scenario_id"], turn_messages(turn), turn["identity"])
+    tokens = usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+    quota_guard.charge(turn["identity"], tokens)
+    return {"answer": answer, "route": route, "tokens": tokens}
+
+def draft_warm(turn: dict) -> int:
+    # Sadece önek (system prompt + geçmiş); tek token'lık cevap
+    messages = turn_messages(turn)[:-1]
+    if count_message_tokens(messages) < DRAFT_WARM_MIN_TOKENS:
+        return 0
+    model = model_router.candidates(turn["scenario"].models)[0]
+    chat_completion = upstream_limiter.call(
+        lambda: llm_providers.create(model, messages=messages, max_tokens=1),
+        count_message_tokens(messages),
+    )
+    usage = usage_summary(chat_completion.usage)
+    record_usage(turn["scenario_id"], usage)
+    metrics.record_tokens(turn["scenario_id"], model, usage)
+    tokens = usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+    quota_guard.charge(turn["identity"], tokens)
+    return tokens
+
+draft_prefetcher = None
+if DRAFT_PREFETCH:
+    # Gerçek istekler slot bekliyorsa spekülatif çağrı yapılmaz
+    draft_prefetcher = DraftPrefetcher(draft_generate, draft_warm, lambda: upstream_limiter.waiting > 0)
+
+def draft_future(turn: dict):
+    if draft_prefetcher is None:
+        return None
+    return draft_prefetcher.take(*draft_keys(turn, turn["user_input"]))
 
-        messages = [{"role": "system", "content": system_content}]
-        for m in history:
-            if m.get("sender") == "user":
-                messages.append({"role": "user", "content": m.get("text", "")})
-            else:
-                messages.append({"role": "assistant", "content": m.get("text", "")})
-        messages.append({"role": "user", "content": user_input})
-
-        chat_completion = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages
-        )
-        answer = chat_completion.choices[0].message.content
-        return jsonify({"answer": answer})
+def use_draft(turn: dict, result):
+    # Ön üretim başarısızsa (None) normal yoldan devam; token'lar üretimde sayıldı
+    if result is None:
+        return None
+    turn["meta"]["draft"] = "hit"
+    routed(turn, result["route"])
+    return result["answer"]
+
+def drafted_answer(turn: dict):
+    future = draft_future(turn)
+    return use_draft(turn, future.result()) if future is not None else None
 
+@app.post("/api/ask/draft")
+def ask_draft():
+    # GameScreen yazılırken debounce'lu çağırır; cevap beklenmez
+    if draft_prefetcher is None:
+        return jsonify({"status": "disabled"}), 202
+
+    data = request.json or {}
+    draft = data.get("draft") if isinstance(data, dict) else None
+    if not isinstance(draft, str):
+        return jsonify({"error": "Missing draft"}), 400
+    turn, error = parse_ask_payload({**data, "user_input": draft}, current_user_from_auth_header())
+    if error:
+        body, status = error
+        return jsonify(body), status
+
+    # /api/ask'in hız sınırından ayrı: taslaklar oyuncunun istek hakkını yemesin
+    turn["identity"] = quota_guard.identity(turn["user"], request_ip())
+    if not quota_guard.hit(f"draft:{turn['identity']}", DRAFT_RATE_LIMIT):
+        return jsonify({"status": "rate_limited"}), 429
+    prefix, key = draft_keys(turn, draft)
+    text = normalize_input(draft)
+    if not text:
+        draft_prefetcher.cancel(prefix)
+        return jsonify({"status": "cancelled"}), 202
+    if quota_guard.tokens_remaining(turn["identity"]) == 0:
+        return jsonify({"status": "quota"}), 202
+    return jsonify({"status": draft_prefetcher.update(prefix, key, turn, text)}), 202
+
+@app.post("/api/ask")
+def ask():
+    turn, error = parse_ask_request()
+    if error:
+        return error
+
+    # Accept: text/event-stream → /api/ask/stream ile aynı akış
+    if "text/event-stream" in request.headers.get("Accept", ""):
+        return ask_stream_response(turn)
+
+    trace = g.trace
+    with trace.stage("cache"):
+        answer = cached_answer(turn)
+    if answer is None:
+        with trace.stage("draft"):
+            answer = drafted_answer(turn)
+    if answer is not None:
+        return turn_response(turn, finish_turn(turn, answer))
+
+    # İptal kuyrukta beklerken de, cevap akarken de işler (stream olarak okunur; hedge yok)
+    handle = inflight_turns.register(turn)
+    parts = []
+    try:
+        with trace.stage("messages"):
+            messages = turn_messages(turn)
+
+        started = time.perf_counter()
+        with trace.stage("openai"):
+            (answer, usage, route), shared = upstream_flight.do(
+                request_key(",".join(turn["scenario"].models), messages),
+                lambda: upstream_limiter.call(
+                    queued(turn, lambda: collect_reply(turn, model_router.complete(
+                        turn["scenario"].models,
+                        lambda model, timeout: llm_providers.create(
+                            model,
+                            messages=messages,
+                            stream=True,
+                            stream_options={"include_usage": True},
+                            timeout=timeout,
+                        ),
+                        stream=True,
+                    ), parts)),
+                    turn_tokens(turn),
+                ),
+            )
+        observe_upstream(turn, started)
+        routed(turn, route)
+        with trace.stage("finish"):
+            body = finish_turn(turn, answer, coalesced_usage(turn, usage, shared))
+        return turn_response(turn, body)
+
+    except UpstreamBusy as e:
+        metrics.count_error("/api/ask", e)
+        return busy_response(e)
+    except TurnCancelled as e:
+        abandon_turn(turn, e.reason, cancel_stage(turn), len(parts))
+        return jsonify({"error": "Cancelled"}), 499
     except Exception as e:
         print(f"OpenAI API Error: {e}")
+        metrics.count_error("/api/ask", e)
+        trace.fail(e)
         return jsonify({"error": "Soru cevaplanırken hata oluştu"}), 500
+    finally:
+        inflight_turns.unregister(handle)
+
+@app.post("/api/ask/stream")
+def ask_stream():
+    turn, error = parse_ask_request()
+    if error:
+        return error
+    return ask_stream_response(turn)
+
+@app.post("/api/ask/cancel")
+def cancel_turn():
+    # Terk edilen tur (ör. frontend timeout'u): turn_id veya konuşmanın yoldaki turları
+    data = request.json or {}
+    turn_id, conversation_id = data.get("turn_id"), data.get("conversation_id")
+    if not turn_id and not conversation_id:
+        return jsonify({"error": "Missing turn_id or conversation_id"}), 400
+    user = current_user_from_auth_header()
+    owner = quota_guard.identity(user, request_ip())
+    cancelled = inflight_turns.cancel(
+        owner, str(turn_id) if turn_id else None, str(conversation_id) if conversation_id else None,
+    )
+    return jsonify({"cancelled": cancelled})
+
+def ask_stream_response(turn: dict):
+    route = request.url_rule.rule
+    trace = g.trace
+    messages = None
+    release = None
+    # Akış başlamadan hata: /api/ask ile aynı JSON gövde
+    try:
+        with trace.stage("cache"):
+            cached = cached_answer(turn)
+        if cached is None:
+            with trace.stage("draft"):
+                cached = drafted_answer(turn)
+        if cached is None:
+            # Slot akış boyunca tutulur; yer yoksa akış başlamadan 503
+            with trace.stage("messages"):
+                messages = turn_messages(turn)
+            started = time.perf_counter()
+            release = upstream_limiter.acquire(turn_tokens(turn))
+            metrics.observe_stage(turn, "queue", time.perf_counter() - started)
+    except UpstreamBusy as e:
+        metrics.count_error(route, e)
+        return busy_response(e)
+    except Exception as e:
+        print(f"OpenAI API Error: {e}")
+        metrics.count_error(route, e)
+        trace.fail(e)
+        if release:
+            release()
+        return jsonify({"error": "Soru cevaplanırken hata oluştu"}), 500
+    if cached is None:
+        handle = inflight_turns.register(turn)
+
+    def generate():
+        if cached is not None:
+            yield sse_event({"delta": cached})
+            yield sse_event(finish_turn(turn, cached), event="done")
+            return
+
+        parts = []
+        usage = None
+        stream = None
+        finished = False
+        goal = turn["scenario"].goal_detector.tracker()
+        started = time.perf_counter()
+        try:
+            handle.check()
+            stream, model_route = upstream_limiter.retry(
+                lambda: model_router.complete(
+                    turn["scenario"].models,
+                    lambda model, timeout: llm_providers.create(
+                        model,
+                        messages=messages,
+                        stream=True,
+                        stream_options={"include_usage": True},
+                        timeout=timeout,
+                    ),
+                    stream=True,
+                )
+            )
+            routed(turn, model_route)
+            for chunk in stream:
+                # /api/ask/cancel parçalar arasında kontrol edilir
+                handle.check()
+                if not chunk.choices:
+                    # include_usage: son chunk'ta choices boş, usage dolu gelir
+                    usage = chunk.usage or usage
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if not parts:
+                        metrics.observe_stage(turn, "first_token", time.perf_counter() - started)
+                    parts.append(delta)
+                    yield sse_event({"delta": delta})
+                    if goal.feed(delta):
+                        # Hedef cümle akış bitmeden yakalandı
+                        yield sse_event(goal.result(), event="goal")
+            metrics.observe_stage(turn, "upstream", time.perf_counter() - started)
+            # Son olay: tam cevap, /api/ask ile aynı şekil
+            finished = True
+            yield sse_event(finish_turn(turn, "".join(parts), usage, goal.result()), event="done")
+        except TurnCancelled as e:
+            close_stream(stream)
+            abandon_turn(turn, e.reason, cancel_stage(turn), len(parts))
+            yield sse_event({"error": "Cancelled"}, event="cancelled")
+        except GeneratorExit:
+            # İstemci koptu: WSGI sunucusu yazamayınca generator'ı kapatır
+            if not finished:
+                close_stream(stream)
+                abandon_turn(turn, "disconnect", cancel_stage(turn), len(parts))
+            raise
+        except Exception as e:
+            print(f"OpenAI API Error (stream): {e}")
+            metrics.count_error(route, e)
+            trace.fail(e)
+            yield sse_event({"error": "Soru cevaplanırken hata oluştu"}, event="error")
+        finally:
+            release()
+            inflight_turns.unregister(handle)
+
+    headers = {
+        "Cache-Control": "no-cache",
+        # Render/nginx gibi proxy'lerin akışı tamponlamasını engelle
+        "X-Accel-Buffering": "no",
+    }
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream", headers=headers)
+    if release:
+        # generator hiç çalışmadan kapanırsa (istemci koptu) slot yine bırakılsın
+        response.call_on_close(release)
+        response.call_on_close(lambda: inflight_turns.unregister(handle))
+    return response
+
+@app.post("/api/batch")
+def run_batch():
+    # Gövde JSONL iş listesi; her iş bitince sonucu bir satır olarak akar
+    user = current_user_from_auth_header()
+    if not user:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    try:
+        jobs = parse_jobs(request.get_data(as_text=True).splitlines())
+    except JobError as e:
+        return jsonify({"error": str(e)}), 400
+
+    ip = request_ip()
+    decision = quota_guard.check(user, ip)
+    if not decision.allowed:
+        headers = {**decision.headers, "Retry-After": str(decision.retry_after)}
+        return jsonify({"error": "İstek sınırına ulaştınız, lütfen biraz sonra tekrar deneyin."}), 429, headers
+
+    # Her iş bir /api/ask isteği gibi hız sınırından geçer; yukarıdaki kontrol ilk işi saydı
+    prepaid = [decision]
+
+    def admit():
+        try:
+            prepaid.pop()
+            return
+        except IndexError:
+            pass
+        # Toplu iş acele etmez: sınır doluysa pencere açılana kadar bekler
+        for attempt in range(BATCH_BUSY_RETRIES + 1):
+            job_decision = quota_guard.check(user, ip)
+            if job_decision.allowed:
+                return
+            if quota_guard.tokens_remaining(decision.identity) == 0:
+                raise QuotaExceeded("daily token quota exceeded")
+            if attempt < BATCH_BUSY_RETRIES:
+                time.sleep(job_decision.retry_after)
+        raise QuotaExceeded("rate limit exceeded")
+
+    def complete(scenario_id, messages):
+        # Kota tur başına kontrol edilir: büyük bir batch günlük kotayı aşamaz
+        if quota_guard.tokens_remaining(decision.identity) == 0:
+            raise QuotaExceeded("daily token quota exceeded")
+        answer, usage = complete_messages(scenario_id, messages, decision.identity)
+        quota_guard.charge(decision.identity, usage["prompt_tokens"] + usage["completion_tokens"])
+        return answer, usage
+
+    def generate():
+        prepare = lambda scenario_id, history, user_input: scripted_messages(
+            scenario_id, history, user_input, decision.identity
+        )
+        for result in run_jobs(jobs, scenario_registry, prepare, complete, BATCH_PARALLELISM, admit):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson", headers=headers)
+
+def runtime_stats(limiter, flight) -> dict:
+    return {
+        "upstream": limiter.stats(),
+        "coalescing": flight.stats(),
+        "models": model_router.stats(),
+        "providers": llm_providers.stats(),
+        "response_cache": response_cache.stats() if response_cache else None,
+        "prompt_cache": prompt_cache_stats.snapshot(),
+        "drafts": draft_prefetcher.stats() if draft_prefetcher else None,
+        "turns": inflight_turns.stats(),
+    }
+
+@app.get("/api/stats")
+def get_stats():
+    return jsonify(runtime_stats(upstream_limiter, upstream_flight))
+
+def register_limiter_metrics(limiter, mode: str):
+    # Limiter'ın zaten tuttuğu sayaçlar scrape anında okunur
+    for name, kind, help_text, field in (
+        ("convince_upstream_in_flight", "gauge", "OpenAI calls holding a slot", "in_flight"),
+        ("convince_upstream_queue_depth", "gauge", "Requests waiting for an OpenAI slot", "waiting"),
+        ("convince_upstream_rejected_total", "counter", "Requests rejected with 503 (queue full / timeout)", "rejected"),
+        ("convince_upstream_retries_total", "counter", "OpenAI calls retried after 429 / 5xx", "retries"),
+    ):
+        metrics.register_sampler(name, kind, help_text, ("mode",), lambda f=field: {(mode,): getattr(limiter, f)})
+
+register_limiter_metrics(upstream_limiter, "sync")
+
+def conversation_view(conversation: dict) -> dict:
+    return {
+        "id": conversation["id"],
+        "scenario_id": conversation["scenario_id"],
+        "history": conversation["history"],
+        "created_at": conversation["created_at"],
+        "updated_at": conversation["updated_at"],
+    }
+
+@app.post("/api/conversations")
+def create_conversation():
+    user = current_user_from_auth_header()
+    if not user:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    data = request.json or {}
+    scenario = scenario_registry.get(data.get("scenario_id"))
+    if not scenario:
+        return jsonify({"error": "Invalid scenario_id"}), 400
+
+    # Frontend'deki gibi geçmiş, senaryonun ilk mesajıyla başlar
+    conversation = new_conversation(user["sub"], scenario.id, scenario.opening)
+    session_store.save(conversation)
+    return jsonify(conversation_view(conversation)), 201
+
+@app.post("/api/scenarios/<ref>/start")
+def start_scenario(ref):
+    # Açılış mesajı senaryoda hazır, model çağrısı yok (prompt'taki "Start the simulation
+    # with your first message" turu). Girişli kullanıcıya ilk mesajla başlayan sunucu
+    # tarafı konuşma açılır, ilk /api/ask conversation_id ile devam eder; anonimde
+    # geçmiş tohumu döner ve /api/ask'e history olarak gönderilir.
+    scenario = scenario_registry.get(ref)
+    if scenario is None:
+        return jsonify({"error": "Scenario not found"}), 404
+
+    user = current_user_from_auth_header()
+    if not user:
+        metrics.inc("convince_scenario_starts_total", (str(scenario.id), "anonymous"))
+        return Response(scenario.start_body, content_type="application/json")
+
+    conversation = new_conversation(user["sub"], scenario.id, scenario.opening)
+    session_store.save(conversation)
+    metrics.inc("convince_scenario_starts_total", (str(scenario.id), "conversation"))
+    return jsonify(scenario.start(conversation["id"])), 201
+
+@app.get("/api/conversations/<conversation_id>")
+def get_conversation(conversation_id):
+    conversation, error = load_conversation(conversation_id, current_user_from_auth_header())
+    if error:
+        body, status = error
+        return jsonify(body), status
+    return jsonify(conversation_view(conversation))
+
+if not LAZY_INIT:
+    warm_up()
 
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,343 @@
+import asyncio
+import json
+import os
+import time
+
+from a2wsgi import WSGIMiddleware
+
+from app import (
+    app, EXPOSED_HEADERS, abandon_turn, cached_answer, cancel_stage, check_quota, client_ip,
+    coalesced_usage, decode_user, draft_future, finish_turn, inflight_turns, llm_providers, model_router,
+    observe_upstream, parse_ask_payload, queued, register_limiter_metrics, routed, runtime_stats, sse_event,
+    turn_messages, turn_tokens, use_draft,
+)
+from cancellation import TurnCancelled, abandonable, aclose_stream
+import metrics
+import tracing
+from singleflight import AsyncSingleFlight, request_key
+from upstream import AsyncUpstreamLimiter, UpstreamBusy
+
+# Çalıştırma: uvicorn asgi:application --host 0.0.0.0 --port $PORT
+#   (veya gunicorn -k uvicorn.workers.UvicornWorker asgi:application)
+# /api/ask ve /api/ask/stream burada asyncio ile yürür; tek process yüzlerce
+# OpenAI çağrısını aynı anda bekleyebilir. Diğer tüm route'lar (/api/scenarios,
+# /api/auth/*) Flask uygulamasına thread havuzu üzerinden aktarılır.
+
+# ---- Config ----
+WSGI_THREADS = int(os.environ.get("ASGI_WSGI_THREADS", "10"))
+
+# OpenAI / yerel sağlayıcıların asenkron istemcileri ve bağlantı havuzları app.llm_providers'ta
+# (ilk /api/ask'te kurulur); kapanışta burada kapatılır.
+upstream_flight = AsyncSingleFlight()
+upstream_limiter = AsyncUpstreamLimiter()
+register_limiter_metrics(upstream_limiter, "async")
+
+wsgi_app = WSGIMiddleware(app, workers=WSGI_THREADS)
+
+# flask_cors varsayılanı ile aynı: tüm origin'lere izin
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-expose-headers", ", ".join(EXPOSED_HEADERS).encode()),
+]
+
+# ---- Helpers ----
+async def read_json(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    if not body:
+        return {}
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+async def send_json(send, body: dict, status: int = 200, headers: list = (), turn: dict = None):
+    started = time.perf_counter()
+    payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+    if turn is not None:
+        metrics.observe_stage(turn, "serialization", time.perf_counter() - started)
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(payload)).encode()),
+            *CORS_HEADERS,
+            *headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": payload})
+
+async def send_busy(send, error: UpstreamBusy, headers: list = ()):
+    await send_json(
+        send,
+        {"error": "Sunucu şu anda çok yoğun, lütfen birazdan tekrar deneyin."},
+        503,
+        [(b"retry-after", str(error.retry_after).encode()), *headers],
+    )
+
+def header(scope, name: bytes) -> str:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return ""
+
+def encode_headers(headers: dict) -> list:
+    return [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()]
+
+def wants_stream(scope) -> bool:
+    return "text/event-stream" in header(scope, b"accept")
+
+async def drafted_answer(turn: dict):
+    # Taslaktan ön üretim (app.draft_prefetcher, thread havuzunda); bitmediyse beklenir
+    future = draft_future(turn)
+    return use_draft(turn, await asyncio.wrap_future(future)) if future is not None else None
+
+# ---- Business endpoints ----
+async def ask(scope, receive, send, stream: bool, trace):
+    with trace.stage("parse"):
+        data = await read_json(receive)
+        if data is not None:
+            turn, error = parse_ask_payload(data, decode_user(header(scope, b"authorization")))
+    if data is None:
+        return await send_json(send, {"error": "Invalid JSON body"}, 400)
+    if error:
+        return await send_json(send, *error)
+
+    trace.bind(turn)
+    remote_addr = (scope.get("client") or ("unknown",))[0]
+    with trace.stage("quota"):
+        limited = check_quota(turn, client_ip(header(scope, b"x-forwarded-for"), remote_addr))
+    if limited:
+        body, status, headers = limited
+        return await send_json(send, body, status, encode_headers(headers))
+    quota_headers = encode_headers(turn["quota_headers"])
+
+    if stream:
+        return await ask_stream(trace, receive, send, turn, quota_headers)
+
+    with trace.stage("cache"):
+        answer = cached_answer(turn)
+    if answer is None:
+        with trace.stage("draft"):
+            answer = await drafted_answer(turn)
+    if answer is not None:
+        return await send_json(send, finish_turn(turn, answer), headers=quota_headers, turn=turn)
+
+    # İstemci koparsa veya /api/ask/cancel gelirse bekleme ve (tek bekleyen buysa) upstream çağrısı iptal
+    handle = inflight_turns.register(turn)
+    key = None
+    try:
+        # Özet gerekirse senkron bir OpenAI çağrısı yapar → event loop'u bloklamasın
+        with trace.stage("messages"):
+            messages = await asyncio.to_thread(turn_messages, turn)
+
+        started = time.perf_counter()
+        key = request_key(",".join(turn["scenario"].models), messages)
+        with trace.stage("openai"):
+            (chat_completion, route), shared = await abandonable(asyncio.ensure_future(upstream_flight.do(
+                key,
+                lambda: upstream_limiter.call(
+                    queued(turn, lambda: model_router.acomplete(
+                        turn["scenario"].models,
+                        lambda model, timeout: llm_providers.acreate(
+                            model,
+                            messages=messages,
+                            timeout=timeout,
+                        ),
+                    )),
+                    turn_tokens(turn),
+                ),
+            )), receive, handle)
+        observe_upstream(turn, started)
+        routed(turn, route)
+        answer = chat_completion.choices[0].message.content
+        with trace.stage("finish"):
+            body = finish_turn(turn, answer, coalesced_usage(turn, chat_completion.usage, shared))
+        return await send_json(send, body, headers=quota_headers, turn=turn)
+
+    except UpstreamBusy as e:
+        metrics.count_error(scope["path"], e)
+        return await send_busy(send, e, quota_headers)
+    except TurnCancelled as e:
+        # Paylaşılan çağrıyı bekleyen başka istek varsa çağrı sürer, tasarruf yok
+        if key is not None and upstream_flight.waiters(key):
+            stage = "coalesced"
+        else:
+            stage = cancel_stage(turn)
+        abandon_turn(turn, e.reason, stage)
+        return await send_json(send, {"error": "Cancelled"}, 499, quota_headers)
+    except Exception as e:
+        print(f"OpenAI API Error: {e}")
+        metrics.count_error(scope["path"], e)
+        trace.fail(e)
+        return await send_json(send, {"error": "Soru cevaplanırken hata oluştu"}, 500, quota_headers)
+    finally:
+        inflight_turns.unregister(handle)
+
+async def ask_stream(trace, receive, send, turn: dict, quota_headers: list):
+    route = trace.route
+    messages = None
+    release = None
+    # Akış başlamadan hata: /api/ask ile aynı JSON gövde
+    try:
+        with trace.stage("cache"):
+            cached = cached_answer(turn)
+        if cached is None:
+            with trace.stage("draft"):
+                cached = await drafted_answer(turn)
+        if cached is None:
+            with trace.stage("messages"):
+                messages = await asyncio.to_thread(turn_messages, turn)
+            started = time.perf_counter()
+            release = await upstream_limiter.acquire(turn_tokens(turn))
+            metrics.observe_stage(turn, "queue", time.perf_counter() - started)
+    except UpstreamBusy as e:
+        metrics.count_error(route, e)
+        return await send_busy(send, e, quota_headers)
+    except Exception as e:
+        print(f"OpenAI API Error: {e}")
+        metrics.count_error(route, e)
+        trace.fail(e)
+        if release:
+            release()
+        return await send_json(send, {"error": "Soru cevaplanırken hata oluştu"}, 500, quota_headers)
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", b"text/event-stream; charset=utf-8"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+            *CORS_HEADERS,
+            *quota_headers,
+        ],
+    })
+
+    async def emit(text: str):
+        await send({"type": "http.response.body", "body": text.encode("utf-8"), "more_body": True})
+
+    if cached is not None:
+        await emit(sse_event({"delta": cached}))
+        await emit(sse_event(finish_turn(turn, cached), event="done"))
+        return await send({"type": "http.response.body", "body": b""})
+
+    parts = []
+    upstream = {"stream": None}
+
+    async def pump():
+        usage = None
+        goal = turn["scenario"].goal_detector.tracker()
+        started = time.perf_counter()
+        stream, model_route = await upstream_limiter.retry(
+            lambda: model_router.acomplete(
+                turn["scenario"].models,
+                lambda model, timeout: llm_providers.acreate(
+                    model,
+                    messages=messages,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    timeout=timeout,
+                ),
+                stream=True,
+            )
+        )
+        upstream["stream"] = stream
+        routed(turn, model_route)
+        async for chunk in stream:
+            if not chunk.choices:
+                usage = chunk.usage or usage
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if not parts:
+                    metrics.observe_stage(turn, "first_token", time.perf_counter() - started)
+                parts.append(delta)
+                await emit(sse_event({"delta": delta}))
+                if goal.feed(delta):
+                    await emit(sse_event(goal.result(), event="goal"))
+        metrics.observe_stage(turn, "upstream", time.perf_counter() - started)
+        await emit(sse_event(finish_turn(turn, "".join(parts), usage, goal.result()), event="done"))
+
+    # İstemci koparsa / iptal gelirse akış durur, upstream stream'i kapatılır (üretim durur)
+    handle = inflight_turns.register(turn)
+    try:
+        await abandonable(asyncio.ensure_future(pump()), receive, handle)
+    except TurnCancelled as e:
+        await aclose_stream(upstream["stream"])
+        abandon_turn(turn, e.reason, cancel_stage(turn), len(parts))
+        await emit(sse_event({"error": "Cancelled"}, event="cancelled"))
+    except Exception as e:
+        print(f"OpenAI API Error (stream): {e}")
+        metrics.count_error(route, e)
+        trace.fail(e)
+        await emit(sse_event({"error": "Soru cevaplanırken hata oluştu"}, event="error"))
+    finally:
+        release()
+        inflight_turns.unregister(handle)
+
+    await send({"type": "http.response.body", "body": b""})
+
+# ---- ASGI entrypoint ----
+ASYNC_ROUTES = {
+    "/api/ask": False,
+    "/api/ask/stream": True,
+}
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await llm_providers.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def tracked(scope, send, handler):
+    # Flask dışındaki route'lar için before/after_request karşılığı; status ilk mesajdan okunur
+    route, method = scope["path"], scope["method"]
+    started = metrics.request_started(route)
+    carrier = None
+    if tracing.TRACE_OTEL:
+        carrier = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope.get("headers", [])}
+    trace = tracing.Trace(route, method, header(scope, b"x-request-id"), carrier)
+    status = [500]
+
+    async def tracked_send(message):
+        if message["type"] == "http.response.start":
+            status[0] = message["status"]
+            message["headers"] = [*message["headers"], (b"x-request-id", trace.request_id.encode("latin-1"))]
+        await send(message)
+
+    try:
+        return await handler(tracked_send, trace)
+    except Exception as e:
+        metrics.count_error(route, e)
+        trace.fail(e)
+        raise
+    finally:
+        metrics.request_finished(route, method, status[0], started)
+        trace.finish(status[0])
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+
+    if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] in ASYNC_ROUTES:
+        stream = ASYNC_ROUTES[scope["path"]] or wants_stream(scope)
+        return await tracked(
+            scope, send, lambda tracked_send, trace: ask(scope, receive, tracked_send, stream, trace)
+        )
+
+    # Bu process'in asenkron limiter / coalescing sayaçları
+    if scope["type"] == "http" and scope["method"] == "GET" and scope["path"] == "/api/stats":
+        return await send_json(send, runtime_stats(upstream_limiter, upstream_flight))
+
+    return await wsgi_app(scope, receive, send)
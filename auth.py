@@ -0,0 +1,46 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Doğrulanmış JWT → claims için küçük, sınırlı LRU.
+# Aynı token her istekte yeniden parse + HMAC doğrulamasından geçmesin diye.
+# Kayıtlar token'ın kendi `exp` zamanına kadar geçerli; süresi dolan token cache'ten dönmez.
+
+AUTH_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_SIZE", "1024"))
+
+class VerifiedTokenCache:
+    def __init__(self, max_entries: int = AUTH_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # token -> claims
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str):
+        now = time.time()
+        with self._lock:
+            claims = self._data.get(token)
+            if claims is None:
+                self.misses += 1
+                return None
+            if claims.get("exp", 0) <= now:
+                del self._data[token]
+                self.misses += 1
+                return None
+            self._data.move_to_end(token)
+            self.hits += 1
+            return claims
+
+    def put(self, token: str, claims: dict):
+        if self.max_entries <= 0 or "exp" not in claims:
+            return
+        with self._lock:
+            self._data[token] = claims
+            self._data.move_to_end(token)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._data)}
@@ -0,0 +1,253 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from upstream import UpstreamBusy
+
+# Senaryolu (scripted) oyuncu konuşmalarını toplu çalıştırır; eğitim grupları için değerlendirme.
+# Girdi JSONL, satır başına bir iş:
+#   {"id": "ayse-1", "scenario_id": 3, "turns": ["Merhaba", "Fiyatta anlaşalım", ...]}
+# Bir işin turları sıralı (her cevap bir sonraki turun geçmişine girer), işler
+# arasında en fazla BATCH_PARALLELISM paralel. Sonuçlar bitiş sırasıyla JSONL akar.
+# Prompt'lar /api/ask ile aynı yoldan kurulur (derlenmiş system prompt + pencereleme).
+#
+#   POST /api/batch                                  giriş gerekli; gövde JSONL → application/x-ndjson
+#   python batch_eval.py jobs.jsonl [-o out.jsonl] [--parallelism 8]
+#   python batch_eval.py jobs.jsonl --offline        sağlayıcının Batch API'si (indirimli, 24 saate kadar)
+
+BATCH_PARALLELISM = int(os.environ.get("BATCH_PARALLELISM", "4"))
+BATCH_MAX_JOBS = int(os.environ.get("BATCH_MAX_JOBS", "500"))
+BATCH_MAX_TURNS = int(os.environ.get("BATCH_MAX_TURNS", "30"))
+BATCH_BUSY_RETRIES = int(os.environ.get("BATCH_BUSY_RETRIES", "5"))
+BATCH_POLL_INTERVAL = float(os.environ.get("BATCH_POLL_INTERVAL", "30"))
+
+class JobError(ValueError):
+    pass
+
+def parse_jobs(lines) -> list:
+    jobs = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError:
+            raise JobError(f"line {number}: invalid JSON")
+        if not isinstance(job, dict):
+            job = {}
+        turns = job.get("turns")
+        if job.get("scenario_id") is None or not isinstance(turns, list) or not turns \
+                or not all(isinstance(t, str) for t in turns):
+            raise JobError(f"line {number}: expected {{\"scenario_id\": ..., \"turns\": [\"...\", ...]}}")
+        if len(turns) > BATCH_MAX_TURNS:
+            raise JobError(f"line {number}: more than {BATCH_MAX_TURNS} turns")
+        jobs.append({"id": job.get("id", number), "scenario_id": job["scenario_id"], "turns": turns})
+        if len(jobs) > BATCH_MAX_JOBS:
+            raise JobError(f"more than {BATCH_MAX_JOBS} jobs")
+    if not jobs:
+        raise JobError("no jobs")
+    return jobs
+
+def opening_history(scenario) -> list:
+    # Oyundaki gibi konuşma senaryonun ilk mesajıyla başlar
+    return list(scenario.opening)
+
+def job_result(job: dict) -> dict:
+    return {"id": job["id"], "scenario_id": job["scenario_id"], "goal_reached": False, "score": None, "turns": []}
+
+def add_turn(result: dict, scenario, user_input: str, answer: str, usage: dict):
+    # Tur bazında ve iş bazında hedef / skor (son bildirilen skor geçerli)
+    goal = scenario.goal_detector.check(answer)
+    result["turns"].append({"user_input": user_input, "answer": answer, **goal, "usage": usage})
+    result["goal_reached"] = result["goal_reached"] or goal["goal_reached"]
+    if goal["score"] is not None:
+        result["score"] = goal["score"]
+
+def call_when_free(complete, scenario_id, messages):
+    # Toplu iş acele etmez: kuyruk doluysa canlı trafiğe yol verip bekler
+    for attempt in range(BATCH_BUSY_RETRIES + 1):
+        try:
+            return complete(scenario_id, messages)
+        except UpstreamBusy as e:
+            if attempt == BATCH_BUSY_RETRIES:
+                raise
+            time.sleep(e.retry_after)
+
+def run_job(job: dict, registry, prepare, complete, admit=None) -> dict:
+    # prepare(scenario_id, history, user_input) -> messages
+    # complete(scenario_id, messages) -> (answer, usage)
+    # admit() iş başlamadan çağrılır (hız sınırı); hata fırlatırsa iş hatayla biter
+    result = job_result(job)
+    scenario = registry.get(job["scenario_id"])
+    if not scenario:
+        result["error"] = "Invalid scenario_id"
+        return result
+    result["scenario_id"] = scenario.id
+
+    started = time.monotonic()
+    history = opening_history(scenario)
+    try:
+        if admit is not None:
+            admit()
+        for user_input in job["turns"]:
+            messages = prepare(scenario.id, history, user_input)
+            answer, usage = call_when_free(complete, scenario.id, messages)
+            add_turn(result, scenario, user_input, answer, usage)
+            history = history + [{"sender": "user", "text": user_input}, {"sender": "ai", "text": answer}]
+    except Exception as e:
+        print(f"Batch job {job['id']} failed: {e}")
+        result["error"] = str(e) or e.__class__.__name__
+    result["seconds"] = round(time.monotonic() - started, 3)
+    return result
+
+def run_jobs(jobs: list, registry, prepare, complete, parallelism: int = BATCH_PARALLELISM, admit=None):
+    pool = ThreadPoolExecutor(max_workers=max(1, parallelism), thread_name_prefix="batch")
+    try:
+        futures = [pool.submit(run_job, job, registry, prepare, complete, admit) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # akış yarıda kesilirse (istemci koptu) başlamamış işler iptal
+        pool.shutdown(wait=False, cancel_futures=True)
+
+# ---- Offline: sağlayıcının Batch API'si ----
+# Turlar birbirine bağlı olduğu için her tur ayrı bir batch: k. turda
+# tüm işlerin k. mesajı tek dosyada gider, cevaplar gelince k+1. tur hazırlanır.
+def _batch_usage(usage: dict) -> dict:
+    details = usage.get("prompt_tokens_details") or {}
+    return {
+        "prompt_tokens": usage.get("prompt_tokens") or 0,
+        "completion_tokens": usage.get("completion_tokens") or 0,
+        "cached_tokens": details.get("cached_tokens") or 0,
+    }
+
+def _wait_for_batch(client, batch, poll_interval: float):
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        time.sleep(poll_interval)
+        batch = client.batches.retrieve(batch.id)
+        counts = batch.request_counts
+        if counts:
+            print(f"batch {batch.id}: {batch.status} {counts.completed}/{counts.total}", file=sys.stderr)
+    return batch
+
+def _read_lines(client, file_id) -> list:
+    if not file_id:
+        return []
+    return [json.loads(line) for line in client.files.content(file_id).text.splitlines() if line.strip()]
+
+def run_offline(jobs: list, registry, prepare, client, model: str,
+                poll_interval: float = BATCH_POLL_INTERVAL):
+    states = []
+    for job in jobs:
+        scenario = registry.get(job["scenario_id"])
+        state = {"job": job, "result": job_result(job), "scenario": scenario, "history": None}
+        if scenario:
+            state["result"]["scenario_id"] = scenario.id
+            state["history"] = opening_history(scenario)
+        else:
+            state["result"]["error"] = "Invalid scenario_id"
+        states.append(state)
+
+    round_no = 0
+    while True:
+        pending = {
+            str(i): s for i, s in enumerate(states)
+            if "error" not in s["result"] and len(s["result"]["turns"]) < len(s["job"]["turns"])
+        }
+        if not pending:
+            break
+        round_no += 1
+
+        lines = []
+        for custom_id, state in pending.items():
+            user_input = state["job"]["turns"][len(state["result"]["turns"])]
+            messages = prepare(state["scenario"].id, state["history"], user_input)
+            state["user_input"] = user_input
+            lines.append(json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {"model": model, "messages": messages},
+            }, ensure_ascii=False))
+
+        upload = client.files.create(
+            file=(f"batch-round-{round_no}.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch"
+        )
+        batch = client.batches.create(
+            input_file_id=upload.id, endpoint="/v1/chat/completions", completion_window="24h"
+        )
+        print(f"round {round_no}: {len(lines)} requests → batch {batch.id}", file=sys.stderr)
+        batch = _wait_for_batch(client, batch, poll_interval)
+
+        answered = set()
+        if batch.status == "completed":
+            for row in _read_lines(client, batch.output_file_id) + _read_lines(client, batch.error_file_id):
+                state = pending.get(row.get("custom_id"))
+                if state is None:
+                    continue
+                response = row.get("response") or {}
+                if response.get("status_code") != 200:
+                    state["result"]["error"] = json.dumps(row.get("error") or response.get("body"), ensure_ascii=False)
+                    answered.add(row["custom_id"])
+                    continue
+                body = response["body"]
+                answer = body["choices"][0]["message"]["content"]
+                add_turn(state["result"], state["scenario"], state["user_input"], answer,
+                         _batch_usage(body.get("usage") or {}))
+                state["history"] = state["history"] + [
+                    {"sender": "user", "text": state["user_input"]},
+                    {"sender": "ai", "text": answer},
+                ]
+                answered.add(row["custom_id"])
+        for custom_id, state in pending.items():
+            if custom_id not in answered:
+                state["result"]["error"] = f"batch {batch.id} {batch.status}"
+
+    for state in states:
+        yield state["result"]
+
+# ---- CLI ----
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Senaryolu konuşmaları toplu çalıştır (JSONL → JSONL)")
+    parser.add_argument("jobs", help="JSONL iş dosyası ('-' = stdin)")
+    parser.add_argument("-o", "--output", help="sonuç dosyası (varsayılan stdout)")
+    parser.add_argument("--parallelism", type=int, default=BATCH_PARALLELISM)
+    parser.add_argument("--offline", action="store_true", help="sağlayıcının indirimli Batch API'si")
+    parser.add_argument("--poll-interval", type=float, default=BATCH_POLL_INTERVAL)
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.jobs == "-" else open(args.jobs, encoding="utf-8")
+    with source:
+        jobs = parse_jobs(source)
+
+    # app import'u OpenAI istemcisini ve derlenmiş prompt'ları kurar
+    import app
+
+    if args.offline:
+        # Batch API sağlayıcının kendi istemcisiyle (OPENAI_MODEL "local:..." ise o sunucu)
+        provider, model = app.llm_providers.resolve(app.CHAT_MODEL)
+        results = run_offline(jobs, app.scenario_registry, app.scripted_messages, provider.client, model,
+                              poll_interval=args.poll_interval)
+    else:
+        results = run_jobs(jobs, app.scenario_registry, app.scripted_messages, app.complete_messages,
+                           parallelism=args.parallelism)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    failed = 0
+    try:
+        for result in results:
+            failed += "error" in result
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{len(jobs)} jobs, {failed} failed", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+import argparse
+import os
+import time
+
+# JWT doğrulama maliyeti: her seferinde jwt.decode vs. doğrulanmış token cache'i.
+#   python bench_auth.py --iterations 20000 --rps 50,200,1000
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+os.environ.setdefault("FLASK_SECRET_KEY", "bench")
+
+import jwt  # noqa: E402
+
+import app  # noqa: E402
+
+def measure(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations
+
+def main(args):
+    token = app.issue_jwt({"sub": "google:bench", "name": "Bench", "email": "bench@example.com"})
+    header = f"Bearer {token}"
+
+    def uncached():
+        return jwt.decode(token, app.JWT_SECRET, algorithms=["HS256"], audience="convince-frontend")
+
+    def cached():
+        return app.decode_user(header)
+
+    cached()  # cache'i ısıt
+    with app.app.test_request_context(headers={"Authorization": header}):
+        app.current_user_from_auth_header()
+        scoped = measure(app.current_user_from_auth_header, args.iterations)
+    uncached_cost = measure(uncached, args.iterations)
+    cached_cost = measure(cached, args.iterations)
+
+    # bir istekte auth'a N kez ihtiyaç (oturum, kota, metrik, handler)
+    lookups = args.lookups
+    results = {
+        "jwt.decode (uncached)": uncached_cost,
+        "decode_user (cached)": cached_cost,
+        "g lookup (same request)": scoped,
+        f"request, {lookups} lookups, before": lookups * uncached_cost,
+        f"request, {lookups} lookups, after": cached_cost + (lookups - 1) * scoped,
+    }
+
+    print(f"{'variant':<32} {'per call':>10}  " + "  ".join(f"{r:>6} rps" for r in args.rps))
+    for name, seconds in results.items():
+        # istek hızında tek çekirdek üzerindeki CPU payı
+        shares = "  ".join(f"{seconds * r * 100:>9.3f}%" for r in args.rps)
+        print(f"{name:<32} {seconds * 1e6:>8.1f}µs  {shares}")
+    print(f"speedup (uncached / cached): {uncached_cost / cached_cost:.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JWT doğrulama benchmark'ı")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--lookups", type=int, default=4)
+    parser.add_argument("--rps", default="50,200,1000", type=lambda s: [int(x) for x in s.split(",")])
+    main(parser.parse_args())
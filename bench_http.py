@@ -0,0 +1,231 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import httpx
+
+from loadtest import BENCH_ENV, free_port, percentile, wait_until_up
+from mock_openai import MockOpenAIServer
+
+# Uç nokta benchmark'ı: /api/ask, /api/scenarios, /api/auth/me için throughput ve
+# p50 / p95 / p99, farklı worker modellerinde. OpenAI yerine taklit kullanılır:
+#   --upstream inprocess   LLM_BACKEND=mock (ağ yok; uygulamanın kendi maliyeti)
+#   --upstream http        mock_openai.py sunucusu (OpenAI SDK + bağlantı havuzu da ölçülür)
+# Her uç nokta için sabit sayıda eşzamanlı istemci --duration sn boyunca kapalı döngüde istek atar.
+#
+#   python bench_http.py --models asgi,sync,gthread --concurrency 32 --duration 10
+#   python bench_http.py --save bench-results/$(git rev-parse --short HEAD).json
+#   python bench_http.py --compare bench-results/abc1234.json
+#
+# Yük üreteci aynı makinede çalışır; makineler / commit'ler arası karşılaştırmada aynı
+# --models / --concurrency / --duration değerlerini kullanın.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ENDPOINTS = ("ask", "scenarios", "me")
+
+def server_command(model: str, port: int, workers: int, threads: int) -> list:
+    bind = ["-b", f"127.0.0.1:{port}", "--log-level", "warning"]
+    if model == "asgi":
+        return [sys.executable, "-m", "uvicorn", "asgi:application", "--port", str(port), "--log-level", "warning"]
+    if model == "asgi-workers":
+        return [sys.executable, "-m", "gunicorn", "asgi:application", "-k", "uvicorn.workers.UvicornWorker",
+                "-w", str(workers), *bind]
+    if model == "sync":
+        return [sys.executable, "-m", "gunicorn", "app:app", "-w", str(workers), *bind]
+    if model == "gthread":
+        return [sys.executable, "-m", "gunicorn", "app:app", "-k", "gthread", "-w", str(workers),
+                "--threads", str(threads), *bind]
+    raise ValueError(f"Unknown worker model: {model}")
+
+MODELS = ("asgi", "asgi-workers", "sync", "gthread")
+
+def bench_token() -> str:
+    # Sunucu ile aynı JWT_SECRET; app.issue_jwt ile aynı claim'ler
+    os.environ.update({**BENCH_ENV, "LLM_BACKEND": "mock"})
+    from app import issue_jwt
+
+    return issue_jwt({"sub": "google:bench", "name": "Bench", "email": "bench@example.com"})
+
+def make_request(endpoint: str, scenario_ids: list, token: str):
+    counter = [0]
+
+    def request(http: httpx.AsyncClient):
+        counter[0] += 1
+        i = counter[0]
+        if endpoint == "ask":
+            # Her istek farklı metin: coalescing / cevap cache'i devreye girmesin
+            return http.post("/api/ask", json={
+                "scenario_id": scenario_ids[i % len(scenario_ids)],
+                "user_input": f"Bench {i}: bence bu konuyu tekrar değerlendirmeliyiz.",
+                "history": [],
+            })
+        if endpoint == "scenarios":
+            return http.get("/api/scenarios")
+        if endpoint == "me":
+            return http.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+        raise ValueError(f"Unknown endpoint: {endpoint}")
+    return request
+
+async def run_endpoint(http, request, concurrency: int, duration: float, warmup: int) -> dict:
+    for _ in range(warmup):
+        await request(http)
+
+    latencies, errors = [], {}
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                resp = await request(http)
+                await resp.aread()
+                ok = resp.status_code < 400
+                key = str(resp.status_code)
+            except httpx.HTTPError as e:
+                ok, key = False, e.__class__.__name__
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors[key] = errors.get(key, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    ms = [x * 1000 for x in latencies]
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": percentile(ms, 50),
+        "p95": percentile(ms, 95),
+        "p99": percentile(ms, 99),
+    }
+
+async def bench_model(model: str, args, env: dict, token: str) -> dict:
+    port = free_port()
+    proc = subprocess.Popen(
+        server_command(model, port, args.workers, args.threads),
+        cwd=HERE, env=env, stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    results = {}
+    try:
+        await wait_until_up(base_url + "/")
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as http:
+            index = (await http.get("/api/scenarios/index")).json()
+            scenario_ids = [s["id"] for s in index]
+            for endpoint in args.endpoints:
+                request = make_request(endpoint, scenario_ids, token)
+                results[endpoint] = await run_endpoint(http, request, args.concurrency, args.duration, args.warmup)
+                print_row(model, endpoint, results[endpoint], args.baseline)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return results
+
+def print_header(baseline: dict):
+    line = f"{'model':<13} {'endpoint':<10} {'reqs':>7} {'err':>5} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    if baseline:
+        line += f" {'Δrps':>8} {'Δp95':>8} {'Δp99':>8}"
+    print(line)
+
+def print_row(model: str, endpoint: str, r: dict, baseline: dict):
+    errors = sum(r["errors"].values())
+    line = (f"{model:<13} {endpoint:<10} {r['requests']:>7} {errors:>5} {r['rps']:>9.1f} "
+            f"{r['p50']:>8.1f} {r['p95']:>8.1f} {r['p99']:>8.1f}")
+    base = ((baseline or {}).get(model) or {}).get(endpoint)
+    if base:
+        line += f" {r['rps'] - base['rps']:>+8.1f} {r['p95'] - base['p95']:>+8.1f} {r['p99'] - base['p99']:>+8.1f}"
+    print(line, flush=True)
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+async def main(args) -> int:
+    token = bench_token()
+    env = {**os.environ, **BENCH_ENV}
+    mock = None
+    if args.upstream == "http":
+        mock = await MockOpenAIServer(args.latency, args.tokens_per_second).start()
+        env.update({"LLM_BACKEND": "openai", "OPENAI_API_KEY": "mock", "OPENAI_BASE_URL": mock.base_url})
+    else:
+        env.update({
+            "LLM_BACKEND": "mock",
+            "MOCK_LLM_LATENCY": str(args.latency),
+            "MOCK_LLM_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        })
+
+    args.baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            saved = json.load(f)
+        args.baseline = saved["results"]
+        print(f"comparing with {args.compare} (commit {saved.get('commit')})")
+
+    commit = git_commit()
+    print(f"commit={commit} upstream={args.upstream} latency={args.latency}s "
+          f"tok/s={args.tokens_per_second} concurrency={args.concurrency} duration={args.duration}s "
+          f"workers={args.workers} threads={args.threads}")
+    print_header(args.baseline)
+    results = {}
+    try:
+        for model in args.models:
+            results[model] = await bench_model(model, args, env, token)
+    finally:
+        if mock:
+            await mock.close()
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        config = {k: getattr(args, k) for k in (
+            "models", "endpoints", "upstream", "latency", "tokens_per_second",
+            "concurrency", "duration", "warmup", "workers", "threads",
+        )}
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "commit": commit,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "cpus": os.cpu_count(),
+                "config": config,
+                "results": results,
+            }, f, indent=2)
+        print(f"saved → {args.save}")
+    return 0
+
+def csv_of(choices: tuple):
+    def parse(value: str) -> list:
+        items = [x.strip() for x in value.split(",") if x.strip()]
+        unknown = [x for x in items if x not in choices]
+        if unknown:
+            raise argparse.ArgumentTypeError(f"unknown: {', '.join(unknown)} (choices: {', '.join(choices)})")
+        return items
+    return parse
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Uç nokta benchmark'ı (mock LLM, worker modelleri)")
+    parser.add_argument("--models", type=csv_of(MODELS), default=["asgi", "sync", "gthread"])
+    parser.add_argument("--endpoints", type=csv_of(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("--upstream", choices=["inprocess", "http"], default="inprocess")
+    parser.add_argument("--latency", type=float, default=0.3, help="mock ilk token gecikmesi (sn)")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker sayısı")
+    parser.add_argument("--threads", type=int, default=8, help="gthread worker başına thread")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--save", help="sonuçları JSON olarak kaydet")
+    parser.add_argument("--compare", help="kayıtlı sonuç dosyası")
+    sys.exit(asyncio.run(main(parser.parse_args())))
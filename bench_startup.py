@@ -0,0 +1,143 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Soğuk açılış ölçümü; her koşu yeni bir Python process'i (boşta uyuyan instance'ın uyanması).
+#   python bench_startup.py --runs 10                    import + ilk isteklerin süresi (p50 / p95 / max)
+#   python bench_startup.py --eager                      LAZY_INIT=0 ile karşılaştırma
+#   python bench_startup.py --profile [--top 25]         -X importtime dökümü: modül ve paket bazında
+#   python bench_startup.py --save startup.json          sonuçları sakla
+#   python bench_startup.py --compare startup.json       kayıtlı sonuçla farkı göster
+#   python bench_startup.py --max-import-ms 400          p50 aşılırsa exit 1 (regresyon kontrolü)
+
+BENCH_ENV = {"OPENAI_API_KEY": "bench", "JWT_SECRET": "bench-secret", "FLASK_SECRET_KEY": "bench"}
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def child():
+    # Alt process: ölçümleri tek satır JSON olarak basar
+    timings = {}
+    started = time.perf_counter()
+    import app
+    from lazy import warm_up
+
+    timings["import app"] = time.perf_counter() - started
+    client = app.app.test_client()
+    for name, path in (
+        ("first GET /api/scenarios/index", "/api/scenarios/index"),
+        ("second GET /api/scenarios/index", "/api/scenarios/index"),
+        ("first GET /api/auth/me", "/api/auth/me"),
+    ):
+        started = time.perf_counter()
+        client.get(path)
+        timings[name] = time.perf_counter() - started
+    timings["cold start → first response"] = timings["import app"] + timings["first GET /api/scenarios/index"]
+    # İlk /api/ask ve ilk login'in ödeyeceği kurulum maliyeti (ağ yok)
+    for name, seconds in warm_up().items():
+        timings[f"lazy init: {name}"] = seconds or 0.0
+    print(json.dumps(timings))
+
+def run_child(eager: bool) -> dict:
+    env = {**os.environ, **BENCH_ENV, "LAZY_INIT": "0" if eager else "1"}
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child"],
+        cwd=HERE, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+def benchmark(runs: int, eager: bool) -> dict:
+    samples = [run_child(eager) for _ in range(runs)]
+    results = {}
+    for name in samples[0]:
+        values = [s[name] * 1000 for s in samples]
+        results[name] = {
+            "p50": statistics.median(values),
+            "p95": percentile(values, 0.95),
+            "max": max(values),
+        }
+    return results
+
+def print_results(results: dict, baseline: dict = None):
+    print(f"{'metric':<36} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}" + (f" {'Δp50':>9}" if baseline else ""))
+    for name, row in results.items():
+        line = f"{name:<36} {row['p50']:>9.1f} {row['p95']:>9.1f} {row['max']:>9.1f}"
+        if baseline and name in baseline:
+            line += f" {row['p50'] - baseline[name]['p50']:>+9.1f}"
+        print(line)
+
+# ---- -X importtime ----
+def import_profile(eager: bool) -> list:
+    env = {**os.environ, **BENCH_ENV, "LAZY_INIT": "0" if eager else "1"}
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=HERE, env=env, capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        rows.append((int(self_us), int(cumulative_us), depth, name.strip()))
+    return rows
+
+def print_profile(rows: list, top: int):
+    total = sum(r[0] for r in rows)
+    print(f"total import time: {total / 1000:.1f} ms ({len(rows)} modules)\n")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module (top {top} by cumulative)")
+    for self_us, cumulative_us, depth, name in sorted(rows, key=lambda r: -r[1])[:top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {'  ' * depth}{name}")
+
+    packages = {}
+    for self_us, _, _, name in rows:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+    print(f"\n{'self ms':>9}  package (top {top})")
+    for package, self_us in sorted(packages.items(), key=lambda p: -p[1])[:top]:
+        print(f"{self_us / 1000:>9.1f}  {package}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Soğuk açılış benchmark'ı ve import profili")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--eager", action="store_true", help="LAZY_INIT=0 (her şey import'ta kurulur)")
+    parser.add_argument("--profile", action="store_true", help="-X importtime dökümü")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--save", help="sonuçları JSON olarak kaydet")
+    parser.add_argument("--compare", help="kayıtlı sonuç dosyası")
+    parser.add_argument("--max-import-ms", type=float, help="import app p50 sınırı")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child()
+        return 0
+    if args.profile:
+        print_profile(import_profile(args.eager), args.top)
+        return 0
+
+    results = benchmark(args.runs, args.eager)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print(f"{args.runs} runs, {'eager' if args.eager else 'lazy'} init, python {sys.version.split()[0]}")
+    print_results(results, baseline)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"eager": args.eager, "runs": args.runs, "results": results}, f, indent=2)
+
+    import_p50 = results["import app"]["p50"]
+    if args.max_import_ms and import_p50 > args.max_import_ms:
+        print(f"REGRESSION: import app p50 {import_p50:.1f} ms > {args.max_import_ms:.0f} ms")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
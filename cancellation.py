@@ -0,0 +1,173 @@
+import asyncio
+import threading
+
+import metrics
+from upstream import COMPLETION_TOKENS_ESTIMATE
+
+# Terk edilen turların upstream çağrısını durdurma.
+#   - İstemci bağlantısı koptuğunda: asgi.py'de (normal ve stream) http.disconnect ile,
+#     Flask stream'inde WSGI sunucusu generator'ı kapatınca
+#   - Açık iptal: POST /api/ask/cancel {"turn_id": ...} veya {"conversation_id": ...};
+#     istemci /api/ask'e kendi ürettiği "turn_id"yi gönderir (frontend axios timeout'unda çağırır)
+# İptal edilen tur slotunu hemen bırakır; kuyruktaysa upstream'e hiç gidilmez, yoldaysa
+# HTTP isteği / stream kapatılır ve sağlayıcı üretimi durdurur.
+# Senkron /api/ask (Flask, stream'siz) da upstream'i stream olarak okur (app.collect_reply):
+# iptal parçalar arasında kontrol edilir, yoldaki tur da kesilir.
+#
+# Kazanılan token'lar tahmindir: kuyrukta iptal → prompt + COMPLETION_TOKENS_ESTIMATE,
+# yolda iptal → tahminden üretilmiş kısım düşülür (prompt zaten faturalandı).
+# Kayıt process içinde: çok worker'da iptal isteği başka worker'a düşerse bulunamaz.
+
+metrics.METRICS.update({
+    "convince_turns_cancelled_total": ("counter", "Abandoned turns by reason and stage", ("reason", "stage")),
+    "convince_tokens_saved_total": ("counter", "Estimated tokens saved by cancelling turns", ("scenario",)),
+})
+
+class TurnCancelled(Exception):
+    # singleflight: lider iptal edildiyse bekleyenler çağrıyı kendileri yapar
+    leader_only = True
+
+    def __init__(self, reason: str):
+        super().__init__(f"Turn cancelled ({reason})")
+        self.reason = reason
+
+class TurnHandle:
+    __slots__ = ("owner", "turn_id", "conversation_id", "reason", "_callbacks", "_lock")
+
+    def __init__(self, owner: str, turn_id: str = None, conversation_id: str = None):
+        self.owner = owner
+        self.turn_id = turn_id
+        self.conversation_id = conversation_id
+        self.reason = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def on_cancel(self, fn):
+        # fn başka bir thread'den (iptal isteği) çağrılabilir
+        with self._lock:
+            if self.reason is None:
+                self._callbacks.append(fn)
+                return
+        fn()
+
+    def cancel(self, reason: str) -> bool:
+        with self._lock:
+            if self.reason is not None:
+                return False
+            self.reason = reason
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            fn()
+        return True
+
+    def check(self):
+        if self.reason is not None:
+            raise TurnCancelled(self.reason)
+
+class InFlightTurns:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_key = {}  # (sahip, "turn" | "conversation", id) → {handle, ...}
+
+    def _keys(self, handle: TurnHandle) -> list:
+        keys = []
+        if handle.turn_id:
+            keys.append((handle.owner, "turn", handle.turn_id))
+        if handle.conversation_id:
+            keys.append((handle.owner, "conversation", handle.conversation_id))
+        return keys
+
+    def register(self, turn: dict) -> TurnHandle:
+        conversation = turn["conversation"]
+        handle = TurnHandle(turn["identity"], turn["turn_id"], conversation["id"] if conversation else None)
+        turn["cancel"] = handle
+        with self._lock:
+            for key in self._keys(handle):
+                self._by_key.setdefault(key, set()).add(handle)
+        return handle
+
+    def unregister(self, handle: TurnHandle):
+        with self._lock:
+            for key in self._keys(handle):
+                handles = self._by_key.get(key)
+                if handles is not None:
+                    handles.discard(handle)
+                    if not handles:
+                        del self._by_key[key]
+
+    def cancel(self, owner: str, turn_id: str = None, conversation_id: str = None, reason: str = "cancel") -> int:
+        with self._lock:
+            handles = set()
+            if turn_id:
+                handles |= self._by_key.get((owner, "turn", turn_id), set())
+            if conversation_id:
+                handles |= self._by_key.get((owner, "conversation", conversation_id), set())
+        return sum(1 for handle in handles if handle.cancel(reason))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"in_flight": len({h for handles in self._by_key.values() for h in handles})}
+
+def log_cancelled(turn: dict, reason: str, stage: str, generated: int = 0) -> int:
+    # stage: queued (upstream'e gidilmedi) / upstream (yolda kesildi) / coalesced (çağrı başkasıyla paylaşılıyor)
+    saved = 0
+    if stage != "coalesced":
+        saved = max(0, COMPLETION_TOKENS_ESTIMATE - generated)
+        if stage == "queued":
+            saved += turn["meta"].get("context", {}).get("prompt_tokens_estimate", 0)
+    metrics.inc("convince_turns_cancelled_total", (reason, stage))
+    if saved:
+        metrics.inc("convince_tokens_saved_total", (str(turn["scenario_id"]),), saved)
+    print(
+        f"Turn cancelled: scenario={turn['scenario_id']} turn={turn['turn_id'] or '-'} "
+        f"reason={reason} stage={stage} generated={generated} tokens_saved~{saved}"
+    )
+    return saved
+
+# ---- Upstream stream'ini kapatma (bağlantı kesilir, sağlayıcı üretimi durdurur) ----
+def close_stream(stream):
+    if stream is not None:
+        try:
+            stream.close()
+        except Exception as e:
+            print(f"Stream close error: {e}")
+
+async def aclose_stream(stream):
+    if stream is None:
+        return
+    try:
+        if hasattr(stream, "aclose"):
+            await stream.aclose()
+        else:
+            await stream.close()
+    except Exception as e:
+        print(f"Stream close error: {e}")
+
+# ---- asyncio: istemci kopması / iptal isteği ----
+async def wait_disconnect(receive):
+    # Gövde okunduktan sonra receive() sadece http.disconnect ile döner
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+async def abandonable(task, receive, handle: TurnHandle):
+    # task'ın sonucunu döner; istemci koparsa veya tur iptal edilirse task iptal edilir
+    # ve TurnCancelled fırlatılır
+    loop = asyncio.get_running_loop()
+    cancelled = asyncio.Event()
+    handle.on_cancel(lambda: loop.call_soon_threadsafe(cancelled.set))
+    disconnect = asyncio.ensure_future(wait_disconnect(receive))
+    cancel_wait = asyncio.ensure_future(cancelled.wait())
+    try:
+        done, _ = await asyncio.wait({task, disconnect, cancel_wait}, return_when=asyncio.FIRST_COMPLETED)
+        if task in done:
+            return task.result()
+        if disconnect in done:
+            handle.cancel("disconnect")
+        task.cancel()
+        await asyncio.wait({task})  # iptal işlensin: slot bırakılsın, stream kapansın
+        raise TurnCancelled(handle.reason)
+    finally:
+        disconnect.cancel()
+        cancel_wait.cancel()
+        if not task.done():
+            task.cancel()  # istek görevinin kendisi iptal edildiyse
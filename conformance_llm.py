@@ -0,0 +1,202 @@
+import argparse
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from mock_openai import MockOpenAIServer
+
+# Sağlayıcı uyumluluk kontrolü (providers.py): bir OpenAI uyumlu uç, uygulamanın
+# kullandığı şekilde (normal / stream / asyncio, usage, hata sınıfları, havuz) çalışıyor mu?
+#   python conformance_llm.py                                        yerel stub'a karşı (mock_openai.py)
+#   python conformance_llm.py --base-url http://127.0.0.1:8080/v1 --model qwen2.5-7b-instruct
+#   python conformance_llm.py --base-url ... --no-stream-usage       stream_options desteklemeyen sunucular
+# Stub'a özel kontroller (havuz sınırı, timeout, 429 / 400, fallback) gerçek uçta SKIP olur.
+# Çıkış kodu: 0 = hepsi geçti, 1 = en az bir FAIL.
+
+MESSAGES = [
+    {"role": "system", "content": "Kısa cevap ver."},
+    {"role": "user", "content": "Merhaba, bir cümleyle kendini tanıt."},
+]
+
+class StubServer:
+    # Senkron istemciler de test edilebilsin diye stub kendi thread'inde / event loop'unda
+    def __init__(self, **kwargs):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.server = self._run(MockOpenAIServer(**kwargs).start())
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def close(self):
+        self._run(self.server.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+# ---- Kontroller ----
+def check_complete(ctx):
+    from prompts import usage_summary
+
+    completion = ctx["provider"].create(ctx["model"], messages=MESSAGES, max_tokens=64)
+    content = completion.choices[0].message.content
+    assert isinstance(content, str) and content.strip(), f"empty content: {content!r}"
+    usage = usage_summary(completion.usage)
+    assert usage.get("prompt_tokens", 0) > 0, f"usage.prompt_tokens missing: {completion.usage!r}"
+    assert usage.get("completion_tokens", 0) > 0, f"usage.completion_tokens missing: {completion.usage!r}"
+
+def _check_chunks(ctx, chunks: list):
+    from prompts import usage_summary
+
+    text = "".join(c.choices[0].delta.content or "" for c in chunks if c.choices)
+    assert text.strip(), "stream produced no content"
+    assert len([c for c in chunks if c.choices and c.choices[0].delta.content]) > 1, "stream was not incremental"
+    if ctx["stream_usage"]:
+        usage = [c.usage for c in chunks if not c.choices and c.usage]
+        assert usage, "include_usage requested but no usage chunk (use --no-stream-usage)"
+        assert usage_summary(usage[-1]).get("completion_tokens", 0) > 0, "usage chunk without completion_tokens"
+
+def check_stream(ctx):
+    stream = ctx["provider"].create(
+        ctx["model"], messages=MESSAGES, max_tokens=64, stream=True, stream_options={"include_usage": True},
+    )
+    _check_chunks(ctx, list(stream))
+
+def check_async(ctx):
+    async def run():
+        completion = await ctx["provider"].acreate(ctx["model"], messages=MESSAGES, max_tokens=64)
+        assert completion.choices[0].message.content.strip(), "empty async content"
+        stream = await ctx["provider"].acreate(
+            ctx["model"], messages=MESSAGES, max_tokens=64, stream=True, stream_options={"include_usage": True},
+        )
+        _check_chunks(ctx, [chunk async for chunk in stream])
+        await ctx["provider"].aclient.close()
+    asyncio.run(run())
+
+def check_pool_limit(ctx):
+    # max_connections=2: 6 eşzamanlı çağrının en fazla 2'si aynı anda sunucuda olmalı
+    from providers import Provider
+
+    stub = ctx["stub"].server
+    stub.latency, stub.max_in_flight = 0.2, 0
+    provider = Provider("pool", base_url=stub.base_url, api_key="none", max_connections=2)
+    with ThreadPoolExecutor(6) as pool:
+        list(pool.map(lambda _: provider.create("stub", messages=MESSAGES), range(6)))
+    assert stub.max_in_flight <= 2, f"sync pool exceeded: {stub.max_in_flight} in flight"
+
+    stub.max_in_flight = 0
+
+    async def run():
+        await asyncio.gather(*(provider.acreate("stub", messages=MESSAGES) for _ in range(6)))
+        await provider.aclient.close()
+    asyncio.run(run())
+    assert stub.max_in_flight <= 2, f"async pool exceeded: {stub.max_in_flight} in flight"
+    assert stub.max_in_flight == 2, f"pool not used concurrently: {stub.max_in_flight} in flight"
+
+def check_errors(ctx):
+    # Limiter / router hata sınıflarını doğru ayırt etmeli: timeout ve 429 tekrar denenir, 400 denenmez
+    from upstream import is_retryable
+
+    stub = ctx["stub"].server
+    provider = ctx["provider"]
+    stub.latency = 1.0
+    try:
+        provider.create(ctx["model"], messages=MESSAGES, timeout=0.2)
+        raise AssertionError("timeout was not raised")
+    except AssertionError:
+        raise
+    except Exception as e:
+        assert is_retryable(e), f"timeout not retryable: {e!r}"
+    finally:
+        stub.latency = ctx["latency"]
+
+    for status, retryable in ((429, True), (503, True), (400, False)):
+        stub.fail_next.append(status)
+        try:
+            provider.create(ctx["model"], messages=MESSAGES)
+            raise AssertionError(f"{status} was not raised")
+        except AssertionError:
+            raise
+        except Exception as e:
+            assert is_retryable(e) == retryable, f"{status}: is_retryable={is_retryable(e)} ({e!r})"
+
+def check_fallback(ctx):
+    # "local:<model>" hata verirse senaryonun bir sonraki modeline geçilir
+    from model_router import ModelRouter
+    from providers import Provider, Providers
+
+    stub = ctx["stub"].server
+    providers = Providers({
+        "openai": Provider("openai", mock=True),
+        "local": Provider("local", base_url=stub.base_url, api_key="none"),
+    })
+    router = ModelRouter(hedge_after="")
+    call = lambda model, timeout: providers.create(model, messages=MESSAGES, timeout=timeout)  # noqa: E731
+
+    _, route = router.complete(("local:stub", "gpt-4o-mini"), call)
+    assert route["model"] == "local:stub", f"expected local provider, got {route}"
+    stub.fail_next.append(503)
+    _, route = router.complete(("local:stub", "gpt-4o-mini"), call)
+    assert route["model"] == "gpt-4o-mini" and route["tried"] == ["local:stub", "gpt-4o-mini"], route
+
+CHECKS = [
+    ("complete", check_complete, False),
+    ("stream", check_stream, False),
+    ("async", check_async, False),
+    ("pool limit", check_pool_limit, True),
+    ("error classes", check_errors, True),
+    ("fallback", check_fallback, True),
+]
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="OpenAI uyumlu sağlayıcı uyumluluk kontrolü")
+    parser.add_argument("--base-url", help="gerçek uç (yoksa yerel stub başlatılır)")
+    parser.add_argument("--model", default="stub-model")
+    parser.add_argument("--api-key", default="none")
+    parser.add_argument("--no-stream-usage", action="store_true", help="stream_options gönderme")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub gecikmesi (sn)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="hatada traceback")
+    args = parser.parse_args(argv)
+
+    from providers import Provider
+
+    stub = None
+    base_url = args.base_url
+    if not base_url:
+        stub = StubServer(latency=args.latency, tokens_per_second=500)
+        base_url = stub.server.base_url
+    ctx = {
+        "provider": Provider(
+            "local", base_url=base_url, api_key=args.api_key, stream_usage=not args.no_stream_usage,
+        ),
+        "model": args.model,
+        "stream_usage": not args.no_stream_usage,
+        "stub": stub,
+        "latency": args.latency,
+    }
+    print(f"provider: {base_url} model={args.model}")
+    failed = 0
+    try:
+        for name, check, stub_only in CHECKS:
+            if stub_only and stub is None:
+                print(f"SKIP  {name:<16} (stub only)")
+                continue
+            started = time.perf_counter()
+            try:
+                check(ctx)
+            except Exception as e:
+                failed += 1
+                print(f"FAIL  {name:<16} {e.__class__.__name__}: {e}")
+                if args.verbose:
+                    traceback.print_exc()
+                continue
+            print(f"PASS  {name:<16} {(time.perf_counter() - started) * 1000:>8.1f} ms")
+    finally:
+        if stub:
+            stub.close()
+    print(f"{len(CHECKS) - failed}/{len(CHECKS)} passed" if not failed else f"{failed} failed")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+try:
+    import tiktoken  # opsiyonel: yoksa karakter tabanlı tahmin
+except ImportError:
+    tiktoken = None
+
+# Uzun müzakerelerde modele giden geçmişi token bütçesiyle sınırlar.
+# System prompt ve son N tur her zaman olduğu gibi gider; daha eski turlar
+# tek bir "özet" mesajına katlanır. Özet, katlanan önek değişmedikçe cache'ten gelir.
+#
+# Senaryo bazında ayar (scenarios.py içinde opsiyonel anahtarlar):
+#   "Token Budget": 6000, "Keep Turns": 6
+
+DEFAULT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "6000"))
+DEFAULT_KEEP_TURNS = int(os.environ.get("CONTEXT_KEEP_TURNS", "6"))
+# Pencere her turda değil, bu kadar mesajlık adımlarla kayar → özet nadiren yeniden hesaplanır
+FOLD_STEP = int(os.environ.get("CONTEXT_FOLD_STEP", "8"))
+SUMMARY_CACHE_SIZE = int(os.environ.get("CONTEXT_SUMMARY_CACHE_SIZE", "2048"))
+
+SUMMARY_PROMPT = (
+    "You summarize an ongoing negotiation role-play so it can continue without the full transcript. "
+    "Write in Turkish, in at most 8 short sentences. Keep concrete offers, numbers, concessions, "
+    "promises, objections and the emotional tone of both sides. Do not invent anything."
+)
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")  # gpt-4o ailesi
+    except Exception:
+        return None
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # Türkçe metinde ~3.5 karakter/token; biraz fazla saymak güvenli taraf
+    return len(text) // 3 + 1
+
+def count_message_tokens(messages: list) -> int:
+    # mesaj başına ~4 token çerçeve maliyeti
+    return sum(count_tokens(m["content"]) + 4 for m in messages)
+
+def scenario_budget(scenario: dict) -> tuple:
+    return (
+        int(scenario.get("Token Budget", DEFAULT_TOKEN_BUDGET)),
+        int(scenario.get("Keep Turns", DEFAULT_KEEP_TURNS)),
+    )
+
+class SummaryCache:
+    def __init__(self, max_entries: int = SUMMARY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: str):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+summary_cache = SummaryCache()
+
+def prefix_key(scenario_id, messages: list) -> str:
+    raw = json.dumps([scenario_id, messages], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def transcript(messages: list) -> str:
+    names = {"user": "Oyuncu", "assistant": "Karşı taraf"}
+    return "\n".join(f"{names.get(m['role'], m['role'])}: {m['content']}" for m in messages)
+
+def rolling_summary(scenario_id, folded: list, summarize) -> str:
+    # Önceki adımın özeti cache'teyse sadece yeni bloğu onun üzerine katla
+    key = prefix_key(scenario_id, folded)
+    cached = summary_cache.get(key)
+    if cached is not None:
+        return cached
+
+    previous = None
+    start = 0
+    for cut in range(len(folded) - FOLD_STEP, 0, -FOLD_STEP):
+        previous = summary_cache.get(prefix_key(scenario_id, folded[:cut]))
+        if previous is not None:
+            start = cut
+            break
+
+    text = transcript(folded[start:])
+    if previous:
+        text = f"Önceki özet:\n{previous}\n\nDevamı:\n{text}"
+    summary = summarize([
+        {"role": "system", "content": SUMMARY_PROMPT},
+        {"role": "user", "content": text},
+    ])
+    summary_cache.put(key, summary)
+    return summary
+
+def fit_messages(scenario_id, scenario, messages: list, summarize) -> tuple:
+    # messages: [system, ...geçmiş..., son kullanıcı mesajı]
+    budget, keep_turns = scenario.token_budget, scenario.keep_turns
+    total = count_message_tokens(messages)
+    meta = {"token_budget": budget, "prompt_tokens_estimate": total, "tokens_saved": 0, "summarized_messages": 0}
+
+    system, history, last = messages[0], messages[1:-1], messages[-1]
+    keep = keep_turns * 2
+    fold = (len(history) - keep) // FOLD_STEP * FOLD_STEP
+    if total <= budget or fold <= 0:
+        return messages, meta
+
+    folded, kept = history[:fold], history[fold:]
+    try:
+        summary = rolling_summary(scenario_id, folded, summarize)
+        bridge = [{"role": "system", "content": f"Konuşmanın şimdiye kadarki özeti:\n{summary}"}]
+    except Exception as e:
+        # Özet alınamazsa eski turları düşür; konuşma yine de devam etsin
+        print(f"Context summary error: {e}")
+        bridge = []
+
+    fitted = [system] + bridge + kept + [last]
+    fitted_total = count_message_tokens(fitted)
+    meta.update(
+        prompt_tokens_estimate=fitted_total,
+        tokens_saved=max(0, total - fitted_total),
+        summarized_messages=len(folded),
+    )
+    return fitted, meta
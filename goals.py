@@ -0,0 +1,80 @@
+import re
+import unicodedata
+
+# Hedef cümle ve "Amaç %X oranında gerçekleşti." satırının sunucu tarafında tespiti.
+# Her senaryonun Goal cümlesi açılışta bir kez normalize edilir; cevaplar aynı
+# normalizasyondan geçip düz alt-dize aramasıyla kontrol edilir (ikinci LLM çağrısı yok).
+# Normalizasyon: Türkçe büyük/küçük harf + aksanlar (İ/I/ı/i → i, ş → s, ğ → g ...),
+# düz/kıvrık tırnaklar ve markdown işaretleri atılır, noktalama ve boşluklar tek boşluk.
+# Stream'de GoalTracker parça parça beslenir; her parçada sadece yeni kısım taranır.
+
+# NFKD sonrası birleşik aksanlar düşer; ayrışmayan harfler elle eşlenir
+_FOLD = {ord("ı"): "i", ord("ß"): "ss", ord("æ"): "ae", ord("ø"): "o"}
+# Tırnak / markdown: iz bırakmadan silinir ("*Haklısın*" → "haklisin")
+_FOLD.update({ord(c): None for c in "\"'`*_~“”„‟«»‹›‘’‚‛″′"})
+_SEPARATORS = re.compile(r"[^\w%]+", re.UNICODE)
+
+_SCORE = re.compile(r"amac (?:% ?(\d{1,3})|(\d{1,3}) ?%) oraninda gerceklesti")
+# Skor satırının normalize edilmiş en uzun hali; parça sınırında bölünen eşleşmeler için örtüşme
+_SCORE_OVERLAP = len("amac % 100 oraninda gerceklesti")
+
+def fold_text(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _SEPARATORS.sub(" ", text.translate(_FOLD).lower())
+
+def normalize_text(text: str) -> str:
+    return fold_text(text).strip()
+
+class GoalDetector:
+    __slots__ = ("scenario_id", "goal")
+
+    def __init__(self, scenario_id, goal_sentence: str):
+        self.scenario_id = scenario_id
+        self.goal = normalize_text(goal_sentence)
+
+    def tracker(self):
+        return GoalTracker(self)
+
+    def check(self, text: str) -> dict:
+        tracker = GoalTracker(self)
+        tracker.feed(text)
+        return tracker.result()
+
+class GoalTracker:
+    __slots__ = ("detector", "text", "goal_reached", "score", "_goal_from", "_score_from")
+
+    def __init__(self, detector: GoalDetector):
+        self.detector = detector
+        self.text = " "  # baştaki boşluk: parça sınırındaki boşlukları tek'e indirmek için
+        self.goal_reached = False
+        self.score = None
+        self._goal_from = 0
+        self._score_from = 0
+
+    def feed(self, chunk: str) -> bool:
+        # Hedef cümle bu parçayla ilk kez yakalandıysa True
+        if not chunk:
+            return False
+        folded = fold_text(chunk)
+        if folded.startswith(" ") and self.text.endswith(" "):
+            folded = folded.lstrip(" ")
+        self.text += folded
+
+        newly_reached = False
+        goal = self.detector.goal
+        if goal and not self.goal_reached:
+            if self.text.find(goal, self._goal_from) >= 0:
+                self.goal_reached = newly_reached = True
+            else:
+                self._goal_from = max(0, len(self.text) - len(goal))
+
+        # Son skor satırı geçerli; satır henüz bitmediyse bir sonraki parçada tekrar bakılır
+        for match in _SCORE.finditer(self.text, self._score_from):
+            self.score = min(100, int(match.group(1) or match.group(2)))
+            self._score_from = match.end()
+        self._score_from = max(self._score_from, len(self.text) - _SCORE_OVERLAP)
+        return newly_reached
+
+    def result(self) -> dict:
+        return {"goal_reached": self.goal_reached, "score": self.score}
@@ -0,0 +1,53 @@
+import threading
+import time
+
+# Pahalı nesneler (OpenAI / OAuth istemcileri) import'ta değil ilk kullanımda
+# kurulur; boşta uyuyan instance'ın soğuk açılışı kısalır. Senaryo registry'si ucuz
+# ve açılışta doğrulanmalı (bozuk senaryo → uygulama açılmaz), tembel değil.
+# Çağıran kod değişmez: client.chat.completions... ilk erişimde factory() çalışır.
+# LAZY_INIT=0 ile hepsi import sırasında kurulur (gunicorn --preload, hızlı hata).
+# Kendi alanları "_" ile başlar: sarılan nesnenin get / name gibi attribute'larını gölgelemesin.
+
+_UNSET = object()
+instances = []  # açılış raporu / warm_up için tüm Lazy nesneleri
+
+class Lazy:
+    __slots__ = ("_name", "_init_seconds", "_factory", "_value", "_lock")
+
+    def __init__(self, factory, name: str):
+        self._name = name
+        self._init_seconds = None
+        self._factory = factory
+        self._value = _UNSET
+        self._lock = threading.Lock()
+        instances.append(self)
+
+    def _resolve(self):
+        value = self._value
+        if value is _UNSET:
+            with self._lock:
+                if self._value is _UNSET:
+                    started = time.perf_counter()
+                    self._value = self._factory()
+                    self._init_seconds = time.perf_counter() - started
+                    print(f"Lazy init: {self._name} in {self._init_seconds * 1000:.0f} ms")
+                value = self._value
+        return value
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __iter__(self):
+        return iter(self._resolve())
+
+    def __len__(self):
+        return len(self._resolve())
+
+def is_ready(lazy: Lazy) -> bool:
+    return lazy._value is not _UNSET
+
+def warm_up() -> dict:
+    # Hepsini kur; isim → kurulum süresi (sn)
+    for lazy in instances:
+        lazy._resolve()
+    return {lazy._name: lazy._init_seconds for lazy in instances}
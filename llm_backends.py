@@ -0,0 +1,164 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace as Obj
+
+from mock_openai import DEFAULT_REPLY, mock_usage
+
+# Chat completion arka ucu. Uygulama modeli sadece OpenAI SDK yüzeyi üzerinden çağırır
+# (client.chat.completions.create; normal ve stream=True) — arka uç bu yüzeyi veren nesnedir.
+#
+#   LLM_BACKEND=openai                gerçek OpenAI (OPENAI_API_KEY zorunlu)
+#   LLM_BACKEND=mock                  process içi taklit: ağ ve anahtar yok (benchmark / yerel geliştirme)
+#   MOCK_LLM_LATENCY=0.5              ilk token'a kadar bekleme (sn)
+#   MOCK_LLM_TOKENS_PER_SECOND=50     üretim hızı; stream'de parça aralığı, normal cevapta toplam süreye eklenir
+#   MOCK_LLM_REPLY=...                sabit cevap metni
+#   MOCK_LLM_MODEL_LATENCY=gpt-4o-mini=3,gpt-4.1-mini=0.2    model bazında gecikme (router denemeleri)
+#   MOCK_LLM_ERROR_RATE=0.05 veya gpt-4o-mini=0.5            429 oranı (tümü veya model bazında)
+# İstekteki timeout= aşılırsa SDK gibi APITimeoutError fırlatılır.
+#
+# mock_openai.py aynı taklidi HTTP sunucusu olarak verir (SDK + ağ yolunu da ölçmek için).
+
+LLM_BACKENDS = ("openai", "mock")
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "openai").lower()
+MOCK_LLM_LATENCY = float(os.environ.get("MOCK_LLM_LATENCY", "0.5"))
+MOCK_LLM_TOKENS_PER_SECOND = float(os.environ.get("MOCK_LLM_TOKENS_PER_SECOND", "50"))
+MOCK_LLM_REPLY = os.environ.get("MOCK_LLM_REPLY", DEFAULT_REPLY)
+
+def per_model(spec: str) -> dict:
+    # "0.5" → {"*": 0.5}; "a=1,b=2" → {"a": 1.0, "b": 2.0}
+    values = {}
+    for item in filter(None, (x.strip() for x in spec.split(","))):
+        model, sep, value = item.rpartition("=")
+        values[model.strip() if sep else "*"] = float(value)
+    return values
+
+MOCK_LLM_MODEL_LATENCY = per_model(os.environ.get("MOCK_LLM_MODEL_LATENCY", ""))
+MOCK_LLM_ERROR_RATE = per_model(os.environ.get("MOCK_LLM_ERROR_RATE", ""))
+
+if LLM_BACKEND not in LLM_BACKENDS:
+    raise ValueError(f"Unknown LLM_BACKEND {LLM_BACKEND!r} (expected one of {', '.join(LLM_BACKENDS)})")
+
+# ---- SDK nesnelerinin taklidi (sadece uygulamanın okuduğu alanlar) ----
+def sdk_error(kind: str):
+    # Router / limiter gerçek SDK hatalarıyla aynı şekilde davransın
+    import httpx
+    import openai
+
+    request = httpx.Request("POST", "http://mock-llm/v1/chat/completions")
+    if kind == "timeout":
+        return openai.APITimeoutError(request=request)
+    response = httpx.Response(429, request=request, headers={"retry-after": "1"})
+    return openai.RateLimitError("Rate limit reached (mock)", response=response, body=None)
+
+def usage_object(usage: dict):
+    return Obj(
+        prompt_tokens=usage["prompt_tokens"],
+        completion_tokens=usage["completion_tokens"],
+        total_tokens=usage["total_tokens"],
+        prompt_tokens_details=Obj(**usage["prompt_tokens_details"]),
+    )
+
+def completion_object(model: str, content: str, usage: dict):
+    return Obj(
+        id="chatcmpl-mock",
+        object="chat.completion",
+        model=model,
+        choices=[Obj(index=0, message=Obj(role="assistant", content=content), finish_reason="stop")],
+        usage=usage_object(usage),
+    )
+
+def chunk_object(model: str, delta: str = None, finish_reason: str = None, usage: dict = None):
+    choices = []
+    if usage is None:
+        choices = [Obj(index=0, delta=Obj(content=delta), finish_reason=finish_reason)]
+    return Obj(
+        id="chatcmpl-mock",
+        object="chat.completion.chunk",
+        model=model,
+        choices=choices,
+        usage=usage_object(usage) if usage else None,
+    )
+
+class MockCompletions:
+    def __init__(self, latency: float = None, tokens_per_second: float = None, reply: str = None):
+        self.latency = MOCK_LLM_LATENCY if latency is None else latency
+        self.tokens_per_second = tokens_per_second or MOCK_LLM_TOKENS_PER_SECOND
+        self.reply = reply or MOCK_LLM_REPLY
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._seen_prefixes = set()  # sağlayıcı prompt cache'ini taklit eder
+
+    def _plan(self, model: str, messages: list, stream: bool, timeout):
+        # (cevap parçaları, usage, bekleme, hata) — hata varsa bekleme sonrası fırlatılır
+        with self._lock:
+            self.requests += 1
+            usage = mock_usage(messages, self.reply, self._seen_prefixes)
+        words = self.reply.split(" ")
+        deltas = [word if i == 0 else " " + word for i, word in enumerate(words)]
+        latency = MOCK_LLM_MODEL_LATENCY.get(model, MOCK_LLM_MODEL_LATENCY.get("*", self.latency))
+        if not stream:
+            latency += len(deltas) / self.tokens_per_second
+        error_rate = MOCK_LLM_ERROR_RATE.get(model, MOCK_LLM_ERROR_RATE.get("*", 0.0))
+        if error_rate and random.random() < error_rate:
+            return deltas, usage, 0.0, sdk_error("rate_limit")
+        if timeout is not None and latency > timeout:
+            return deltas, usage, timeout, sdk_error("timeout")
+        return deltas, usage, latency, None
+
+    def _chunks(self, model: str, deltas: list, usage: dict, stream_options: dict):
+        for delta in deltas:
+            yield chunk_object(model, delta)
+        yield chunk_object(model, finish_reason="stop")
+        if (stream_options or {}).get("include_usage"):
+            yield chunk_object(model, usage=usage)
+
+    def create(self, model: str, messages: list, stream: bool = False, stream_options: dict = None,
+               timeout: float = None, **kwargs):
+        deltas, usage, delay, error = self._plan(model, messages, stream, timeout)
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        if not stream:
+            return completion_object(model, self.reply, usage)
+
+        def generate():
+            for chunk in self._chunks(model, deltas, usage, stream_options):
+                yield chunk
+                if chunk.choices and chunk.choices[0].delta.content:
+                    time.sleep(1.0 / self.tokens_per_second)
+        return generate()
+
+class AsyncMockCompletions(MockCompletions):
+    async def create(self, model: str, messages: list, stream: bool = False, stream_options: dict = None,
+                     timeout: float = None, **kwargs):
+        deltas, usage, delay, error = self._plan(model, messages, stream, timeout)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        if not stream:
+            return completion_object(model, self.reply, usage)
+
+        async def generate():
+            for chunk in self._chunks(model, deltas, usage, stream_options):
+                yield chunk
+                if chunk.choices and chunk.choices[0].delta.content:
+                    await asyncio.sleep(1.0 / self.tokens_per_second)
+        return generate()
+
+class MockClient:
+    # OpenAI(...) yerine; client.chat.completions.create aynı şekilde çağrılır
+    def __init__(self, **kwargs):
+        self.chat = Obj(completions=MockCompletions(**kwargs))
+
+    def close(self):
+        pass
+
+class AsyncMockClient:
+    def __init__(self, **kwargs):
+        self.chat = Obj(completions=AsyncMockCompletions(**kwargs))
+
+    async def close(self):
+        pass
@@ -0,0 +1,151 @@
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from mock_openai import MockOpenAIServer
+
+# Tek process'in kaç eşzamanlı konuşmayı taşıyabildiğini ölçer.
+# Mock OpenAI sunucusunu başlatır, uygulamayı (asgi veya gunicorn sync) ona
+# yönlendirerek ayağa kaldırır ve artan eşzamanlılık seviyelerinde konuşma açar.
+#
+#   python loadtest.py --server asgi --levels 25,50,100,200 --latency 1.5
+#   python loadtest.py --server sync --levels 1,2,4,8
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+# Benchmark'lar (loadtest.py, bench_http.py) tüm trafiği 127.0.0.1'den tek kimlikle üretir
+BENCH_ENV = {
+    "JWT_SECRET": "bench-secret",
+    "FLASK_SECRET_KEY": "bench",
+    # Kota / RPM sınırları benchmark'ı 429'a düşürmesin
+    "IP_RATE_LIMIT": "100000000",
+    "USER_RATE_LIMIT": "100000000",
+    "ANON_DAILY_TOKENS": "100000000000",
+    "USER_DAILY_TOKENS": "100000000000",
+    "OPENAI_RPM": "100000000",
+    "OPENAI_TPM": "100000000000",
+    "UPSTREAM_MAX_QUEUE": "100000",
+    "TRACE_SAMPLE_RATE": "0",
+}
+
+def server_command(kind: str, port: int) -> list:
+    if kind == "asgi":
+        return [sys.executable, "-m", "uvicorn", "asgi:application",
+                "--port", str(port), "--log-level", "warning"]
+    if kind == "sync":
+        return [sys.executable, "-m", "gunicorn", "app:app",
+                "-w", "1", "-b", f"127.0.0.1:{port}", "--log-level", "warning"]
+    raise ValueError(f"Unknown server kind: {kind}")
+
+async def wait_until_up(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as http:
+        while time.monotonic() < deadline:
+            try:
+                if (await http.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server did not start: {url}")
+
+async def conversation(http, base_url: str, scenario_id: int, turns: int, latencies: list, errors: list):
+    history = []
+    for i in range(turns):
+        user_input = f"Tur {i + 1}: bence bu konuyu tekrar değerlendirmeliyiz."
+        started = time.perf_counter()
+        try:
+            resp = await http.post(f"{base_url}/api/ask", json={
+                "scenario_id": scenario_id,
+                "user_input": user_input,
+                "history": history,
+            })
+            resp.raise_for_status()
+            answer = resp.json()["answer"]
+        except Exception as e:
+            errors.append(repr(e))
+            return
+        latencies.append(time.perf_counter() - started)
+        history += [{"sender": "user", "text": user_input}, {"sender": "ai", "text": answer}]
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+async def run_level(base_url: str, concurrency: int, turns: int, timeout: float) -> dict:
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as http:
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            conversation(http, base_url, (i % 20) + 1, turns, latencies, errors)
+            for i in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "turns": len(latencies),
+        "errors": len(errors),
+        "elapsed": elapsed,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "mean": statistics.fmean(latencies) if latencies else float("nan"),
+    }
+
+async def main(args):
+    mock = await MockOpenAIServer(latency=args.latency).start()
+    port = free_port()
+    env = {
+        **os.environ,
+        **BENCH_ENV,
+        # Ölçülen process'in taşıyabildiği konuşma sayısı; eşzamanlı çağrı sınırı değil
+        "UPSTREAM_MAX_CONCURRENCY": "100000",
+        "OPENAI_API_KEY": "mock",
+        "OPENAI_BASE_URL": mock.base_url,
+    }
+    proc = subprocess.Popen(server_command(args.server, port), cwd=HERE, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        await wait_until_up(base_url + "/")
+        print(f"server={args.server} mock_latency={args.latency}s turns/conversation={args.turns}")
+        print(f"{'conc':>6} {'turns':>6} {'errors':>6} {'rps':>8} {'p50':>7} {'p95':>7}")
+        sustained = 0
+        for level in args.levels:
+            r = await run_level(base_url, level, args.turns, args.timeout)
+            print(f"{r['concurrency']:>6} {r['turns']:>6} {r['errors']:>6} "
+                  f"{r['rps']:>8.1f} {r['p50']:>7.2f} {r['p95']:>7.2f}")
+            # "Taşınabilir": hata yok ve p95, upstream gecikmesinin 2 katını aşmıyor
+            if r["errors"] == 0 and r["p95"] <= 2 * args.latency:
+                sustained = level
+        print(f"Sustained concurrent conversations: {sustained} "
+              f"(upstream max in-flight: {mock.max_in_flight})")
+    finally:
+        proc.terminate()
+        proc.wait()
+        await mock.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Eşzamanlı konuşma yük testi (mock OpenAI)")
+    parser.add_argument("--server", choices=["asgi", "sync"], default="asgi")
+    parser.add_argument("--levels", default="10,50,100,200",
+                        type=lambda s: [int(x) for x in s.split(",")])
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,226 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+# Prometheus metin formatında metrikler (/metrics); bağımlılık yok.
+# Sıcak yolda kilit yok: her thread kendi "shard"ına yazar (asyncio tek thread → tek shard),
+# toplama sadece scrape sırasında yapılır. gunicorn'da her worker ayrı process olduğu için
+# METRICS_DIR verilirse worker'lar anlık görüntülerini oraya yazar (en fazla
+# METRICS_FLUSH_INTERVAL sn'de bir) ve scrape'e cevap veren worker hepsini birleştirir.
+#
+#   METRICS_DIR=/tmp/convince-metrics    çok worker'lı kurulumlar için (boş = sadece bu process)
+#   METRICS_FLUSH_INTERVAL=2
+#   METRICS_TOKEN=...                    verilirse /metrics "Authorization: Bearer ..." ister
+
+METRICS_DIR = os.environ.get("METRICS_DIR")
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", "2"))
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# isim -> (tip, açıklama, label isimleri)
+METRICS = {
+    "convince_http_requests_total": ("counter", "HTTP requests by route and status", ("route", "method", "status")),
+    "convince_http_request_duration_seconds": ("histogram", "HTTP request latency", ("route",)),
+    "convince_http_requests_in_flight": ("gauge", "Requests currently being handled", ("route",)),
+    "convince_ask_stage_seconds": (
+        "histogram", "Time per /api/ask stage (queue, upstream, first_token, serialization)", ("scenario", "stage"),
+    ),
+    "convince_openai_tokens_total": ("counter", "OpenAI tokens by scenario and model", ("scenario", "model", "kind")),
+    "convince_errors_total": ("counter", "Errors by route and exception class", ("route", "error")),
+    "convince_scenario_starts_total": (
+        "counter", "Scenario openers served from the registry (no upstream call)", ("scenario", "mode"),
+    ),
+}
+
+class _Shard:
+    __slots__ = ("counters", "histograms")
+
+    def __init__(self):
+        self.counters = {}    # (isim, label'lar) -> değer (counter ve gauge)
+        self.histograms = {}  # (isim, label'lar) -> [bucket sayıları..., +Inf, toplam]
+
+_local = threading.local()
+_shards = []
+_shards_lock = threading.Lock()
+_samplers = {}  # isim -> ([fn, ...]); tanımı METRICS'te
+_merge_max = set()  # worker'lar arasında toplanmayan, en büyüğü alınan gauge'lar (p95 gibi)
+_next_flush = 0.0
+
+def _shard() -> _Shard:
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _local.shard = _Shard()
+        with _shards_lock:  # thread başına bir kez
+            _shards.append(shard)
+    return shard
+
+def inc(name: str, labels: tuple = (), amount: float = 1.0):
+    counters = _shard().counters
+    key = (name, labels)
+    counters[key] = counters.get(key, 0) + amount
+
+def dec(name: str, labels: tuple = (), amount: float = 1.0):
+    inc(name, labels, -amount)
+
+def observe(name: str, labels: tuple, value: float):
+    histograms = _shard().histograms
+    key = (name, labels)
+    row = histograms.get(key)
+    if row is None:
+        row = histograms[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+    row[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+    row[-1] += value
+
+def register_sampler(name: str, kind: str, help_text: str, label_names: tuple, fn, merge: str = "sum"):
+    # fn() -> {label değerleri: değer}; zaten tutulan sayaçlar (limiter gibi) scrape / flush
+    # anında okunur. Aynı isimle birden çok kayıt (sync + async limiter) tek metrikte birleşir.
+    METRICS.setdefault(name, (kind, help_text, label_names))
+    _samplers.setdefault(name, []).append(fn)
+    if merge == "max":
+        _merge_max.add(name)
+
+# ---- Uygulama tarafı kısayolları ----
+def observe_stage(turn: dict, stage: str, seconds: float):
+    # Tur zamanlamaları hem histograma hem turn'e (loglar için) yazılır
+    turn.setdefault("timings", {})[stage] = seconds
+    observe("convince_ask_stage_seconds", (str(turn["scenario_id"]), stage), seconds)
+
+def record_tokens(scenario_id, model: str, usage: dict):
+    if not usage:
+        return
+    scenario = str(scenario_id)
+    inc("convince_openai_tokens_total", (scenario, model, "prompt"), usage.get("prompt_tokens", 0))
+    inc("convince_openai_tokens_total", (scenario, model, "completion"), usage.get("completion_tokens", 0))
+    inc("convince_openai_tokens_total", (scenario, model, "cached"), usage.get("cached_tokens", 0))
+
+def count_error(route: str, error: BaseException):
+    inc("convince_errors_total", (route, error.__class__.__name__))
+
+def request_started(route: str) -> float:
+    inc("convince_http_requests_in_flight", (route,))
+    return time.perf_counter()
+
+def request_finished(route: str, method: str, status: int, started: float):
+    dec("convince_http_requests_in_flight", (route,))
+    inc("convince_http_requests_total", (route, method, str(status)))
+    observe("convince_http_request_duration_seconds", (route,), time.perf_counter() - started)
+    if METRICS_DIR and time.monotonic() >= _next_flush:
+        flush()
+
+# ---- Toplama / dışa yazma ----
+def snapshot() -> dict:
+    # Bu process'in tüm shard'larının toplamı; dict.copy() GIL altında atomik
+    with _shards_lock:
+        shards = list(_shards)
+    counters, histograms = {}, {}
+    for shard in shards:
+        for key, value in shard.counters.copy().items():
+            counters[key] = counters.get(key, 0) + value
+        for key, row in shard.histograms.copy().items():
+            merged = histograms.get(key)
+            if merged is None:
+                histograms[key] = list(row)
+            else:
+                for i, value in enumerate(row):
+                    merged[i] += value
+    for name, fns in list(_samplers.items()):
+        for fn in fns:
+            for labels, value in fn().items():
+                key = (name, tuple(labels))
+                counters[key] = counters.get(key, 0) + value
+    return {"counters": counters, "histograms": histograms}
+
+def flush():
+    # Worker'ın anlık görüntüsünü METRICS_DIR'e yazar (tmp + rename → okuyan yarım dosya görmez)
+    global _next_flush
+    _next_flush = time.monotonic() + METRICS_FLUSH_INTERVAL
+    data = snapshot()
+    payload = {
+        "pid": os.getpid(),
+        "counters": [[name, list(labels), value] for (name, labels), value in data["counters"].items()],
+        "histograms": [[name, list(labels), row] for (name, labels), row in data["histograms"].items()],
+    }
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        print(f"Metrics flush failed: {e}")
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _merge_workers(data: dict):
+    # Diğer worker'ların son görüntüleri; ölmüş worker'ın gauge'ları (in-flight) sayılmaz
+    for name in os.listdir(METRICS_DIR):
+        if not name.endswith(".json") or name == f"{os.getpid()}.json":
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, name), encoding="utf-8") as f:
+                worker = json.load(f)
+        except (OSError, ValueError):
+            continue
+        alive = _pid_alive(worker["pid"])
+        for metric, labels, value in worker["counters"]:
+            if not alive and METRICS.get(metric, ("gauge",))[0] == "gauge":
+                continue
+            key = (metric, tuple(labels))
+            if metric in _merge_max:
+                data["counters"][key] = max(data["counters"].get(key, value), value)
+            else:
+                data["counters"][key] = data["counters"].get(key, 0) + value
+        for metric, labels, row in worker["histograms"]:
+            key = (metric, tuple(labels))
+            merged = data["histograms"].setdefault(key, [0] * len(row))
+            for i, value in enumerate(row):
+                merged[i] += value
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def render() -> str:
+    data = snapshot()
+    if METRICS_DIR and os.path.isdir(METRICS_DIR):
+        _merge_workers(data)
+
+    by_name = {}
+    for (name, labels), value in data["counters"].items():
+        by_name.setdefault(name, []).append((labels, value))
+    for (name, labels), row in data["histograms"].items():
+        by_name.setdefault(name, []).append((labels, row))
+
+    lines = []
+    for name, (kind, help_text, label_names) in METRICS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for labels, value in sorted(by_name.get(name, [])):
+            if kind != "histogram":
+                lines.append(f"{name}{_labels(label_names, labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), value[:-1]):
+                cumulative += count
+                le = 'le="{}"'.format(bound if bound == "+Inf" else _number(bound))
+                lines.append(f"{name}_bucket{_labels(label_names, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(label_names, labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(label_names, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,189 @@
+import argparse
+import asyncio
+import json
+import time
+
+# OpenAI Chat Completions API'sinin yerel taklidi (yük testleri için).
+# Sadece POST .../chat/completions destekler; normal ve stream=True cevap verir.
+# Kullanım: OPENAI_BASE_URL=http://127.0.0.1:8081/v1 ile uygulamayı buna yönlendir.
+
+DEFAULT_REPLY = (
+    "Anlıyorum, bu konuyu konuşmak için buradayız. "
+    "Ama önce beklentilerini biraz daha net duymak isterim."
+)
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+def cached_prompt_tokens(messages: list, seen_prefixes: set) -> int:
+    # OpenAI gibi: ≥1024 token'lık system öneki daha önce görüldüyse 128'lik bloklar halinde cache'ten
+    if not messages or messages[0].get("role") != "system":
+        return 0
+    prefix = messages[0].get("content") or ""
+    tokens = estimate_tokens(prefix)
+    if tokens < 1024:
+        return 0
+    if prefix not in seen_prefixes:
+        seen_prefixes.add(prefix)
+        return 0
+    return tokens // 128 * 128
+
+def mock_usage(messages: list, reply: str, seen_prefixes: set) -> dict:
+    # Cevap kelime kelime akar: completion token sayısı = kelime sayısı
+    prompt_tokens = sum(estimate_tokens(m.get("content") or "") for m in messages)
+    completion_tokens = len(reply.split(" "))
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached_prompt_tokens(messages, seen_prefixes)},
+    }
+
+class MockOpenAIServer:
+    def __init__(self, latency: float = 1.0, tokens_per_second: float = 50.0, reply: str = DEFAULT_REPLY):
+        self.latency = latency  # ilk token'a kadar bekleme (sn)
+        self.tokens_per_second = tokens_per_second  # stream modunda akış hızı
+        self.reply = reply
+        self.requests = 0
+        self.fail_next = []  # sıradaki isteklere dönülecek hata status'ları (429, 500...)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._seen_prefixes = set()  # sağlayıcı prompt cache'ini taklit eder
+        self._server = None
+        self._connections = {}  # handler task -> writer
+        self.port = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            # keep-alive bağlantıları kapat ki handler'lar iptal edilmeden bitsin
+            for writer in list(self._connections.values()):
+                writer.close()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+
+    async def _handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", "0")))
+
+                if method != "POST" or not path.endswith("/chat/completions"):
+                    self._write_json(writer, 404, {"error": {"message": "not found"}})
+                    await writer.drain()
+                    continue
+
+                self.requests += 1
+                if self.fail_next:
+                    status = self.fail_next.pop(0)
+                    self._write_json(writer, status, {"error": {"message": f"mock error {status}"}})
+                    await writer.drain()
+                    continue
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                try:
+                    await self._complete(writer, json.loads(body or b"{}"))
+                finally:
+                    self.in_flight -= 1
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self._connections.pop(task, None)
+            writer.close()
+
+    async def _complete(self, writer, payload: dict):
+        model = payload.get("model", "gpt-4o-mini")
+        words = self.reply.split(" ")
+        usage = mock_usage(payload.get("messages", []), self.reply, self._seen_prefixes)
+        base = {"id": "chatcmpl-mock", "created": int(time.time()), "model": model}
+
+        await asyncio.sleep(self.latency)
+
+        if not payload.get("stream"):
+            self._write_json(writer, 200, {
+                **base,
+                "object": "chat.completion",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": self.reply},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+            await writer.drain()
+            return
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"content-type: text/event-stream\r\n"
+            b"transfer-encoding: chunked\r\n\r\n"
+        )
+        for i, word in enumerate(words):
+            delta = word if i == 0 else " " + word
+            self._write_chunk(writer, {
+                **base,
+                "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}],
+            })
+            await writer.drain()
+            await asyncio.sleep(1.0 / self.tokens_per_second)
+        self._write_chunk(writer, {
+            **base,
+            "object": "chat.completion.chunk",
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        })
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            self._write_chunk(writer, {**base, "object": "chat.completion.chunk", "choices": [], "usage": usage})
+        data = b"data: [DONE]\n\n"
+        writer.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(data), data))
+        await writer.drain()
+
+    def _write_json(self, writer, status: int, body: dict):
+        payload = json.dumps(body).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+            f"content-type: application/json\r\n"
+            f"content-length: {len(payload)}\r\n\r\n".encode("latin-1") + payload
+        )
+
+    def _write_chunk(self, writer, body: dict):
+        data = f"data: {json.dumps(body, ensure_ascii=False)}\n\n".encode("utf-8")
+        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+async def serve(host: str, port: int, latency: float, tokens_per_second: float):
+    server = await MockOpenAIServer(latency, tokens_per_second).start(host, port)
+    print(f"Mock OpenAI: {server.base_url} (latency={latency}s, {tokens_per_second} tok/s)")
+    await asyncio.Event().wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Yerel mock OpenAI sunucusu")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.latency, args.tokens_per_second))
+    except KeyboardInterrupt:
+        pass
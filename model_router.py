@@ -0,0 +1,315 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import metrics
+from upstream import UpstreamBusy, is_retryable
+
+# Senaryo başına model listesi ve gecikmeye duyarlı seçim.
+#   - Her model için kayan pencerede (son ROUTER_WINDOW çağrı / ROUTER_WINDOW_SECONDS sn)
+#     p95 gecikme ve hata oranı tutulur
+#   - Sağlıklı modeller p95'e göre sıralanır (yeterli örneği olmayan liste sırasında kalır);
+#     hata oranı ROUTER_MAX_ERROR_RATE'i aşanlar en sona düşer, pencere boşalınca geri gelir
+#   - Timeout / 429 / 5xx / bağlantı hatasında sıradaki modele geçilir (fallback)
+#   - ROUTER_HEDGE_AFTER verilirse ilk model o kadar sürede cevap vermezse ikincisi de
+#     başlatılır, ilk gelen cevap kullanılır (stream'lerde hedge yok, sadece fallback).
+#     Senkron yolda kaybeden çağrı kesilemez: hedge kendi slotunu alır (hedge_slot), slotlar
+#     son kaybeden bitene kadar tutulur; geç biten cevabın kullanımı on_late'e verilir
+#
+#   OPENAI_MODEL=gpt-4o-mini                  varsayılan birincil model
+#   OPENAI_FALLBACK_MODELS=gpt-4.1-mini       virgülle ayrılmış yedekler (boş = yedek yok)
+#   ROUTER_TIMEOUT=30                         model başına deneme süresi (sn)
+#   ROUTER_HEDGE_AFTER=                       boş = kapalı, sn veya "p95" (birincil modelin p95'i)
+#   ROUTER_WINDOW=200, ROUTER_WINDOW_SECONDS=300, ROUTER_MIN_SAMPLES=20, ROUTER_MAX_ERROR_RATE=0.2
+#
+# Senaryo "Models" alanı (liste veya "a, b" metni) varsayılan listeyi ezer.
+
+CHAT_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+FALLBACK_MODELS = tuple(m.strip() for m in os.environ.get("OPENAI_FALLBACK_MODELS", "").split(",") if m.strip())
+DEFAULT_MODELS = (CHAT_MODEL,) + tuple(m for m in FALLBACK_MODELS if m != CHAT_MODEL)
+ROUTER_TIMEOUT = float(os.environ.get("ROUTER_TIMEOUT", "30"))
+ROUTER_HEDGE_AFTER = os.environ.get("ROUTER_HEDGE_AFTER", "").strip().lower()
+ROUTER_WINDOW = int(os.environ.get("ROUTER_WINDOW", "200"))
+ROUTER_WINDOW_SECONDS = float(os.environ.get("ROUTER_WINDOW_SECONDS", "300"))
+ROUTER_MIN_SAMPLES = int(os.environ.get("ROUTER_MIN_SAMPLES", "20"))
+ROUTER_MAX_ERROR_RATE = float(os.environ.get("ROUTER_MAX_ERROR_RATE", "0.2"))
+ROUTER_HEDGE_THREADS = int(os.environ.get("ROUTER_HEDGE_THREADS", "32"))
+
+metrics.METRICS.update({
+    "convince_model_calls_total": ("counter", "Upstream calls by model and outcome", ("model", "outcome")),
+    "convince_model_fallbacks_total": ("counter", "Responses served by a fallback model", ("model",)),
+    "convince_model_hedges_total": ("counter", "Hedged requests by winner", ("winner",)),
+})
+
+def scenario_models(scenario: dict) -> tuple:
+    value = scenario.get("Models")
+    if value is None:
+        return DEFAULT_MODELS
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, (list, tuple)):
+        raise ValueError("'Models' must be a list or a comma-separated string")
+    models = tuple(dict.fromkeys(str(m).strip() for m in value if str(m).strip()))
+    if not models:
+        raise ValueError("'Models' is empty")
+    return models
+
+class ModelHealth:
+    # Kayan pencere: (zaman, süre) — süre None ise hata
+    def __init__(self):
+        self._samples = deque(maxlen=ROUTER_WINDOW)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append((time.monotonic(), seconds))
+
+    def snapshot(self) -> dict:
+        cutoff = time.monotonic() - ROUTER_WINDOW_SECONDS
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            samples = [s for _, s in self._samples]
+        latencies = sorted(s for s in samples if s is not None)
+        errors = len(samples) - len(latencies)
+        p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else None
+        return {
+            "samples": len(samples),
+            "p95": p95,
+            "error_rate": errors / len(samples) if samples else 0.0,
+        }
+
+class ModelRouter:
+    def __init__(self, hedge_after: str = ROUTER_HEDGE_AFTER, timeout: float = ROUTER_TIMEOUT):
+        self.hedge_after = hedge_after
+        self.timeout = timeout
+        self._health = {}
+        self._lock = threading.Lock()
+        self._executor = None  # hedge için; sadece senkron yolda ve hedge açıksa kurulur
+
+    def health(self, model: str) -> ModelHealth:
+        health = self._health.get(model)
+        if health is None:
+            with self._lock:
+                health = self._health.setdefault(model, ModelHealth())
+        return health
+
+    def candidates(self, models: tuple) -> list:
+        if len(models) == 1:
+            return list(models)
+        ranked = []
+        for i, model in enumerate(models):
+            stats = self.health(model).snapshot()
+            known = stats["samples"] >= ROUTER_MIN_SAMPLES
+            unhealthy = known and stats["error_rate"] > ROUTER_MAX_ERROR_RATE
+            p95 = stats["p95"] if known and stats["p95"] is not None else float("inf")
+            ranked.append((unhealthy, p95, i, model))
+        return [model for *_, model in sorted(ranked)]
+
+    def hedge_delay(self, order: list, stream: bool):
+        if stream or len(order) < 2 or not self.hedge_after:
+            return None
+        if self.hedge_after == "p95":
+            stats = self.health(order[0]).snapshot()
+            return stats["p95"] if stats["samples"] >= ROUTER_MIN_SAMPLES else None
+        return float(self.hedge_after)
+
+    def _record(self, model: str, seconds: float, error: Exception = None, stream: bool = False):
+        if error is not None and not is_retryable(error):
+            # 400 vb. isteğin sorunu, modelin sağlığı değil
+            return
+        if error is not None:
+            self.health(model).record(None)
+        elif not stream:
+            # Stream'de süre sadece ilk byte'a kadar; p95'i karıştırmasın
+            self.health(model).record(seconds)
+        metrics.inc("convince_model_calls_total", (model, "error" if error is not None else "ok"))
+
+    def _route(self, order: list, model: str, tried: list, hedged: bool) -> dict:
+        if model != order[0] and not hedged:
+            metrics.inc("convince_model_fallbacks_total", (model,))
+        if hedged:
+            metrics.inc("convince_model_hedges_total", ("primary" if model == order[0] else "hedge",))
+        return {"model": model, "tried": tried, "hedged": hedged}
+
+    # ---- Senkron (Flask) ----
+    def _call(self, model: str, call, stream: bool):
+        started = time.perf_counter()
+        try:
+            result = call(model, self.timeout)
+        except Exception as e:
+            self._record(model, time.perf_counter() - started, e, stream)
+            raise
+        self._record(model, time.perf_counter() - started, stream=stream)
+        return result
+
+    def complete(self, models: tuple, call, stream: bool = False, hedge_slot=None, on_late=None):
+        # call(model, timeout) → SDK cevabı; (cevap, route) döner
+        # hedge_slot() → release: hedge için ek limiter slotu; on_late(model, cevap): kaybedenin cevabı
+        order = self.candidates(models)
+        hedge_after = self.hedge_delay(order, stream)
+        if hedge_after is not None:
+            return self._complete_hedged(order, call, hedge_after, hedge_slot, on_late)
+        error = None
+        for i, model in enumerate(order):
+            try:
+                return self._call(model, call, stream), self._route(order, model, order[:i + 1], False)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                error = e
+        raise error
+
+    def _complete_hedged(self, order: list, call, hedge_after: float, hedge_slot=None, on_late=None):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(ROUTER_HEDGE_THREADS, thread_name_prefix="hedge")
+        running, tried, error = {}, [], None
+        deadline = time.monotonic() + hedge_after
+        hedged = False
+        slots, settled = [], threading.Event()
+
+        def hedge(model):
+            # Slot beklerken kazanan belli olduysa çağrı hiç yapılmaz
+            slots.append(hedge_slot())
+            if settled.is_set():
+                return None
+            return self._call(model, call, False)
+
+        def launch():
+            model = order[len(tried)]
+            tried.append(model)
+            if running and hedge_slot is not None:
+                running[self._executor.submit(hedge, model)] = model
+            else:
+                running[self._executor.submit(self._call, model, call, False)] = model
+
+        launch()
+        try:
+            while running:
+                can_hedge = not hedged and len(tried) < len(order)
+                timeout = max(0.0, deadline - time.monotonic()) if can_hedge else None
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    launch()
+                    continue
+                for future in done:
+                    model = running.pop(future)
+                    if future.exception() is None:
+                        return future.result(), self._route(order, model, list(tried), hedged)
+                    if isinstance(future.exception(), UpstreamBusy):
+                        # Hedge için slot yok: birincil beklenmeye devam, model fallback'e kalır
+                        tried.remove(model)
+                        continue
+                    if not is_retryable(future.exception()):
+                        raise future.exception()
+                    error = future.exception()
+                if not running and len(tried) < len(order):
+                    launch()
+            raise error
+        finally:
+            # Kaybeden çağrı iptal edilemez (senkron HTTP); başlamamışlar iptal, diğerleri beklenir
+            settled.set()
+            losers = {future: model for future, model in running.items() if not future.cancel()}
+            self._settle_losers(losers, slots, on_late)
+
+    def _settle_losers(self, losers: dict, slots: list, on_late):
+        def release():
+            for release_slot in slots:
+                release_slot()
+
+        if not losers:
+            release()
+            return
+        remaining = [len(losers)]
+        lock = threading.Lock()
+
+        def settle(future):
+            try:
+                if on_late is not None and future.exception() is None and future.result() is not None:
+                    on_late(losers[future], future.result())
+            finally:
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    release()
+
+        for future in losers:
+            future.add_done_callback(settle)
+
+    # ---- asyncio (asgi.py) ----
+    async def _acall(self, model: str, call, stream: bool):
+        started = time.perf_counter()
+        try:
+            result = await call(model, self.timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._record(model, time.perf_counter() - started, e, stream)
+            raise
+        self._record(model, time.perf_counter() - started, stream=stream)
+        return result
+
+    async def acomplete(self, models: tuple, call, stream: bool = False):
+        order = self.candidates(models)
+        hedge_after = self.hedge_delay(order, stream)
+        running, tried, error = {}, [], None
+        deadline = time.monotonic() + (hedge_after or 0.0)
+        hedged = False
+
+        def launch():
+            model = order[len(tried)]
+            tried.append(model)
+            running[asyncio.ensure_future(self._acall(model, call, stream))] = model
+
+        launch()
+        try:
+            while running:
+                can_hedge = hedge_after is not None and not hedged and len(tried) < len(order)
+                timeout = max(0.0, deadline - time.monotonic()) if can_hedge else None
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    launch()
+                    continue
+                for task in done:
+                    model = running.pop(task)
+                    if task.exception() is None:
+                        return task.result(), self._route(order, model, list(tried), hedged)
+                    if not is_retryable(task.exception()):
+                        raise task.exception()
+                    error = task.exception()
+                if not running and len(tried) < len(order):
+                    launch()
+            raise error
+        finally:
+            # Kaybeden (veya istek iptal edildiyse hepsi) iptal
+            for task in running:
+                task.cancel()
+
+    def stats(self) -> dict:
+        with self._lock:
+            models = list(self._health)
+        return {model: self.health(model).snapshot() for model in models}
+
+def register_router_metrics(router: ModelRouter):
+    def p95():
+        return {(m,): s["p95"] for m, s in router.stats().items() if s["p95"] is not None}
+
+    def error_rate():
+        return {(m,): s["error_rate"] for m, s in router.stats().items()}
+
+    metrics.register_sampler(
+        "convince_model_latency_p95_seconds", "gauge", "Rolling p95 latency per model (max over workers)",
+        ("model",), p95, merge="max",
+    )
+    metrics.register_sampler(
+        "convince_model_error_rate", "gauge", "Rolling error rate per model (max over workers)",
+        ("model",), error_rate, merge="max",
+    )
@@ -0,0 +1,63 @@
+import gzip
+import hashlib
+import json
+
+from flask import Response, request
+
+try:
+    import brotli  # opsiyonel: kuruluysa br varyantı da üretilir
+except ImportError:
+    brotli = None
+
+# Sık istenen, nadiren değişen JSON cevapları için ön-kodlanmış gövdeler.
+# Gövde bir kez serialize + sıkıştırılır; istek başına sadece header seçimi yapılır.
+
+DEFAULT_CACHE_CONTROL = "public, max-age=300"
+
+class Payload:
+    __slots__ = ("body", "etag", "variants", "cache_control")
+
+    def __init__(self, body: bytes, cache_control: str = DEFAULT_CACHE_CONTROL):
+        self.body = body
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.cache_control = cache_control
+        # encoding -> (gövde, etag); farklı content-coding farklı temsil olduğu için etag'ler ayrı
+        self.variants = {"gzip": (gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gz"')}
+        if brotli is not None:
+            self.variants["br"] = (brotli.compress(body, quality=11), f'"{digest}-br"')
+
+    def etags(self):
+        return [self.etag] + [etag for _, etag in self.variants.values()]
+
+def build_payload(obj, cache_control: str = DEFAULT_CACHE_CONTROL) -> Payload:
+    body = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return Payload(body, cache_control)
+
+def pick_encoding(payload: Payload):
+    accepted = request.accept_encodings
+    for encoding in ("br", "gzip"):
+        if encoding in payload.variants and accepted[encoding] > 0:
+            return encoding
+    return None
+
+def payload_response(payload: Payload) -> Response:
+    headers = {
+        "Cache-Control": payload.cache_control,
+        "Vary": "Accept-Encoding",
+    }
+
+    encoding = pick_encoding(payload)
+    if encoding:
+        body, etag = payload.variants[encoding]
+        headers["Content-Encoding"] = encoding
+    else:
+        body, etag = payload.body, payload.etag
+    headers["ETag"] = etag
+
+    # Aynı içerik, hangi varyant olursa olsun → 304
+    # (proxy'ler sıkıştırırken etag'i W/ ile zayıflatabilir → zayıf karşılaştırma)
+    if any(request.if_none_match.contains_weak(e.strip('"')) for e in payload.etags()):
+        return Response(status=304, headers=headers)
+
+    return Response(body, status=200, mimetype="application/json", headers=headers)
@@ -0,0 +1,253 @@
+import heapq
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+# Oyuncu yazarken taslak üzerinden ön hazırlık (opsiyonel, DRAFT_PREFETCH=1).
+# GameScreen yazılan metni debounce'lu olarak /api/ask/draft'a gönderir:
+#   - Turun ilk taslağında önek (system prompt + geçmiş) sağlayıcının prompt cache'ine
+#     ısıtılır: max_tokens=1'lik çağrı; önek DRAFT_WARM_MIN_TOKENS'tan kısaysa yapılmaz
+#     (OpenAI 1024 token altını cache'lemez)
+#   - Taslak DRAFT_DEBOUNCE sn değişmezse cevap önceden üretilir
+#   - Nihai /api/ask metni (normalize edilmiş) taslakla aynıysa hazır cevap, hâlâ
+#     üretiliyorsa aynı çağrının sonucu kullanılır; değilse normal yoldan gidilir
+#
+#   DRAFT_PREFETCH=0                 kapalı (varsayılan)
+#   DRAFT_DEBOUNCE=1.5               taslak bu kadar sn sabit kalınca üret
+#   DRAFT_MIN_CHARS=15               daha kısa taslaklar için üretim yok (ısıtma var)
+#   DRAFT_MAX_PER_TURN=2             tur başına en fazla ön üretim
+#   DRAFT_MAX_IN_FLIGHT=4            process başına eşzamanlı ön üretim / ısıtma
+#   DRAFT_TOKEN_BUDGET=200000        saatlik ön üretim + ısıtma token bütçesi (0 = sınırsız)
+#   DRAFT_MAX_PER_OWNER=30           kimlik (kullanıcı / IP) başına saatlik ön üretim + ısıtma (0 = sınırsız)
+#   DRAFT_RATE_LIMIT=30              kimlik başına /api/ask/draft isteği / RATE_WINDOW sn (0 = sınırsız)
+#   DRAFT_WARM=1, DRAFT_WARM_MIN_TOKENS=1024
+#   DRAFT_TTL=120                    kullanılmayan taslak / hazır cevap ne kadar tutulur (sn)
+#
+# Gerçek istekler upstream kuyruğunda bekliyorsa ön üretim yapılmaz; harcanan token'lar
+# oyuncunun günlük kotasına da yazılır. Geçmişi değiştirip her istekte yeni önek (→ yeni
+# ısıtma) açan tek bir istemci ortak bütçeyi tüketemesin diye kimlik başına sınır var.
+# Durum process içinde: çok worker'da taslak ve nihai istek farklı worker'a düşerse
+# sadece prompt cache ısıtması işe yarar.
+
+DRAFT_PREFETCH = os.environ.get("DRAFT_PREFETCH", "0").lower() in ("1", "true", "yes")
+DRAFT_DEBOUNCE = float(os.environ.get("DRAFT_DEBOUNCE", "1.5"))
+DRAFT_MIN_CHARS = int(os.environ.get("DRAFT_MIN_CHARS", "15"))
+DRAFT_MAX_PER_TURN = int(os.environ.get("DRAFT_MAX_PER_TURN", "2"))
+DRAFT_MAX_IN_FLIGHT = int(os.environ.get("DRAFT_MAX_IN_FLIGHT", "4"))
+DRAFT_TOKEN_BUDGET = int(os.environ.get("DRAFT_TOKEN_BUDGET", "200000"))
+DRAFT_MAX_PER_OWNER = int(os.environ.get("DRAFT_MAX_PER_OWNER", "30"))
+DRAFT_RATE_LIMIT = int(os.environ.get("DRAFT_RATE_LIMIT", "30"))
+DRAFT_WARM = os.environ.get("DRAFT_WARM", "1").lower() in ("1", "true", "yes")
+DRAFT_WARM_MIN_TOKENS = int(os.environ.get("DRAFT_WARM_MIN_TOKENS", "1024"))
+DRAFT_TTL = float(os.environ.get("DRAFT_TTL", "120"))
+BUDGET_WINDOW = 3600
+
+metrics.METRICS.update({
+    "convince_draft_total": ("counter", "Draft prefetch events by outcome", ("outcome",)),
+    "convince_draft_tokens_total": ("counter", "Tokens spent speculatively on drafts", ("kind",)),
+})
+
+class _Draft:
+    # Bir turun (önek) son taslağı; version her güncellemede artar, debounce eskiyi atlar
+    __slots__ = ("turn", "key", "version", "generated", "keys", "expires_at")
+
+    def __init__(self):
+        self.turn = None
+        self.key = None
+        self.version = 0
+        self.generated = 0
+        self.keys = []  # bu tur için üretilmiş taslak anahtarları
+        self.expires_at = 0.0
+
+class DraftPrefetcher:
+    def __init__(self, generate, warm, busy, debounce: float = DRAFT_DEBOUNCE,
+                 min_chars: int = DRAFT_MIN_CHARS, max_per_turn: int = DRAFT_MAX_PER_TURN,
+                 max_in_flight: int = DRAFT_MAX_IN_FLIGHT, token_budget: int = DRAFT_TOKEN_BUDGET,
+                 max_per_owner: int = DRAFT_MAX_PER_OWNER, warm_enabled: bool = DRAFT_WARM,
+                 ttl: float = DRAFT_TTL):
+        # generate(turn) → {"answer", "route", "tokens"}; warm(turn) → token (0 = yapılmadı);
+        # busy() → gerçek istekler bekliyor mu
+        self.generate = generate
+        self.warm = warm
+        self.busy = busy
+        self.debounce = debounce
+        self.min_chars = min_chars
+        self.max_per_turn = max_per_turn
+        self.max_in_flight = max_in_flight
+        self.token_budget = token_budget
+        self.max_per_owner = max_per_owner
+        self.warm_enabled = warm_enabled
+        self.ttl = ttl
+        self._cond = threading.Condition()
+        self._drafts = {}              # önek anahtarı → _Draft
+        self._results = OrderedDict()  # taslak anahtarı → (Future, expires_at)
+        self._timers = []              # (zaman, sıra, önek, version) heap'i
+        self._seq = 0
+        self._thread = None
+        self._executor = ThreadPoolExecutor(max_in_flight, thread_name_prefix="draft")
+        self._budget_window = 0
+        self._owner_calls = {}  # kimlik → bu saatteki ön üretim + ısıtma sayısı
+        self.spent = 0
+        self.in_flight = 0
+
+    def _outcome(self, outcome: str):
+        metrics.inc("convince_draft_total", (outcome,))
+
+    def _start(self):
+        # Zamanlayıcı thread'i ilk taslakta başlar (import'ta thread yok)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="draft-debounce", daemon=True)
+            self._thread.start()
+
+    def _prune(self, now: float):
+        while self._results:
+            key, (future, expires_at) = next(iter(self._results.items()))
+            if expires_at > now:
+                break
+            self._results.popitem(last=False)
+            if future.done() and future.result() is not None:
+                self._outcome("wasted")
+        for prefix in [p for p, d in self._drafts.items() if d.expires_at <= now]:
+            del self._drafts[prefix]
+
+    def update(self, prefix: str, key: str, turn: dict, text: str) -> str:
+        # Taslak durumu döner: typing / debouncing / generating / ready / capped
+        now = time.monotonic()
+        warm = False
+        with self._cond:
+            self._start()
+            self._prune(now)
+            draft = self._drafts.get(prefix)
+            if draft is None:
+                draft = self._drafts[prefix] = _Draft()
+                warm = self.warm_enabled and self._skip_reason(time.time(), turn["identity"]) is None
+                if warm:
+                    self._count_owner(turn["identity"])
+            draft.expires_at = now + self.ttl
+            draft.version += 1  # bekleyen debounce geçersiz
+            if key in self._results:
+                future, _ = self._results[key]
+                status = "ready" if future.done() else "generating"
+            elif len(text) < self.min_chars:
+                status = "typing"
+            elif draft.generated >= self.max_per_turn:
+                status = "capped"
+            else:
+                draft.turn, draft.key = turn, key
+                self._seq += 1
+                heapq.heappush(self._timers, (now + self.debounce, self._seq, prefix, draft.version))
+                self._cond.notify()
+                status = "debouncing"
+        if warm:
+            self._submit(self._warm, turn)
+        return status
+
+    def cancel(self, prefix: str):
+        # Oyuncu taslağı sildi: bekleyen üretim başlamaz; hazır cevaplar TTL'e kadar durur
+        with self._cond:
+            draft = self._drafts.get(prefix)
+            if draft is not None:
+                draft.version += 1
+
+    def take(self, prefix: str, key: str):
+        # Nihai istek: eşleşen ön üretimin Future'ı (sonuç None = başarısız) veya None
+        with self._cond:
+            draft = self._drafts.pop(prefix, None)
+            entry = self._results.pop(key, None)
+            for other in (draft.keys if draft else ()):
+                if other != key and self._results.pop(other, None) is not None:
+                    self._outcome("wasted")
+        if entry is not None:
+            self._outcome("hit")
+            return entry[0]
+        if draft is not None and draft.generated:
+            self._outcome("miss")
+        return None
+
+    def _skip_reason(self, now: float, owner: str):
+        window = int(now // BUDGET_WINDOW)
+        if window != self._budget_window:
+            self._budget_window, self.spent = window, 0
+            self._owner_calls.clear()
+        if self.in_flight >= self.max_in_flight:
+            return "skip_in_flight"
+        if self.token_budget > 0 and self.spent >= self.token_budget:
+            return "skip_budget"
+        if self.max_per_owner > 0 and self._owner_calls.get(owner, 0) >= self.max_per_owner:
+            return "skip_owner"
+        if self.busy():
+            return "skip_busy"
+        return None
+
+    def _count_owner(self, owner: str):
+        self._owner_calls[owner] = self._owner_calls.get(owner, 0) + 1
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._timers or self._timers[0][0] > time.monotonic():
+                    self._cond.wait(self._timers[0][0] - time.monotonic() if self._timers else None)
+                _, _, prefix, version = heapq.heappop(self._timers)
+                draft = self._drafts.get(prefix)
+                if draft is None or draft.version != version:
+                    continue  # taslak değişti, iptal edildi veya tur bitti
+                reason = self._skip_reason(time.time(), draft.turn["identity"])
+                if reason is not None:
+                    self._outcome(reason)
+                    continue
+                self._count_owner(draft.turn["identity"])
+                draft.generated += 1
+                draft.keys.append(draft.key)
+                future = self._submit(self._generate, draft.turn)
+                self._results[draft.key] = (future, time.monotonic() + self.ttl)
+
+    def _submit(self, fn, turn: dict):
+        with self._cond:
+            self.in_flight += 1
+        return self._executor.submit(fn, turn)
+
+    def _spend(self, kind: str, tokens: int):
+        with self._cond:
+            self.spent += tokens
+        metrics.inc("convince_draft_tokens_total", (kind,), tokens)
+
+    def _warm(self, turn: dict):
+        try:
+            tokens = self.warm(turn)
+            if tokens:
+                self._spend("warm", tokens)
+                self._outcome("warm")
+        except Exception as e:
+            print(f"Draft warm error: {e}")
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+
+    def _generate(self, turn: dict):
+        try:
+            result = self.generate(turn)
+            self._spend("generate", result["tokens"])
+            self._outcome("generate")
+            return result
+        except Exception as e:
+            print(f"Draft prefetch error: {e}")
+            self._outcome("error")
+            return None
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "drafts": len(self._drafts),
+                "results": len(self._results),
+                "in_flight": self.in_flight,
+                "spent_tokens": self.spent,
+                "token_budget": self.token_budget,
+                "owners": len(self._owner_calls),
+            }
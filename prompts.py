@@ -0,0 +1,78 @@
+import re
+import threading
+
+# Senaryo system prompt'ları açılışta bir kez, byte-byte aynı olacak şekilde derlenir.
+# Sıra sabit: ortak güvenlik bloğu → hikaye → ana prompt. Böylece aynı senaryonun
+# tüm turları (ve tüm kullanıcılar) aynı öneki paylaşır ve sağlayıcının prompt
+# cache'i isabet eder.
+
+GUARD_BLOCK = (
+    "If the other party becomes aggressive, disrespectful, or uses profanity, do not continue negotiating.\n"
+    "Calmly say, “This conversation is no longer productive. I’m ending the negotiation here.”\n"
+    "In Turkish, also say: \"Görüşmeyi burada sonlandırıyorum.\"\n"
+    "Then stop all responses and end the conversation.\n"
+    "Do not argue or justify your decision."
+)
+
+def normalize_text(text: str) -> str:
+    lines = [line.strip() for line in text.replace("\r\n", "\n").split("\n")]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+def render_system_prompt(scenario: dict) -> str:
+    return (
+        f"{GUARD_BLOCK}\n\n"
+        f"Hikaye:\n{normalize_text(scenario['Hikaye'])}\n\n"
+        f"Ana prompt:\n{normalize_text(scenario['System Prompt'])}"
+    )
+
+# ---- Prompt cache isabet oranı ----
+def usage_summary(usage) -> dict:
+    if usage is None:
+        return {}
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": usage.prompt_tokens or 0,
+        "completion_tokens": usage.completion_tokens or 0,
+        "cached_tokens": getattr(details, "cached_tokens", None) or 0,
+    }
+
+class PromptCacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_scenario = {}  # scenario_id -> [calls, prompt_tokens, cached_tokens]
+
+    def record(self, scenario_id, usage: dict):
+        with self._lock:
+            row = self._by_scenario.setdefault(scenario_id, [0, 0, 0])
+            row[0] += 1
+            row[1] += usage.get("prompt_tokens", 0)
+            row[2] += usage.get("cached_tokens", 0)
+
+    def hit_rate(self, scenario_id=None) -> float:
+        with self._lock:
+            if scenario_id is None:
+                rows = list(self._by_scenario.values())
+            else:
+                rows = [self._by_scenario.get(scenario_id, [0, 0, 0])]
+            prompt = sum(r[1] for r in rows)
+            cached = sum(r[2] for r in rows)
+        return cached / prompt if prompt else 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                sid: {"calls": calls, "prompt_tokens": prompt, "cached_tokens": cached}
+                for sid, (calls, prompt, cached) in self._by_scenario.items()
+            }
+
+prompt_cache_stats = PromptCacheStats()
+
+def record_usage(scenario_id, usage: dict):
+    if not usage:
+        return
+    prompt_cache_stats.record(scenario_id, usage)
+    print(
+        f"OpenAI usage: scenario={scenario_id} prompt={usage['prompt_tokens']} "
+        f"cached={usage['cached_tokens']} completion={usage['completion_tokens']} "
+        f"cache_hit_rate={prompt_cache_stats.hit_rate(scenario_id):.0%}"
+    )
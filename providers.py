@@ -0,0 +1,151 @@
+import os
+
+from lazy import Lazy
+from llm_backends import LLM_BACKEND, AsyncMockClient, MockClient
+
+# Chat completion sağlayıcıları. Hepsi OpenAI uyumlu: OpenAI'nin kendisi, yerel bir
+# llama.cpp / vLLM sunucusu (.../v1/chat/completions) veya process içi mock.
+# Senaryonun "Models" listesinde "<sağlayıcı>:<model>" yazılır; öneki kayıtlı bir
+# sağlayıcı olmayan isimler (gpt-4o-mini, ft:gpt-4o-mini:...) varsayılan "openai"ye gider:
+#   Models: local:qwen2.5-7b-instruct, gpt-4o-mini      → önce yerel model, olmazsa OpenAI
+#
+#   LLM_PROVIDERS=local=http://127.0.0.1:8080/v1        virgülle ayrılmış isim=base_url ("mock" = process içi)
+#   LLM_PROVIDER_<İSİM>_API_KEY=...                     yoksa "none" (yerel sunucular anahtar istemez)
+#   LLM_PROVIDER_<İSİM>_MAX_CONNECTIONS=8               bağlantı havuzu; yerel sunucunun paralel slot sayısı kadar
+#   LLM_PROVIDER_<İSİM>_TIMEOUT=120
+#   LLM_PROVIDER_<İSİM>_STREAM_USAGE=1                  0 → stream_options gönderilmez (desteklemeyen sunucular)
+#   OPENAI_MAX_CONNECTIONS=200                          varsayılan sağlayıcının havuzu
+#
+# İstemciler ilk kullanımda kurulur (lazy.py); senkron ve asenkron havuzlar ayrıdır.
+
+DEFAULT_PROVIDER = "openai"
+OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", "200"))
+
+def provider_env(name: str, key: str, default: str) -> str:
+    return os.environ.get(f"LLM_PROVIDER_{name.upper()}_{key}", default)
+
+class Provider:
+    def __init__(self, name: str, base_url: str = None, api_key: str = None, max_connections: int = 8,
+                 timeout: float = 120.0, stream_usage: bool = True, mock: bool = False, lazy_name: str = None):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.stream_usage = stream_usage
+        self.mock = mock
+        lazy_name = lazy_name or f"llm:{name}"
+        self.client = Lazy(self._make_client, lazy_name)
+        self.aclient = Lazy(self._make_async_client, f"{lazy_name}-async")
+
+    def _limits(self):
+        import httpx
+
+        return httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+
+    def _make_client(self):
+        if self.mock:
+            return MockClient()
+        import httpx
+        from openai import OpenAI  # ~0.4 sn import; ilk çağrıda
+
+        # Tekrar denemeler upstream_limiter'da (jitter'lı backoff), SDK'nınkiler kapalı
+        http_client = httpx.Client(limits=self._limits(), timeout=httpx.Timeout(self.timeout, connect=5.0))
+        return OpenAI(api_key=self.api_key, base_url=self.base_url, http_client=http_client, max_retries=0)
+
+    def _make_async_client(self):
+        if self.mock:
+            return AsyncMockClient()
+        import httpx
+        from openai import AsyncOpenAI
+
+        http_client = httpx.AsyncClient(limits=self._limits(), timeout=httpx.Timeout(self.timeout, connect=5.0))
+        return AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, http_client=http_client, max_retries=0)
+
+    def _kwargs(self, kwargs: dict) -> dict:
+        if not self.stream_usage:
+            kwargs.pop("stream_options", None)
+        return kwargs
+
+    def create(self, model: str, **kwargs):
+        return self.client.chat.completions.create(model=model, **self._kwargs(kwargs))
+
+    async def acreate(self, model: str, **kwargs):
+        return await self.aclient.chat.completions.create(model=model, **self._kwargs(kwargs))
+
+    def info(self) -> dict:
+        # /api/stats herkese açık: iç ağ adresi (base_url) yayınlanmaz, sadece türü
+        return {
+            "endpoint": "mock" if self.mock else "custom" if self.base_url else "default",
+            "max_connections": self.max_connections,
+            "stream_usage": self.stream_usage,
+        }
+
+class Providers:
+    def __init__(self, providers: dict):
+        self._providers = providers
+        self.default = providers[DEFAULT_PROVIDER]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._providers
+
+    def resolve(self, spec: str) -> tuple:
+        # "local:qwen" → (local, "qwen"); bilinmeyen önek model adının parçasıdır
+        name, sep, model = spec.partition(":")
+        if sep and name in self._providers:
+            return self._providers[name], model
+        return self.default, spec
+
+    def create(self, spec: str, **kwargs):
+        provider, model = self.resolve(spec)
+        return provider.create(model, **kwargs)
+
+    async def acreate(self, spec: str, **kwargs):
+        provider, model = self.resolve(spec)
+        return await provider.acreate(model, **kwargs)
+
+    async def aclose(self):
+        from lazy import is_ready
+
+        for provider in self._providers.values():
+            if is_ready(provider.aclient):
+                await provider.aclient.close()
+
+    def stats(self) -> dict:
+        return {name: provider.info() for name, provider in self._providers.items()}
+
+def parse_providers(spec: str) -> dict:
+    providers = {}
+    for item in filter(None, (x.strip() for x in spec.split(","))):
+        name, sep, base_url = item.partition("=")
+        name = name.strip().lower()
+        if not sep or not name or not base_url.strip():
+            raise ValueError(f"LLM_PROVIDERS entry must be name=base_url: {item!r}")
+        if name == DEFAULT_PROVIDER:
+            raise ValueError(f"LLM_PROVIDERS: {DEFAULT_PROVIDER!r} is reserved for the default provider")
+        base_url = base_url.strip()
+        providers[name] = Provider(
+            name,
+            base_url=None if base_url == "mock" else base_url,
+            api_key=provider_env(name, "API_KEY", "none"),
+            max_connections=int(provider_env(name, "MAX_CONNECTIONS", "8")),
+            timeout=float(provider_env(name, "TIMEOUT", "120")),
+            stream_usage=provider_env(name, "STREAM_USAGE", "1").lower() not in ("0", "false", "no"),
+            mock=base_url == "mock",
+        )
+    return providers
+
+def make_providers(api_key: str, spec: str = None) -> Providers:
+    spec = os.environ.get("LLM_PROVIDERS", "") if spec is None else spec
+    providers = {
+        DEFAULT_PROVIDER: Provider(
+            DEFAULT_PROVIDER,
+            api_key=api_key,  # base_url: OPENAI_BASE_URL (SDK okur)
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            timeout=60.0,
+            mock=LLM_BACKEND == "mock",
+            lazy_name="openai",
+        ),
+    }
+    providers.update(parse_providers(spec))
+    return Providers(providers)
@@ -0,0 +1,176 @@
+import math
+import os
+import threading
+import time
+
+# Kullanıcı / IP bazlı hız sınırı ve günlük token kotası (/api/ask).
+#   - Kayan pencere: USER_RATE_LIMIT (JWT sub başına) ve IP_RATE_LIMIT istek / RATE_WINDOW sn
+#   - Günlük token kotası: USER_DAILY_TOKENS (giriş yapmış), ANON_DAILY_TOKENS (IP bazlı)
+# Sayaçlar process içinde; QUOTA_BACKEND=redis://... verilirse tüm worker'lar ortak sayar.
+# 0 = sınır yok.
+
+RATE_WINDOW = int(os.environ.get("RATE_WINDOW", "60"))
+USER_RATE_LIMIT = int(os.environ.get("USER_RATE_LIMIT", "20"))
+IP_RATE_LIMIT = int(os.environ.get("IP_RATE_LIMIT", "60"))
+USER_DAILY_TOKENS = int(os.environ.get("USER_DAILY_TOKENS", "300000"))
+ANON_DAILY_TOKENS = int(os.environ.get("ANON_DAILY_TOKENS", "50000"))
+DAY = 24 * 60 * 60
+
+class MemoryCounterStore:
+    def __init__(self):
+        self._data = {}  # key -> [value, expires_at]
+        self._lock = threading.Lock()
+        self._next_prune = 0.0
+
+    def get(self, key: str) -> int:
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            return entry[0] if entry and entry[1] > now else 0
+
+    def incr(self, key: str, amount: int, ttl: int) -> int:
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if not entry or entry[1] <= now:
+                entry = self._data[key] = [0, now + ttl]
+            entry[0] += amount
+            if now >= self._next_prune:
+                self._prune(now)
+            return entry[0]
+
+    def _prune(self, now: float):
+        for key in [k for k, (_, expires_at) in self._data.items() if expires_at <= now]:
+            del self._data[key]
+        self._next_prune = now + 60
+
+class RedisCounterStore:
+    def __init__(self, url: str, prefix: str = "convince:quota:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key: str) -> int:
+        return int(self.client.get(self.prefix + key) or 0)
+
+    def incr(self, key: str, amount: int, ttl: int) -> int:
+        pipe = self.client.pipeline()
+        pipe.incrby(self.prefix + key, amount)
+        pipe.expire(self.prefix + key, ttl, nx=True)
+        return pipe.execute()[0]
+
+def make_counter_store(spec: str = None):
+    spec = spec or os.environ.get("QUOTA_BACKEND", "memory")
+    if spec == "memory":
+        return MemoryCounterStore()
+    if spec.startswith(("redis://", "rediss://")):
+        return RedisCounterStore(spec)
+    raise ValueError(f"Unknown QUOTA_BACKEND: {spec}")
+
+class QuotaExceeded(Exception):
+    pass
+
+class Decision:
+    __slots__ = ("allowed", "identity", "retry_after", "headers")
+
+    def __init__(self, allowed: bool, identity: str, retry_after: int, headers: dict):
+        self.allowed = allowed
+        self.identity = identity
+        self.retry_after = retry_after
+        self.headers = headers
+
+class QuotaGuard:
+    def __init__(self, store, window: int = RATE_WINDOW, user_limit: int = USER_RATE_LIMIT,
+                 ip_limit: int = IP_RATE_LIMIT, user_tokens: int = USER_DAILY_TOKENS,
+                 anon_tokens: int = ANON_DAILY_TOKENS):
+        self.store = store
+        self.window = window
+        self.user_limit = user_limit
+        self.ip_limit = ip_limit
+        self.user_tokens = user_tokens
+        self.anon_tokens = anon_tokens
+
+    def _sliding_count(self, key: str, now: float) -> tuple:
+        # İki sabit pencerenin ağırlıklı toplamı: O(1) bellek, Redis'te de aynı
+        index = int(now // self.window)
+        elapsed = (now % self.window) / self.window
+        current = self.store.get(f"rl:{key}:{index}")
+        previous = self.store.get(f"rl:{key}:{index - 1}")
+        return previous * (1 - elapsed) + current, index
+
+    def _day(self, now: float) -> int:
+        return int(now // DAY)
+
+    def identity(self, user: dict, ip: str) -> str:
+        sub = (user or {}).get("sub")
+        return f"user:{sub}" if sub else f"ip:{ip}"
+
+    def hit(self, key: str, limit: int) -> bool:
+        # Tek kayan pencere (ör. taslaklar); sınır doluysa False ve sayaç artmaz
+        if limit <= 0:
+            return True
+        count, index = self._sliding_count(key, time.time())
+        if count + 1 > limit:
+            return False
+        self.store.incr(f"rl:{key}:{index}", 1, self.window * 2)
+        return True
+
+    def tokens_remaining(self, identity: str):
+        # Sayaç tüketmeyen kontrol (taslak ön üretimi); sınır yoksa None
+        limit = self.user_tokens if identity.startswith("user:") else self.anon_tokens
+        if limit <= 0:
+            return None
+        return max(0, limit - self.store.get(f"tokens:{identity}:{self._day(time.time())}"))
+
+    def check(self, user: dict, ip: str) -> Decision:
+        now = time.time()
+        sub = (user or {}).get("sub")
+        identity = self.identity(user, ip)
+        headers = {}
+        retry_after = 0
+
+        limits = [(f"ip:{ip}", self.ip_limit)]
+        if sub:
+            limits.insert(0, (identity, self.user_limit))
+
+        # Önce tüm sınırlara bak, sonra say: reddedilen istek hiçbir sayacı tüketmesin
+        windows = []
+        for key, limit in limits:
+            if limit <= 0:
+                continue
+            count, index = self._sliding_count(key, now)
+            remaining = max(0, int(limit - count - 1))
+            reset = math.ceil((index + 1) * self.window - now)
+            windows.append((key, index))
+            # İstemciye en kısıtlayıcı sınır bildirilir
+            if "X-RateLimit-Remaining" not in headers or remaining < int(headers["X-RateLimit-Remaining"]):
+                headers.update({
+                    "X-RateLimit-Limit": str(limit),
+                    "X-RateLimit-Remaining": str(remaining),
+                    "X-RateLimit-Reset": str(reset),
+                })
+            if count + 1 > limit:
+                return Decision(False, identity, reset, headers)
+
+        token_limit = self.user_tokens if sub else self.anon_tokens
+        if token_limit > 0:
+            used = self.store.get(f"tokens:{identity}:{self._day(now)}")
+            remaining = max(0, token_limit - used)
+            headers.update({
+                "X-Quota-Tokens-Limit": str(token_limit),
+                "X-Quota-Tokens-Remaining": str(remaining),
+                "X-Quota-Reset": str(math.ceil((self._day(now) + 1) * DAY - now)),
+            })
+            if remaining <= 0:
+                retry_after = int(headers["X-Quota-Reset"])
+                return Decision(False, identity, retry_after, headers)
+
+        for key, index in windows:
+            self.store.incr(f"rl:{key}:{index}", 1, self.window * 2)
+        return Decision(True, identity, retry_after, headers)
+
+    def charge(self, identity: str, tokens: int):
+        if not identity or tokens <= 0:
+            return
+        self.store.incr(f"tokens:{identity}:{self._day(time.time())}", tokens, DAY + 3600)
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# Açılış turları için cevap cache'i (opsiyonel, RESPONSE_CACHE=1 ile açılır).
+# Aynı senaryoya aynı ilk mesajları gönderen oyuncular ("merhaba", "konuşalım")
+# OpenAI'ye tekrar gitmeden aynı cevabı alır. Sadece ilk K turda devrede.
+#
+#   RESPONSE_CACHE=1
+#   RESPONSE_CACHE_MAX_TURNS=2        ilk kaç oyuncu turu cache'lenir
+#   RESPONSE_CACHE_TTL=3600
+#   RESPONSE_CACHE_SIZE=5000          bellek katmanı (LRU)
+#   RESPONSE_CACHE_PATH=/tmp/rc.db    opsiyonel disk katmanı (SQLite)
+
+RESPONSE_CACHE_ENABLED = os.environ.get("RESPONSE_CACHE", "0").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_MAX_TURNS = int(os.environ.get("RESPONSE_CACHE_MAX_TURNS", "2"))
+RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "5000"))
+RESPONSE_CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH")
+
+_PUNCTUATION = re.compile(r"[^\w\s%]", re.UNICODE)
+_SPACES = re.compile(r"\s+")
+
+def normalize_input(text: str) -> str:
+    text = unicodedata.normalize("NFC", text or "").casefold()
+    text = _PUNCTUATION.sub(" ", text)
+    return _SPACES.sub(" ", text).strip()
+
+def player_turns(history: list) -> int:
+    return sum(1 for m in history if m.get("sender") == "user")
+
+def cache_key(scenario_id, history: list, user_input: str, params: dict) -> str:
+    raw = json.dumps(
+        [
+            scenario_id,
+            [[m.get("sender") == "user", normalize_input(m.get("text", ""))] for m in history],
+            normalize_input(user_input),
+            params,
+        ],
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class DiskTier:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, answer TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        row = self._conn().execute(
+            "SELECT answer, expires_at FROM responses WHERE key = ? AND expires_at >= ?", (key, time.time())
+        ).fetchone()
+        return row
+
+    def put(self, key: str, answer: str, expires_at: float):
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, answer, expires_at) VALUES (?, ?, ?)",
+                (key, answer, expires_at),
+            )
+
+class ResponseCache:
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE, ttl: int = RESPONSE_CACHE_TTL,
+                 max_turns: int = RESPONSE_CACHE_MAX_TURNS, path: str = RESPONSE_CACHE_PATH):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_turns = max_turns
+        self.disk = DiskTier(path) if path else None
+        self._data = OrderedDict()  # key -> (expires_at, answer); expires_at time.time() bazlı
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def applies(self, history: list) -> bool:
+        return player_turns(history) < self.max_turns
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] >= now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+
+        row = self.disk.get(key) if self.disk else None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            answer, expires_at = row
+            self._remember(key, answer, expires_at)
+            return answer
+
+    def put(self, key: str, answer: str):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, answer, expires_at)
+        if self.disk:
+            self.disk.put(key, answer, expires_at)
+
+    def _remember(self, key: str, answer: str, expires_at: float):
+        self._data[key] = (expires_at, answer)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._data),
+            }
+
+response_cache = ResponseCache() if RESPONSE_CACHE_ENABLED else None
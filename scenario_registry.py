@@ -0,0 +1,187 @@
+import hashlib
+import json
+
+from context_window import scenario_budget
+from goals import GoalDetector
+from model_router import scenario_models
+from payloads import build_payload
+from prompts import render_system_prompt
+
+# Senaryolar açılışta bir kez derlenir: alanlar doğrulanır, system prompt render
+# edilir, hedef dedektörü ve public JSON payload'ları (ETag + gzip/br) hazırlanır.
+# Sonrası salt okunur: istek yolunda sözlük anahtarı araması / serialize yok.
+# Lookup int id, "3" ve slug ile aynı senaryoyu döner.
+
+REQUIRED_FIELDS = (
+    "ID", "Senaryo Adı", "Slug", "Summary", "Hikaye", "Amaç", "System Prompt", "İlk Mesaj", "Goal",
+)
+# /api/scenarios/<ref> ile çakışan sabit route'lar
+RESERVED_SLUGS = ("index",)
+
+class ScenarioError(ValueError):
+    pass
+
+def validate_scenario(sid, data: dict) -> list:
+    errors = []
+    if not isinstance(sid, int) or isinstance(sid, bool):
+        errors.append(f"scenario {sid!r}: id must be an int")
+    if not isinstance(data, dict):
+        return errors + [f"scenario {sid!r}: expected a dict"]
+    for field in REQUIRED_FIELDS:
+        value = data.get(field)
+        if field == "ID":
+            if value != sid:
+                errors.append(f"scenario {sid!r}: ID {value!r} does not match its key")
+        elif not isinstance(value, str) or not value.strip():
+            errors.append(f"scenario {sid!r}: missing or empty {field!r}")
+    slug = data.get("Slug")
+    if isinstance(slug, str) and slug.strip().isdigit():
+        errors.append(f"scenario {sid!r}: slug {slug!r} would shadow a numeric id")
+    elif isinstance(slug, str) and slug.strip() in RESERVED_SLUGS:
+        errors.append(f"scenario {sid!r}: slug {slug!r} is reserved by the API")
+    try:
+        scenario_budget(data)
+    except (TypeError, ValueError):
+        errors.append(f"scenario {sid!r}: 'Token Budget' / 'Keep Turns' must be ints")
+    try:
+        scenario_models(data)
+    except ValueError as e:
+        errors.append(f"scenario {sid!r}: {e}")
+    return errors
+
+class Scenario:
+    __slots__ = (
+        "id", "slug", "name", "summary", "story", "purpose", "prompt", "first_message", "goal",
+        "system_prompt", "token_budget", "keep_turns", "models", "goal_detector", "detail_payload", "version",
+        "opening", "start_body",
+    )
+
+    def __init__(self, sid: int, data: dict, cache_control: str):
+        init = object.__setattr__
+        init(self, "id", sid)
+        init(self, "slug", data["Slug"].strip())
+        init(self, "name", data["Senaryo Adı"])
+        init(self, "summary", data["Summary"])
+        init(self, "story", data["Hikaye"])
+        init(self, "purpose", data["Amaç"])
+        init(self, "prompt", data["System Prompt"])
+        init(self, "first_message", data["İlk Mesaj"])
+        init(self, "goal", data["Goal"])
+        # Turlar ve kullanıcılar arasında byte-byte aynı system prompt (prompt cache)
+        init(self, "system_prompt", render_system_prompt(data))
+        budget, keep_turns = scenario_budget(data)
+        init(self, "token_budget", budget)
+        init(self, "keep_turns", keep_turns)
+        # Sıralı model listesi; seçim / fallback model_router'da
+        init(self, "models", scenario_models(data))
+        init(self, "goal_detector", GoalDetector(sid, data["Goal"]))
+        init(self, "detail_payload", build_payload(self.detail(), cache_control=cache_control))
+        # Açılış turu modele sorulmaz: konuşma kayıtlı ilk mesajla başlar (/start, batch_eval)
+        init(self, "opening", ({"sender": "ai", "text": self.first_message},))
+        init(self, "start_body", json.dumps(
+            self.start(None), ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8"))
+        # İçerik değişince (hot reload) cevap cache'i anahtarları da değişsin
+        raw = json.dumps(data, ensure_ascii=False, sort_keys=True, default=str)
+        init(self, "version", hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Scenario is read-only")
+
+    def __repr__(self):
+        return f"<Scenario {self.id} {self.slug}>"
+
+    def list_entry(self) -> dict:
+        # /api/scenarios (eski tam liste; şekil değişmedi)
+        return {
+            "id": self.id,
+            "name": self.name,
+            "story": self.story,
+            "purpose": self.purpose,
+            "system_prompt": self.prompt,
+            "first_message": self.first_message,
+            "goal": self.goal,
+        }
+
+    def index_entry(self) -> dict:
+        # Senaryo seçici için hafif liste: prompt / hikaye yok
+        return {
+            "id": self.id,
+            "name": self.name,
+            "summary": self.summary,
+            "slug": self.slug,
+            "purpose": self.purpose,
+        }
+
+    def detail(self) -> dict:
+        # Oyun ekranının ihtiyacı olan her şey; system prompt tarayıcıya gitmez
+        return {
+            "id": self.id,
+            "name": self.name,
+            "summary": self.summary,
+            "slug": self.slug,
+            "story": self.story,
+            "purpose": self.purpose,
+            "first_message": self.first_message,
+            "goal": self.goal,
+        }
+
+    def start(self, conversation_id) -> dict:
+        # /api/scenarios/<ref>/start; conversation_id yoksa geçmiş istemcide tutulur
+        return {
+            "conversation_id": conversation_id,
+            "scenario_id": self.id,
+            "first_message": self.first_message,
+            "history": list(self.opening),
+        }
+
+class ScenarioRegistry:
+    __slots__ = ("_by_id", "_by_ref", "list_payload", "index_payload")
+
+    def __init__(self, scenarios: dict, cache_control: str = None):
+        errors = []
+        for sid, data in scenarios.items():
+            errors.extend(validate_scenario(sid, data))
+        slugs = {}
+        for sid, data in scenarios.items():
+            slug = (data.get("Slug") or "").strip() if isinstance(data, dict) else ""
+            if slug and slug in slugs:
+                errors.append(f"scenario {sid!r}: slug {slug!r} already used by {slugs[slug]!r}")
+            slugs.setdefault(slug, sid)
+        if errors:
+            raise ScenarioError("Invalid scenarios:\n  " + "\n  ".join(errors))
+
+        by_id = {sid: Scenario(sid, data, cache_control) for sid, data in scenarios.items()}
+        by_ref = {}
+        for scenario in by_id.values():
+            by_ref[str(scenario.id)] = scenario
+            by_ref[scenario.slug] = scenario
+
+        init = object.__setattr__
+        init(self, "_by_id", by_id)
+        init(self, "_by_ref", by_ref)
+        init(self, "list_payload", build_payload(
+            [s.list_entry() for s in by_id.values()], cache_control=cache_control
+        ))
+        init(self, "index_payload", build_payload(
+            [s.index_entry() for s in by_id.values()], cache_control=cache_control
+        ))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ScenarioRegistry is read-only")
+
+    def get(self, ref):
+        # 3, "3" ve "promosyonun-golgesinde" → aynı senaryo; bilinmeyen → None
+        if isinstance(ref, bool):
+            return None
+        if isinstance(ref, int):
+            return self._by_id.get(ref)
+        if isinstance(ref, str):
+            return self._by_ref.get(ref.strip())
+        return None
+
+    def __iter__(self):
+        return iter(self._by_id.values())
+
+    def __len__(self):
+        return len(self._by_id)
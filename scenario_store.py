@@ -0,0 +1,371 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from payloads import build_payload
+from scenario_registry import REQUIRED_FIELDS, Scenario, ScenarioError, ScenarioRegistry, validate_scenario
+
+# Senaryoları scenarios.py yerine dışarıdan okur; deploy etmeden ekleme / düzenleme.
+#
+#   SCENARIO_SOURCE=                     (boş) scenarios.py, açılışta derlenir (eski davranış)
+#   SCENARIO_SOURCE=/srv/scenarios       klasör: <id>-<slug>.md | .json | .yaml | .yml
+#   SCENARIO_SOURCE=sqlite:///srv/sc.db  tablo: scenarios(id, slug, data JSON, updated_at)
+#   SCENARIO_RELOAD_INTERVAL=2           en fazla bu kadar sn'de bir mtime / updated_at kontrolü (0 = kapalı)
+#   SCENARIO_CACHE_SIZE=128              worker başına bellekte tutulan derlenmiş senaryo sayısı
+#
+# Açılışta sadece liste taranır (dosya adı → id / slug); senaryo ilk istendiğinde
+# okunup derlenir. Değişiklik görülünce yeni bir Snapshot kurulur ve tek atamayla
+# devreye girer: render edilmiş prompt, payload'lar, hedef dedektörü hepsi
+# snapshot'a bağlı olduğu için birlikte geçersizleşir. Değişmeyen senaryolar
+# yeni snapshot'a taşınır, yeniden derlenmez.
+#
+# Mevcut senaryoları dışarı aktarmak için:
+#   python scenario_store.py export /srv/scenarios [--format md|json|yaml]
+#   python scenario_store.py export sqlite:///srv/sc.db
+
+SCENARIO_SOURCE = os.environ.get("SCENARIO_SOURCE", "")
+SCENARIO_RELOAD_INTERVAL = float(os.environ.get("SCENARIO_RELOAD_INTERVAL", "2"))
+SCENARIO_CACHE_SIZE = int(os.environ.get("SCENARIO_CACHE_SIZE", "128"))
+
+FILE_NAME = re.compile(r"^(\d+)-(.+)\.(md|json|ya?ml)$")
+# Markdown'da çok satırlı alanlar "# <alan>" başlıklarıyla ayrılır; diğerleri front matter'da.
+# Bölüm metni başlık satırından sonraki satırdan bir sonraki başlığın önündeki satır sonuna
+# kadar, olduğu gibi alınır (strip yok: export → import içeriği ve ETag'i değiştirmez)
+MD_SECTIONS = ("Hikaye", "System Prompt", "İlk Mesaj")
+MD_SECTION = re.compile(r"^# (" + "|".join(re.escape(s) for s in MD_SECTIONS) + r")[ \t]*$", re.M)
+
+# ---- Dosya formatları ----
+def parse_markdown(text: str) -> dict:
+    text = text.replace("\r\n", "\n")
+    if not text.startswith("---\n"):
+        raise ScenarioError("markdown scenario must start with '---' front matter")
+    header, _, body = text[4:].partition("\n---\n")
+    data = {}
+    for line in header.split("\n"):
+        if line.strip():
+            key, sep, value = line.partition(":")
+            if not sep:
+                raise ScenarioError(f"front matter line without ':': {line!r}")
+            data[key.strip()] = value.strip()
+    parts = MD_SECTION.split(body)
+    for name, value in zip(parts[1::2], parts[2::2]):
+        value = value[1:] if value.startswith("\n") else value
+        data[name] = value[:-1] if value.endswith("\n") else value
+    if "ID" in data and str(data["ID"]).isdigit():
+        data["ID"] = int(data["ID"])
+    return data
+
+def render_markdown(data: dict) -> str:
+    lines = ["---"]
+    for key, value in data.items():
+        if key not in MD_SECTIONS:
+            # Liste alanları (Models) front matter'da "a, b" olarak
+            lines.append(f"{key}: {', '.join(value) if isinstance(value, (list, tuple)) else value}")
+    lines.append("---")
+    for name in MD_SECTIONS:
+        if name in data:
+            lines += [f"# {name}", str(data[name])]
+    return "\n".join(lines) + "\n"
+
+def load_yaml(text: str) -> dict:
+    try:
+        import yaml
+    except ImportError:
+        raise ScenarioError("PyYAML is required for .yaml scenarios (pip install pyyaml)")
+    try:
+        return yaml.safe_load(text)
+    except yaml.YAMLError as e:
+        # Snapshot.get yalnızca OSError / ValueError yakalar; bozuk YAML tek senaryoyu düşürsün
+        raise ScenarioError(f"invalid YAML: {e}")
+
+def parse_file(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith(".md"):
+        return parse_markdown(text)
+    if path.endswith(".json"):
+        return json.loads(text)
+    return load_yaml(text)
+
+# ---- Kaynaklar ----
+# scan(): {id: (slug, sürüm, konum)} — ucuz, her kontrolde çalışır
+# load(id, konum): ham senaryo sözlüğü — sadece derleme sırasında
+class DirectorySource:
+    def __init__(self, path: str):
+        self.path = path
+        self._warned = set()
+
+    def scan(self) -> dict:
+        entries = {}
+        for name in sorted(os.listdir(self.path)):
+            match = FILE_NAME.match(name)
+            if not match:
+                continue
+            sid, slug = int(match.group(1)), match.group(2)
+            path = os.path.join(self.path, name)
+            if sid in entries:
+                if name not in self._warned:
+                    self._warned.add(name)
+                    print(f"Scenario {sid}: ignoring duplicate file {name}")
+                continue
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                continue  # tarama sırasında silindi
+            entries[sid] = (slug, mtime, path)
+        return dict(sorted(entries.items()))
+
+    def load(self, sid: int, path: str) -> dict:
+        return parse_file(path)
+
+class SQLiteSource:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS scenarios ("
+                "id INTEGER PRIMARY KEY, slug TEXT NOT NULL UNIQUE, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def scan(self) -> dict:
+        rows = self._conn().execute("SELECT id, slug, updated_at FROM scenarios ORDER BY id").fetchall()
+        return {sid: (slug, updated_at, None) for sid, slug, updated_at in rows}
+
+    def load(self, sid: int, locator=None) -> dict:
+        row = self._conn().execute("SELECT data FROM scenarios WHERE id = ?", (sid,)).fetchone()
+        if row is None:
+            raise ScenarioError(f"scenario {sid} was deleted")
+        return json.loads(row[0])
+
+    def save(self, data: dict):
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO scenarios (id, slug, data, updated_at) VALUES (?, ?, ?, ?)",
+                (data["ID"], data["Slug"], json.dumps(data, ensure_ascii=False), time.time()),
+            )
+
+# ---- Snapshot ----
+class Snapshot:
+    # Bir taramanın salt okunur görüntüsü; türetilmiş her şey bunun üzerinde tembel kurulur
+    def __init__(self, source, entries: dict, cache_control: str, cache_size: int, previous=None):
+        self.source = source
+        self.entries = entries
+        self.cache_control = cache_control
+        self.cache_size = cache_size
+        self._by_ref = {}
+        self._lock = threading.Lock()
+        self._compiled = OrderedDict()  # id -> Scenario (LRU)
+        self._failed = set()  # bu snapshot'ta yüklenemeyenler; dosya değişince yeniden denenir
+        slugs = {}
+        for sid, (slug, _, _) in entries.items():
+            self._by_ref[str(sid)] = sid
+            if slug in slugs:
+                # ScenarioRegistry gibi: slug'ı ilk kullanan senaryo kalır, diğeri reddedilir
+                print(f"Scenario {sid} could not be loaded: slug {slug!r} already used by {slugs[slug]!r}")
+                self._failed.add(sid)
+                continue
+            slugs[slug] = sid
+            self._by_ref.setdefault(slug, sid)
+        self._payloads = {}
+        if previous is not None:
+            # Sürümü değişmeyen senaryolar yeniden derlenmez
+            with previous._lock:
+                carried = list(previous._compiled.items())
+            for sid, scenario in carried:
+                if previous.entries.get(sid) == entries.get(sid):
+                    self._compiled[sid] = scenario
+
+    def _compile(self, sid: int) -> Scenario:
+        slug, _, locator = self.entries[sid]
+        data = self.source.load(sid, locator)
+        errors = validate_scenario(sid, data)
+        if not errors and data["Slug"].strip() != slug:
+            errors.append(f"scenario {sid}: slug {data['Slug']!r} does not match file / row slug {slug!r}")
+        if errors:
+            raise ScenarioError("; ".join(errors))
+        return Scenario(sid, data, self.cache_control)
+
+    def get(self, ref):
+        # 3, "3" ve slug → aynı senaryo (ScenarioRegistry.get ile aynı kurallar)
+        if isinstance(ref, str):
+            sid = self._by_ref.get(ref.strip())
+        elif isinstance(ref, int) and not isinstance(ref, bool):
+            sid = ref
+        else:
+            return None
+        if sid not in self.entries or sid in self._failed:
+            return None
+        with self._lock:
+            scenario = self._compiled.get(sid)
+            if scenario is not None:
+                self._compiled.move_to_end(sid)
+                return scenario
+        try:
+            scenario = self._compile(sid)
+        except (OSError, ValueError) as e:
+            # Bozuk dosya tek senaryoyu düşürür, uygulamayı değil
+            print(f"Scenario {sid} could not be loaded: {e}")
+            self._failed.add(sid)
+            return None
+        with self._lock:
+            self._compiled[sid] = scenario
+            while len(self._compiled) > self.cache_size:
+                self._compiled.popitem(last=False)
+        return scenario
+
+    def __iter__(self):
+        for sid in self.entries:
+            scenario = self.get(sid)
+            if scenario is not None:
+                yield scenario
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _payload(self, name: str, entry):
+        payload = self._payloads.get(name)
+        if payload is None:
+            payload = build_payload([entry(s) for s in self], cache_control=self.cache_control)
+            self._payloads[name] = payload
+        return payload
+
+    @property
+    def list_payload(self):
+        return self._payload("list", Scenario.list_entry)
+
+    @property
+    def index_payload(self):
+        return self._payload("index", Scenario.index_entry)
+
+class ScenarioStore:
+    # Snapshot'ı tutar; SCENARIO_RELOAD_INTERVAL'de bir kaynağı yeniden tarar
+    def __init__(self, source, cache_control: str = None, reload_interval: float = SCENARIO_RELOAD_INTERVAL,
+                 cache_size: int = SCENARIO_CACHE_SIZE):
+        self.source = source
+        self.cache_control = cache_control
+        self.reload_interval = reload_interval
+        self.cache_size = cache_size
+        self.reloads = 0
+        self._reload_lock = threading.Lock()
+        self._snapshot = Snapshot(source, source.scan(), cache_control, cache_size)
+        self._next_check = time.monotonic() + reload_interval
+
+    def current(self) -> Snapshot:
+        if self.reload_interval > 0 and time.monotonic() >= self._next_check:
+            self.refresh()
+        return self._snapshot
+
+    def refresh(self):
+        # Aynı anda tek thread tarar; diğerleri eldeki snapshot'la devam eder
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_check = time.monotonic() + self.reload_interval
+            entries = self.source.scan()
+            current = self._snapshot
+            if entries != current.entries:
+                self._snapshot = Snapshot(self.source, entries, self.cache_control, self.cache_size, current)
+                self.reloads += 1
+                changed = sorted(sid for sid in entries.keys() | current.entries.keys()
+                                 if entries.get(sid) != current.entries.get(sid))
+                print(f"Scenarios reloaded: {len(entries)} scenarios, changed={changed}")
+        except (OSError, sqlite3.Error) as e:
+            print(f"Scenario reload failed: {e}")
+        finally:
+            self._reload_lock.release()
+
+    def get(self, ref):
+        return self.current().get(ref)
+
+    def __iter__(self):
+        return iter(self.current())
+
+    def __len__(self):
+        return len(self.current())
+
+    @property
+    def list_payload(self):
+        return self.current().list_payload
+
+    @property
+    def index_payload(self):
+        return self.current().index_payload
+
+def make_source(spec: str):
+    if spec.startswith("sqlite:///"):
+        return SQLiteSource(spec[len("sqlite:///"):])
+    if os.path.isdir(spec):
+        return DirectorySource(spec)
+    raise ValueError(f"Unknown SCENARIO_SOURCE: {spec}")
+
+def make_scenario_store(spec: str = None, cache_control: str = None):
+    spec = SCENARIO_SOURCE if spec is None else spec
+    if not spec:
+        from scenarios import scenarios
+
+        return ScenarioRegistry(scenarios, cache_control=cache_control)
+    return ScenarioStore(make_source(spec), cache_control=cache_control)
+
+# ---- Dışa aktarma (scenarios.py → klasör / SQLite) ----
+def export_scenarios(scenarios: dict, target: str, fmt: str = "md") -> int:
+    if target.startswith("sqlite:///"):
+        source = SQLiteSource(target[len("sqlite:///"):])
+        for data in scenarios.values():
+            source.save(data)
+        return len(scenarios)
+
+    os.makedirs(target, exist_ok=True)
+    for sid, data in scenarios.items():
+        data = {key: data[key] for key in REQUIRED_FIELDS if key in data} | data
+        path = os.path.join(target, f"{sid}-{data['Slug']}.{fmt}")
+        if fmt == "md":
+            text = render_markdown(data)
+        elif fmt == "json":
+            text = json.dumps(data, ensure_ascii=False, indent=2) + "\n"
+        else:
+            import yaml
+
+            text = yaml.safe_dump(data, allow_unicode=True, sort_keys=False, width=1000)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+    return len(scenarios)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Senaryo kaynağı araçları")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="scenarios.py içeriğini klasöre / SQLite'a yaz")
+    export.add_argument("target", help="klasör veya sqlite:///dosya.db")
+    export.add_argument("--format", choices=("md", "json", "yaml"), default="md")
+    check = sub.add_parser("check", help="kaynaktaki tüm senaryoları yükleyip doğrula")
+    check.add_argument("source", help="klasör veya sqlite:///dosya.db")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        from scenarios import scenarios
+
+        count = export_scenarios(scenarios, args.target, args.format)
+        print(f"{count} scenarios written to {args.target}")
+        return 0
+
+    snapshot = ScenarioStore(make_source(args.source), reload_interval=0).current()
+    loaded = sum(1 for _ in snapshot)
+    print(f"{loaded}/{len(snapshot)} scenarios loaded from {args.source}")
+    return 0 if loaded == len(snapshot) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
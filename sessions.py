@@ -0,0 +1,117 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# Sunucu tarafı konuşma geçmişi. Konuşma = düz dict:
+#   {"id", "owner", "scenario_id", "history": [{"sender", "text"}], "created_at", "updated_at"}
+# Store seçimi SESSION_STORE ile:
+#   memory (varsayılan) | sqlite:///path/to/file.db | redis://host:6379/0
+
+SESSION_TTL = int(os.environ.get("SESSION_TTL", str(6 * 60 * 60)))
+SESSION_MAX_ENTRIES = int(os.environ.get("SESSION_MAX_ENTRIES", "10000"))
+
+def new_conversation(owner: str, scenario_id, history: list = None) -> dict:
+    now = time.time()
+    return {
+        "id": uuid.uuid4().hex,
+        "owner": owner,
+        "scenario_id": scenario_id,
+        "history": list(history or []),
+        "created_at": now,
+        "updated_at": now,
+    }
+
+class MemorySessionStore:
+    # Process içi LRU + TTL; tek worker / geliştirme için yeterli
+    def __init__(self, max_entries: int = SESSION_MAX_ENTRIES, ttl: int = SESSION_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()  # id -> (expires_at, conversation)
+        self._lock = threading.Lock()
+
+    def get(self, cid: str):
+        with self._lock:
+            entry = self._data.get(cid)
+            if entry is None:
+                return None
+            expires_at, conversation = entry
+            if expires_at < time.monotonic():
+                del self._data[cid]
+                return None
+            self._data.move_to_end(cid)
+            return conversation
+
+    def save(self, conversation: dict):
+        with self._lock:
+            self._data[conversation["id"]] = (time.monotonic() + self.ttl, conversation)
+            self._data.move_to_end(conversation["id"])
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+class SQLiteSessionStore:
+    # Aynı makinedeki birden çok worker tek dosyayı paylaşır
+    def __init__(self, path: str, ttl: int = SESSION_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                "id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, cid: str):
+        row = self._conn().execute(
+            "SELECT data FROM conversations WHERE id = ? AND expires_at >= ?", (cid, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, conversation: dict):
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO conversations (id, data, expires_at) VALUES (?, ?, ?)",
+                (conversation["id"], json.dumps(conversation, ensure_ascii=False), time.time() + self.ttl),
+            )
+            # süresi dolanları ara ara temizle
+            if conversation["created_at"] == conversation["updated_at"]:
+                conn.execute("DELETE FROM conversations WHERE expires_at < ?", (time.time(),))
+
+class RedisSessionStore:
+    # Birden çok makine / worker için; `redis` paketi gerekli
+    def __init__(self, url: str, ttl: int = SESSION_TTL, prefix: str = "convince:conv:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, cid: str):
+        raw = self.client.get(self.prefix + cid)
+        return json.loads(raw) if raw else None
+
+    def save(self, conversation: dict):
+        self.client.setex(
+            self.prefix + conversation["id"], self.ttl, json.dumps(conversation, ensure_ascii=False)
+        )
+
+def make_store(spec: str = None):
+    spec = spec or os.environ.get("SESSION_STORE", "memory")
+    if spec == "memory":
+        return MemorySessionStore()
+    if spec.startswith("sqlite:///"):
+        return SQLiteSessionStore(spec[len("sqlite:///"):])
+    if spec.startswith(("redis://", "rediss://")):
+        return RedisSessionStore(spec)
+    raise ValueError(f"Unknown SESSION_STORE: {spec}")
@@ -0,0 +1,114 @@
+import asyncio
+import hashlib
+import json
+import threading
+
+# Aynı anda gelen birebir aynı upstream istekleri tek çağrıda birleştirir.
+# İlk gelen ("lider") çağrıyı yapar; aynı anahtarla bekleyenler onun sonucunu
+# (veya hatasını) paylaşır. Çağrı bitince anahtar silinir → bu bir cache değil.
+
+def request_key(model: str, messages: list) -> str:
+    raw = json.dumps([model, messages], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    # Thread tabanlı (gunicorn sync/gthread worker'ları)
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn):
+        # (sonuç, paylaşıldı_mı) döner
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                if getattr(call.error, "leader_only", False):
+                    # Lider iptal edildi (cancellation.TurnCancelled); çağrıyı bu istek yapar
+                    return self.do(key, fn)
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+class AsyncSingleFlight:
+    # asyncio (asgi.py); upstream çağrısı ayrı task'ta yürür, böylece lider
+    # istemci bağlantıyı koparsa bekleyen diğer istekler etkilenmez. Bekleyen
+    # kalmazsa (hepsi koptu / iptal etti) upstream çağrısı da iptal edilir.
+    def __init__(self):
+        self._tasks = {}
+        self._waiters = {}  # task → bekleyen istek sayısı
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, coro_fn):
+        self.calls += 1
+        task = self._tasks.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(coro_fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task), shared
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1 and not task.done():
+                task.cancel()
+            raise
+        except Exception as e:
+            if not (shared and getattr(e, "leader_only", False)):
+                raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+        # Lider iptal edildi (cancellation.TurnCancelled); çağrıyı bu istek yapar
+        return await self.do(key, coro_fn)
+
+    def waiters(self, key: str) -> int:
+        task = self._tasks.get(key)
+        return self._waiters.get(task, 0) if task is not None else 0
+
+    def _finished(self, key: str, task):
+        self._tasks.pop(key, None)
+        # tüm bekleyenler iptal olduysa hata "retrieved" sayılsın, log kirlenmesin
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._tasks)}
@@ -4,6 +4,18 @@ import api from "../api";
 import ReactMarkdown from "react-markdown";
 import remarkGfm from "remark-gfm";
 
+// Yazma durunca taslak gönderilir (sunucu DRAFT_PREFETCH açıksa cevabı önceden hazırlar)
+const DRAFT_DEBOUNCE_MS = 700;
+
+// /api/ask/cancel için istemci tarafında üretilen tur kimliği
+const newTurnId = () =>
+  window.crypto?.randomUUID
+    ? window.crypto.randomUUID()
+    : Math.random().toString(36).slice(2) + Date.now().toString(36);
+
+const cancelTurn = (turnId) =>
+  api.post("/api/ask/cancel", { turn_id: turnId }).catch(() => {});
+
 export default function GameScreen() {
   const { currentScenario, exitGame } = useGame();
   const [messages, setMessages] = useState([]);
@@ -12,17 +24,13 @@ export default function GameScreen() {
   const [listening, setListening] = useState(false);
   const [interimText, setInterimText] = useState("");
   const [chatEnded, setChatEnded] = useState(false);
+  const [conversationId, setConversationId] = useState(null);
   const scrollRef = useRef();
   const recognitionRef = useRef(null);
   const textareaRef = useRef(null);
-
-  const norm = (s = "") =>
-    s
-      .normalize("NFC")
-      .toLowerCase()
-      .replace(/\*|_|`|~|”|“|″|„|«|»|’|‘|"/g, "")
-      .replace(/\s+/g, " ")
-      .trim();
+  const draftTimerRef = useRef(null);
+  const draftEnabledRef = useRef(true);
+  const pendingTurnRef = useRef(null);
 
   // Speech
   useEffect(() => {
@@ -75,15 +83,56 @@ export default function GameScreen() {
     scrollRef.current?.scrollIntoView({ behavior: "smooth" });
   }, [messages]);
 
+  // Ekrandan çıkılırsa bekleyen cevabın sunucudaki çağrısı durdurulur
   useEffect(() => {
-    if (currentScenario?.first_message) {
-      setMessages([{ sender: "ai", text: currentScenario.first_message }]);
+    return () => {
+      if (pendingTurnRef.current) cancelTurn(pendingTurnRef.current);
+    };
+  }, [currentScenario?.id]);
+
+  // Açılış mesajı sunucuda hazır (model çağrısı yok); girişliyse sunucu tarafı konuşma açılır
+  const startScenario = async (scenario) => {
+    setConversationId(null);
+    if (scenario?.first_message) {
+      setMessages([{ sender: "ai", text: scenario.first_message }]);
     } else {
       setMessages([]);
     }
+    if (!scenario) return;
+    try {
+      const res = await api.post(`/api/scenarios/${scenario.id}/start`);
+      setConversationId(res.data?.conversation_id || null);
+      if (res.data?.history) {
+        setMessages((prev) => (prev.length <= 1 ? res.data.history : prev));
+      }
+    } catch (err) {}
+  };
+
+  useEffect(() => {
+    startScenario(currentScenario);
     setInput("");
   }, [currentScenario?.id]);
 
+  useEffect(() => {
+    if (!currentScenario || loading || chatEnded || !draftEnabledRef.current) return;
+    const draft = input.trim();
+    draftTimerRef.current = setTimeout(async () => {
+      try {
+        // /api/ask ile aynı geçmiş; nihai mesaj taslakla aynıysa hazır cevap kullanılır
+        const res = await api.post(
+          "/api/ask/draft",
+          conversationId
+            ? { draft, conversation_id: conversationId }
+            : { draft, scenario_id: currentScenario.id, history: messages }
+        );
+        if (res.data?.status === "disabled") draftEnabledRef.current = false;
+      } catch (err) {
+        if (conversationId && err.response?.status === 404) setConversationId(null);
+      }
+    }, DRAFT_DEBOUNCE_MS);
+    return () => clearTimeout(draftTimerRef.current);
+  }, [input]);
+
   useEffect(() => {
     if (!listening && textareaRef.current) {
       textareaRef.current.focus();
@@ -121,23 +170,41 @@ export default function GameScreen() {
     if (!userMessage || loading || chatEnded) return;
 
     stopListening();
+    clearTimeout(draftTimerRef.current);
     setMessages((prev) => [...prev, { sender: "user", text: userMessage }]);
     setInput("");
     setInterimText("");
     setLoading(true);
+    const turnId = newTurnId();
+    pendingTurnRef.current = turnId;
+
+    // Sunucu tarafı konuşmada geçmiş gönderilmez
+    const askPayload = (convId) =>
+      convId
+        ? { user_input: userMessage, conversation_id: convId, turn_id: turnId }
+        : {
+            user_input: userMessage,
+            scenario_id: currentScenario.id,
+            history: messages,
+            turn_id: turnId,
+          };
 
     try {
-      const res = await api.post("/api/ask", {
-        user_input: userMessage,
-        scenario_id: currentScenario.id,
-        history: messages,
-      });
+      let res;
+      try {
+        res = await api.post("/api/ask", askPayload(conversationId));
+      } catch (err) {
+        // Sunucu konuşmayı kaybetti (restart / başka worker, bellek içi store): yerel geçmişle devam
+        if (!conversationId || err.response?.status !== 404) throw err;
+        setConversationId(null);
+        res = await api.post("/api/ask", askPayload(null));
+      }
 
       const aiText = (res.data?.answer || "").trim();
       setMessages((prev) => [...prev, { sender: "ai", text: aiText }]);
 
-      const goal = currentScenario?.goal || currentScenario?.Goal;
-      if (goal && norm(aiText).includes(norm(goal))) {
+      // Hedef cümle sunucuda tespit edilir (goal_reached / score)
+      if (res.data?.goal_reached) {
         setChatEnded(true);
         setMessages((prev) => [
           ...prev,
@@ -154,20 +221,21 @@ export default function GameScreen() {
         setChatEnded(true);
       }
     } catch (err) {
+      // Timeout: cevap artık gösterilmeyecek, sunucu da beklemeyi / üretimi bıraksın
+      if (err.code === "ECONNABORTED") cancelTurn(turnId);
       setMessages((prev) => [
         ...prev,
         { sender: "ai", text: "Cevap alınamadı." },
       ]);
     } finally {
+      pendingTurnRef.current = null;
       setLoading(false);
     }
   };
 
   const resetChat = () => {
     stopListening();
-    if (currentScenario?.first_message) {
-      setMessages([{ sender: "ai", text: currentScenario.first_message }]);
-    } else setMessages([]);
+    startScenario(currentScenario);
     setInput("");
     setInterimText("");
     setChatEnded(false);
@@ -5,7 +5,8 @@ import ReactMarkdown from "react-markdown";
 import remarkGfm from "remark-gfm";
 
 export default function ScenariosScreen() {
-  const { scenarios, fetchScenarios, selectScenario, loading, error } = useGame();
+  const { scenarios, fetchScenarios, fetchScenarioDetail, selectScenario, loading, error } =
+    useGame();
   const [preview, setPreview] = useState(null);
   const [expanded, setExpanded] = useState(false);
 
@@ -32,6 +33,11 @@ export default function ScenariosScreen() {
               onClick={() => {
                 setPreview(s);
                 setExpanded(false);
+                fetchScenarioDetail(s.id)
+                  .then((detail) =>
+                    setPreview((p) => (p?.id === detail.id ? detail : p))
+                  )
+                  .catch((e) => console.error(e));
               }}
               className="btn btn-secondary"
               style={scenarioBtn(s, preview)}
@@ -68,7 +74,7 @@ export default function ScenariosScreen() {
                     }}
                   >
                     <ReactMarkdown remarkPlugins={[remarkGfm]}>
-                      {preview.story}
+                      {preview.story || preview.summary}
                     </ReactMarkdown>
                   </div>
                   {!expanded && (
@@ -86,6 +92,7 @@ export default function ScenariosScreen() {
                   <button
                     className="btn btn-primary"
                     onClick={() => selectScenario(preview)}
+                    disabled={!preview.first_message}
                   >
                     Oyna
                   </button>
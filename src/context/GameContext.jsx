@@ -16,7 +16,7 @@ export function GameProvider({ children }) {
     try {
       setLoading(true);
       setError(null);
-      const res = await api.get("/api/scenarios");
+      const res = await api.get("/api/scenarios/index");
       setScenarios(res.data || []);
     } catch (e) {
       console.error(e);
@@ -26,6 +26,12 @@ export function GameProvider({ children }) {
     }
   };
 
+  // Liste hafif geliyor; hikaye / ilk mesaj seçilince detaydan alınır
+  const fetchScenarioDetail = useCallback(async (ref) => {
+    const res = await api.get(`/api/scenarios/${ref}`);
+    return res.data;
+  }, []);
+
   const selectScenario = useCallback((scenario) => {
     setCurrentScenario(scenario);
     setScreen("game");
@@ -46,6 +52,7 @@ export function GameProvider({ children }) {
         currentScenario,
         startGame,
         fetchScenarios,
+        fetchScenarioDetail,
         selectScenario,
         exitGame,
         setScreen,
@@ -0,0 +1,172 @@
+import json
+import os
+import random
+import threading
+import time
+import uuid
+
+# İstek izleri: her istek için tek satır JSON log (request id, route, status, süre,
+# aşama süreleri, senaryo, history uzunluğu, token'lar). Aşama süreleri her istekte
+# ölçülür (birkaç perf_counter); log / span yazımı örneklenir ki tam trafikte yük düşük kalsın.
+# Yavaş ve 5xx istekler örneklemeden bağımsız loglanır.
+#
+#   TRACE_SAMPLE_RATE=0.1    loglanan isteklerin oranı (0 = sadece yavaş / hatalı, 1 = hepsi)
+#   TRACE_SLOW_MS=0          bundan yavaş istekler her zaman loglanır (0 = kapalı); /api/ask normalde
+#                            birkaç sn sürer, açılacaksa p99'un üstünde seçin (örn. 15000)
+#   TRACE_LOG_FILE=          boş → stdout (Render logs); verilirse JSON satırları dosyaya eklenir
+#   TRACE_OTEL=0             1 → örneklenen isteklerde OpenTelemetry span'ları; SDK / exporter
+#                            kurulumu opentelemetry-instrument veya OTEL_* env'leriyle yapılır
+
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0.1"))
+TRACE_SLOW_MS = float(os.environ.get("TRACE_SLOW_MS", "0"))
+TRACE_LOG_FILE = os.environ.get("TRACE_LOG_FILE")
+TRACE_OTEL = os.environ.get("TRACE_OTEL", "0").lower() in ("1", "true", "yes")
+
+_tracer = None
+if TRACE_OTEL:
+    try:
+        from opentelemetry import trace as otel
+        from opentelemetry.propagate import extract
+
+        _tracer = otel.get_tracer("convince")
+    except ImportError:
+        print("TRACE_OTEL=1 but opentelemetry-api is not installed; spans disabled (pip install opentelemetry-api)")
+
+_log_lock = threading.Lock()
+_log_file = None
+
+def new_request_id(incoming: str = None) -> str:
+    # Proxy / istemci X-Request-ID verdiyse o kullanılır (loglar uçtan uca eşleşsin)
+    if incoming and len(incoming) <= 64 and incoming.isprintable():
+        return incoming
+    return uuid.uuid4().hex
+
+def write_record(record: dict):
+    global _log_file
+    line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+    if not TRACE_LOG_FILE:
+        print(line, flush=True)
+        return
+    with _log_lock:
+        if _log_file is None:
+            _log_file = open(TRACE_LOG_FILE, "a", encoding="utf-8", buffering=1)
+        _log_file.write(line + "\n")
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 2)
+
+class Stage:
+    __slots__ = ("trace", "name", "started", "span")
+
+    def __init__(self, trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.span = None
+        if self.trace.span is not None:
+            self.span = _tracer.start_span(self.name, context=otel.set_span_in_context(self.trace.span))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        stages = self.trace.stages
+        stages[self.name] = stages.get(self.name, 0.0) + time.perf_counter() - self.started
+        if self.span is not None:
+            if exc is not None:
+                self.span.record_exception(exc)
+                self.span.set_status(otel.Status(otel.StatusCode.ERROR))
+            self.span.end()
+        return False
+
+class Trace:
+    __slots__ = ("request_id", "route", "method", "sampled", "started", "stages", "fields", "turn", "span", "done")
+
+    def __init__(self, route: str, method: str, request_id: str = None, carrier=None):
+        self.request_id = new_request_id(request_id)
+        self.route = route
+        self.method = method
+        self.sampled = TRACE_SAMPLE_RATE >= 1 or random.random() < TRACE_SAMPLE_RATE
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.fields = {}
+        self.turn = None
+        self.done = False
+        self.span = None
+        if self.sampled and _tracer is not None:
+            # carrier: gelen header'lar (traceparent) → dış izin alt span'ı olur
+            self.span = _tracer.start_span(
+                f"{method} {route}",
+                context=extract(carrier or {}),
+                kind=otel.SpanKind.SERVER,
+                attributes={"http.route": route, "http.method": method, "convince.request_id": self.request_id},
+            )
+
+    def stage(self, name: str) -> Stage:
+        return Stage(self, name)
+
+    def bind(self, turn: dict):
+        # Turn'ün senaryo / history / token / zamanlama (turn["timings"]) bilgisi bitişte okunur
+        self.turn = turn
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def fail(self, error: BaseException):
+        self.fields["error"] = error.__class__.__name__
+        if self.span is not None:
+            self.span.record_exception(error)
+
+    def finish(self, status: int):
+        if self.done:
+            return
+        self.done = True
+        elapsed = time.perf_counter() - self.started
+        slow = TRACE_SLOW_MS and elapsed * 1000 >= TRACE_SLOW_MS
+        if not (self.sampled or slow or status >= 500):
+            return
+
+        record = {
+            "ts": round(time.time(), 3),
+            "request_id": self.request_id,
+            "route": self.route,
+            "method": self.method,
+            "status": status,
+            "duration_ms": _ms(elapsed),
+        }
+        stages = {name: _ms(seconds) for name, seconds in self.stages.items()}
+        turn = self.turn
+        if turn is not None:
+            # queue / upstream / first_token / serialization metrics.observe_stage'den
+            stages.update({name: _ms(seconds) for name, seconds in turn.get("timings", {}).items()})
+            usage = turn["meta"].get("usage") or {}
+            record.update({
+                "scenario_id": turn["scenario_id"],
+                "history_len": len(turn["history"]) if isinstance(turn["history"], list) else None,
+                "prompt_tokens": usage.get("prompt_tokens"),
+                "completion_tokens": usage.get("completion_tokens"),
+                "cached_tokens": usage.get("cached_tokens"),
+            })
+            if turn["meta"].get("model"):
+                record["model"] = turn["meta"]["model"]
+            if turn["meta"].get("cache"):
+                record["cache"] = turn["meta"]["cache"]
+            if turn["meta"].get("coalesced"):
+                record["coalesced"] = True
+        record["stages"] = stages
+        record.update(self.fields)
+        if not self.sampled:
+            record["sampled"] = False  # yavaş / hatalı olduğu için loglandı
+        write_record(record)
+
+        span = self.span
+        if span is not None:
+            span.set_attribute("http.status_code", status)
+            for key in ("scenario_id", "history_len", "prompt_tokens", "completion_tokens", "cached_tokens"):
+                if record.get(key) is not None:
+                    span.set_attribute(f"convince.{key}", record[key])
+            for name, ms in stages.items():
+                span.set_attribute(f"convince.stage.{name}_ms", ms)
+            if status >= 500:
+                span.set_status(otel.Status(otel.StatusCode.ERROR))
+            span.end()
@@ -0,0 +1,262 @@
+import asyncio
+import math
+import os
+import random
+import threading
+import time
+
+# OpenAI çağrıları için eşzamanlılık sınırı, bekleme kuyruğu ve hız sınırı.
+#   - En fazla UPSTREAM_MAX_CONCURRENCY çağrı aynı anda uçuşta
+#   - En fazla UPSTREAM_MAX_QUEUE istek slot bekler; kuyruk doluysa hemen UpstreamBusy (→ 503)
+#   - Dakikalık istek / token bütçesi (OPENAI_RPM / OPENAI_TPM; 0 = kapalı)
+#   - 429 / 5xx / bağlantı hatalarında jitter'lı üstel geri çekilme ile tekrar
+
+UPSTREAM_MAX_CONCURRENCY = int(os.environ.get("UPSTREAM_MAX_CONCURRENCY", "32"))
+UPSTREAM_MAX_QUEUE = int(os.environ.get("UPSTREAM_MAX_QUEUE", "64"))
+UPSTREAM_QUEUE_TIMEOUT = float(os.environ.get("UPSTREAM_QUEUE_TIMEOUT", "10"))
+UPSTREAM_MAX_RETRIES = int(os.environ.get("UPSTREAM_MAX_RETRIES", "3"))
+UPSTREAM_BACKOFF_BASE = float(os.environ.get("UPSTREAM_BACKOFF_BASE", "0.5"))
+UPSTREAM_BACKOFF_MAX = float(os.environ.get("UPSTREAM_BACKOFF_MAX", "8"))
+OPENAI_RPM = int(os.environ.get("OPENAI_RPM", "500"))
+OPENAI_TPM = int(os.environ.get("OPENAI_TPM", "200000"))
+# TPM hesabında cevap için ayrılan tahmini token
+COMPLETION_TOKENS_ESTIMATE = int(os.environ.get("COMPLETION_TOKENS_ESTIMATE", "300"))
+
+class UpstreamBusy(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Upstream busy, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class TokenBucket:
+    # Dakikalık bütçe; reserve() hemen düşer ve ne kadar beklenmesi gerektiğini döner
+    def __init__(self, per_minute: int):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self, amount: float):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+def is_retryable(error: Exception) -> bool:
+    import openai  # istemci kurulduysa zaten yüklü; upstream import'u SDK'yı çekmesin
+
+    if isinstance(error, openai.APIConnectionError):  # timeout dahil
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+def backoff_delay(attempt: int, error: Exception) -> float:
+    # Sağlayıcı retry-after verdiyse ona uy; yoksa "full jitter"
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            return min(UPSTREAM_BACKOFF_MAX, float(response.headers.get("retry-after")))
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, min(UPSTREAM_BACKOFF_MAX, UPSTREAM_BACKOFF_BASE * 2 ** attempt))
+
+class _LimiterBase:
+    def __init__(self, max_concurrency: int = UPSTREAM_MAX_CONCURRENCY, max_queue: int = UPSTREAM_MAX_QUEUE,
+                 queue_timeout: float = UPSTREAM_QUEUE_TIMEOUT, rpm: int = OPENAI_RPM, tpm: int = OPENAI_TPM,
+                 max_retries: int = UPSTREAM_MAX_RETRIES):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.requests_bucket = TokenBucket(rpm)
+        self.tokens_bucket = TokenBucket(tpm)
+        self._stats_lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.rejected = 0
+        self.retries = 0
+        self.acquired = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.avg_hold = 2.0  # slot tutma süresinin EWMA'sı (Retry-After tahmini için)
+
+    def _enter_queue(self):
+        with self._stats_lock:
+            # slot'taki + bekleyen toplamı sınırlı; fazlası beklemeden reddedilir
+            if self.in_flight + self.waiting >= self.max_concurrency + self.max_queue:
+                self.rejected += 1
+                raise UpstreamBusy(self._retry_after())
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+
+    def _leave_queue(self, waited: float, acquired: bool):
+        with self._stats_lock:
+            self.waiting -= 1
+            if not acquired:
+                self.rejected += 1
+                return
+            self.in_flight += 1
+            self.acquired += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def _abandon_queue(self):
+        with self._stats_lock:
+            self.waiting -= 1
+
+    def _released(self, held: float):
+        with self._stats_lock:
+            self.in_flight -= 1
+            self.avg_hold = 0.9 * self.avg_hold + 0.1 * held
+
+    def _retry_after(self) -> int:
+        backlog = (self.waiting + 1) / max(1, self.max_concurrency)
+        return max(1, math.ceil(self.avg_hold * backlog))
+
+    def _rate_delay(self, tokens: int) -> float:
+        # Bütçe aşılacaksa bekleme süresi; kuyruk süresinden uzunsa reddet
+        delay = max(self.requests_bucket.reserve(1), self.tokens_bucket.reserve(tokens))
+        if delay > self.queue_timeout:
+            self.requests_bucket.refund(1)
+            self.tokens_bucket.refund(tokens)
+            with self._stats_lock:
+                self.rejected += 1
+            raise UpstreamBusy(math.ceil(delay))
+        return delay
+
+    def _count_retry(self):
+        with self._stats_lock:
+            self.retries += 1
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "queue_depth": self.waiting,
+                "max_queue_depth": self.max_waiting,
+                "rejected": self.rejected,
+                "retries": self.retries,
+                "acquired": self.acquired,
+                "avg_wait_seconds": self.wait_total / self.acquired if self.acquired else 0.0,
+                "max_wait_seconds": self.wait_max,
+            }
+
+class UpstreamLimiter(_LimiterBase):
+    # Thread tabanlı (Flask / gunicorn)
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+
+    def acquire(self, tokens: int = 0):
+        # Slot + hız bütçesi; serbest bırakma fonksiyonunu döner (birden çok çağrı güvenli)
+        self._enter_queue()
+        started = time.monotonic()
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+        self._leave_queue(time.monotonic() - started, acquired)
+        if not acquired:
+            raise UpstreamBusy(self._retry_after())
+
+        held_since = time.monotonic()
+        released = []
+
+        def release():
+            if not released:
+                released.append(True)
+                self._slots.release()
+                self._released(time.monotonic() - held_since)
+
+        try:
+            delay = self._rate_delay(tokens + COMPLETION_TOKENS_ESTIMATE)
+        except UpstreamBusy:
+            release()
+            raise
+        if delay:
+            time.sleep(delay)
+        return release
+
+    def retry(self, fn):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return fn()
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                self._count_retry()
+                time.sleep(backoff_delay(attempt, e))
+
+    def call(self, fn, tokens: int = 0):
+        release = self.acquire(tokens)
+        try:
+            return self.retry(fn)
+        finally:
+            release()
+
+class AsyncUpstreamLimiter(_LimiterBase):
+    # asyncio (asgi.py)
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+
+    async def acquire(self, tokens: int = 0):
+        self._enter_queue()
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+            acquired = True
+        except asyncio.TimeoutError:
+            acquired = False
+        except BaseException:
+            # istek iptal edildi (istemci koptu): kuyruktan çık ve iptali ilet
+            self._abandon_queue()
+            raise
+        self._leave_queue(time.monotonic() - started, acquired)
+        if not acquired:
+            raise UpstreamBusy(self._retry_after())
+
+        held_since = time.monotonic()
+        released = []
+
+        def release():
+            if not released:
+                released.append(True)
+                self._slots.release()
+                self._released(time.monotonic() - held_since)
+
+        try:
+            delay = self._rate_delay(tokens + COMPLETION_TOKENS_ESTIMATE)
+            if delay:
+                await asyncio.sleep(delay)
+        except BaseException:
+            release()
+            raise
+        return release
+
+    async def retry(self, coro_fn):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await coro_fn()
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                self._count_retry()
+                await asyncio.sleep(backoff_delay(attempt, e))
+
+    async def call(self, coro_fn, tokens: int = 0):
+        release = await self.acquire(tokens)
+        try:
+            return await self.retry(coro_fn)
+        finally:
+            release()